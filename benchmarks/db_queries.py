@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+"""
+Purpose: Time the spatial queries run on the prediction tables for a tile, to compare
+    database layouts (e.g. before and after running antares db_maintenance)
+
+Every query is ran with EXPLAIN (ANALYZE, BUFFERS); execution time and number of
+shared buffers read and hit are reported. Queries filtering on the segmentation id
+should show an index scan on the partial index of the segmentation
+(predictobject_geom_seg_<id>_idx) in their plans (--plans) once it has been created.
+
+Usage:
+    python benchmarks/db_queries.py --segmentation s2_001_jalisco_2017 \\
+        --classification s2_001_jalisco_2017_rf --bbox -104 20 -103.5 20.5 \\
+        --validation bits_interpret --plans
+"""
+import argparse
+import os
+import re
+
+import django
+
+
+QUERIES = {
+    'load_segmentation_from_dataset': """
+SELECT
+    obj.id,
+    st_asbinary(st_transform(obj.the_geom, '+proj=utm +zone=13 +datum=WGS84'::text))
+FROM
+    public.madmex_predictobject AS obj
+WHERE
+    obj.segmentation_information_id = %(segmentation_id)s
+    AND
+    obj.the_geom @ st_makeenvelope(%(xmin)s, %(ymin)s, %(xmax)s, %(ymax)s, 4326)
+    """,
+    'read_land_cover': """
+SELECT
+    st_asgeojson(obj.the_geom, 6),
+    cl.tag_id
+FROM
+    public.madmex_predictobject AS obj
+INNER JOIN
+    public.madmex_predictclassification AS cl ON cl.predict_object_id = obj.id
+    AND
+    cl.name = %(classification)s
+WHERE
+    st_intersects(obj.the_geom, st_makeenvelope(%(xmin)s, %(ymin)s, %(xmax)s, %(ymax)s, 4326))
+    """,
+    'db_to_raster': """
+SELECT
+    public.madmex_predictobject.the_geom,
+    public.madmex_tag.numeric_code
+FROM
+    public.madmex_predictclassification
+INNER JOIN
+    public.madmex_predictobject ON public.madmex_predictclassification.predict_object_id = public.madmex_predictobject.id
+    AND st_intersects(public.madmex_predictobject.the_geom, st_makeenvelope(%(xmin)s, %(ymin)s, %(xmax)s, %(ymax)s, 4326))
+    AND public.madmex_predictclassification.name = %(classification)s
+INNER JOIN
+    public.madmex_tag ON public.madmex_predictclassification.tag_id = public.madmex_tag.id
+    """,
+    # ORM query of the db_to_vector command, with the region replaced by the bbox
+    'db_to_vector': """
+SELECT
+    cl.id,
+    cl.tag_id,
+    obj.the_geom
+FROM
+    public.madmex_predictclassification AS cl
+INNER JOIN
+    public.madmex_predictobject AS obj ON cl.predict_object_id = obj.id
+WHERE
+    cl.name = %(classification)s
+    AND
+    obj.segmentation_information_id = %(segmentation_id)s
+    AND
+    st_intersects(obj.the_geom, st_makeenvelope(%(xmin)s, %(ymin)s, %(xmax)s, %(ymax)s, 4326))
+    """,
+    # madmex.validation.query_validation_intersect, with the validation temp table
+    # inlined as a subquery
+    'query_validation_intersect': """
+SELECT
+    st_asgeojson(obj.the_geom, 6),
+    tag.numeric_code
+FROM
+    public.madmex_predictclassification AS cl
+INNER JOIN
+    public.madmex_predictobject AS obj ON cl.predict_object_id = obj.id
+INNER JOIN
+    (SELECT vo.the_geom AS geom
+     FROM public.madmex_validclassification AS vc
+     INNER JOIN public.madmex_validobject AS vo ON vc.valid_object_id = vo.id
+     WHERE vc.valid_set = %(validation)s
+     AND st_intersects(vo.the_geom, st_makeenvelope(%(xmin)s, %(ymin)s, %(xmax)s, %(ymax)s, 4326))
+    ) AS validation ON st_intersects(validation.geom, obj.the_geom)
+INNER JOIN
+    public.madmex_tag AS tag ON cl.tag_id = tag.id
+WHERE
+    cl.name = %(classification)s
+    AND
+    obj.segmentation_information_id = %(segmentation_id)s
+    """,
+}
+
+
+def explain(cursor, query, params):
+    cursor.execute('EXPLAIN (ANALYZE, BUFFERS) ' + query, params)
+    plan = '\n'.join(row[0] for row in cursor.fetchall())
+    time = float(re.search(r'Execution time: ([0-9.]+) ms', plan).group(1))
+    buffers = re.search(r'Buffers: shared(?: hit=(\d+))?(?: read=(\d+))?', plan)
+    hit, read = [int(x) if x else 0 for x in buffers.groups()] if buffers else (0, 0)
+    return time, hit, read, plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--segmentation', type=str, required=True)
+    parser.add_argument('--classification', type=str, required=True)
+    parser.add_argument('--bbox', type=float, nargs=4, required=True,
+                        help='xmin ymin xmax ymax in longlat')
+    parser.add_argument('--validation', type=str, default=None,
+                        help='Validation set used by query_validation_intersect, skipped when not set')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--plans', action='store_true',
+                        help='Print the query plans')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'madmex.settings')
+    django.setup()
+    from django.db import connection
+    from madmex.util.db import get_segmentation_ids
+
+    segmentation_ids = get_segmentation_ids(args.segmentation)
+    if len(segmentation_ids) != 1:
+        parser.error('%d segmentations named %s, queries are timed for a single one'
+                     % (len(segmentation_ids), args.segmentation))
+    params = dict(zip(['xmin', 'ymin', 'xmax', 'ymax'], args.bbox),
+                  segmentation_id=segmentation_ids[0],
+                  classification=args.classification, validation=args.validation)
+    row_format = '{:<35}{:>12}{:>12}{:>12}'
+    print(row_format.format('Query', 'Time (ms)', 'Hit', 'Read'))
+    with connection.cursor() as c:
+        for name, query in QUERIES.items():
+            if name == 'query_validation_intersect' and args.validation is None:
+                continue
+            # Best of repeat runs
+            results = [explain(c, query, params) for _ in range(args.repeat)]
+            time, hit, read, plan = min(results, key=lambda x: x[0])
+            print(row_format.format(name, '%.1f' % time, hit, read))
+            if args.plans:
+                print(plan)
+
+
+if __name__ == '__main__':
+    main()
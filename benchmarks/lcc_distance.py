@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+"""
+Purpose: Compare run time and peak memory of the chunked distance kernel
+    (madmex.lcc.transform.distance) against the previous full array implementation
+    of the distance change detection algorithm
+
+Usage:
+    python benchmarks/lcc_distance.py --bands 6 --size 3000
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from madmex.lcc.transform.distance import Transform as Distance
+
+
+def previous(arr0, arr1):
+    """Euclidean distance as computed by madmex.lcc.bitemporal.distance before the kernel
+
+    Histogram matching used to return a float64 array, hence the cast
+    """
+    return np.linalg.norm(arr0.astype(np.float64) - arr1, axis=0)
+
+
+def kernel(arr0, arr1, metric='euclidean', chunk_size=256):
+    return Distance(arr0, arr1, metric=metric, chunk_size=chunk_size).transform()
+
+
+def profile(fun, *args, **kwargs):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fun(*args, **kwargs)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bands', type=int, default=6)
+    parser.add_argument('--size', type=int, default=3000)
+    parser.add_argument('--chunk_size', type=int, default=256)
+    args = parser.parse_args()
+
+    shape = (args.bands, args.size, args.size)
+    arr0 = np.random.randint(1, 10000, shape).astype(np.int16)
+    arr1 = np.random.randint(1, 10000, shape).astype(np.int16)
+
+    row_format = '{:<25}{:>12}{:>18}'
+    print(row_format.format('Implementation', 'Time (s)', 'Peak memory (MB)'))
+    print(row_format.format('previous (euclidean)',
+                            *['%.2f' % x for x in profile(previous, arr0, arr1)]))
+    for metric in ['euclidean', 'angle', 'mahalanobis']:
+        print(row_format.format('kernel (%s)' % metric,
+                                *['%.2f' % x for x in profile(kernel, arr0, arr1,
+                                                              metric=metric,
+                                                              chunk_size=args.chunk_size)]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""Concurrent and resumable download of remote files
+
+Files are downloaded by a bounded pool of threads sharing a pooled HTTP session.
+Data is written to a ``.part`` file that is resumed with an HTTP Range request when a
+previous download was interrupted, and only renamed to its final name once its size
+(and optionally its md5 checksum) has been verified. A file present under its final
+name is therefore complete.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+import logging
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadError(Exception):
+    """Raised when a downloaded file does not match its expected size or checksum"""
+    pass
+
+
+def make_session(pool_size=4, retries=5, methods=None):
+    """Build an HTTP session with a connection pool and retries on transient errors
+
+    Args:
+        pool_size (int): Number of connections kept open per host. Should match the
+            number of threads sharing the session
+        retries (int): Number of retries of failed connections and 5xx responses
+        methods (iterable): HTTP methods retried on read errors and 5xx responses.
+            Defaults to the idempotent methods retried by urllib3, add ``'POST'`` for
+            apis whose POST requests have no side effects (e.g. searches)
+
+    Return:
+        requests.Session: The session
+    """
+    session = requests.Session()
+    kwargs = {}
+    if methods is not None:
+        # Renamed in urllib3 1.26
+        if hasattr(Retry, 'DEFAULT_ALLOWED_METHODS'):
+            kwargs['allowed_methods'] = frozenset(methods)
+        else:
+            kwargs['method_whitelist'] = frozenset(methods)
+    retry = Retry(total=retries, backoff_factor=1,
+                  status_forcelist=(500, 502, 503, 504), **kwargs)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                          max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def md5sum(filepath, chunk_size=2**20):
+    """Compute the md5 hexadecimal digest of a file
+    """
+    md5 = hashlib.md5()
+    with open(filepath, 'rb') as src:
+        for block in iter(lambda: src.read(chunk_size), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def fetch_checksum(session, url):
+    """Read an md5 checksum file (``<digest>  <filename>``) served at url
+    """
+    response = session.get(url, timeout=60)
+    response.raise_for_status()
+    return response.text.split()[0].lower()
+
+
+def _verify(filepath, size=None, checksum=None):
+    if size is not None and os.path.getsize(filepath) != size:
+        raise DownloadError('%s: expected %d bytes, got %d' % (filepath, size,
+                                                             os.path.getsize(filepath)))
+    if checksum is not None and md5sum(filepath) != checksum:
+        raise DownloadError('%s: checksum mismatch' % filepath)
+
+
+def download_file(session, url, directory, checksum=None, chunk_size=2**20):
+    """Download a file, resuming a previous partial download
+
+    Args:
+        session (requests.Session): HTTP session, see ``make_session``
+        url (str): Url of the file
+        directory (str): Directory where the file is written, must exist
+        checksum (str): Optional expected md5 hexadecimal digest, or url of an md5
+            checksum file
+        chunk_size (int): Size of the blocks written to disk
+
+    Return:
+        str: Path of the downloaded file
+
+    Raises:
+        DownloadError: When the size or checksum of the downloaded file is wrong. The
+        partial file is removed so that the next attempt starts from scratch
+    """
+    if checksum is not None and '://' in checksum:
+        checksum = fetch_checksum(session, checksum)
+    filepath = os.path.join(directory, url.split('/')[-1])
+    if os.path.isfile(filepath):
+        # Files downloaded with earlier tools may be truncated
+        if checksum is not None:
+            try:
+                _verify(filepath, checksum=checksum)
+                return filepath
+            except DownloadError:
+                pass
+        else:
+            head = session.head(url, allow_redirects=True, timeout=60)
+            length = head.headers.get('content-length')
+            if length is None or int(length) == os.path.getsize(filepath):
+                return filepath
+        logger.info('%s is incomplete, downloading it again', filepath)
+        os.rename(filepath, filepath + '.part')
+    part = filepath + '.part'
+    offset = os.path.getsize(part) if os.path.isfile(part) else 0
+    headers = {'Range': 'bytes=%d-' % offset} if offset else {}
+    with session.get(url, headers=headers, stream=True, timeout=60) as response:
+        if response.status_code == 416:
+            # Nothing left to download, total size is given as bytes */<size>
+            content_range = response.headers.get('content-range')
+            size = int(content_range.split('/')[-1]) if content_range else None
+        else:
+            response.raise_for_status()
+            if response.status_code == 206:
+                size = int(response.headers['content-range'].split('/')[-1])
+                mode = 'ab'
+            else:
+                # Range not supported or no partial file
+                length = response.headers.get('content-length')
+                size = int(length) if length is not None else None
+                mode = 'wb'
+            with open(part, mode) as dst:
+                for block in response.iter_content(chunk_size=chunk_size):
+                    dst.write(block)
+    try:
+        _verify(part, size=size, checksum=checksum)
+    except DownloadError:
+        os.remove(part)
+        raise
+    os.rename(part, filepath)
+    return filepath
+
+
+def download_files(items, directory, workers=4, session=None):
+    """Download files concurrently
+
+    Args:
+        items (list): List of (url, checksum) tuples, checksum being an md5
+            hexadecimal digest, the url of an md5 checksum file or None
+        directory (str): Directory where the files are written, created if needed
+        workers (int): Number of concurrent downloads
+        session (requests.Session): Optional session, a pooled session sized for
+            the workers is created when None
+
+    Return:
+        generator: (url, filepath, error) tuples yielded in completion order; filepath
+        is None and error the raised exception when a download failed
+
+    Example:
+        >>> from madmex.api.download import download_files
+        >>> items = [('https://host/file_1.tar.gz', None), ('https://host/file_2.tar.gz', None)]
+        >>> for url, filepath, error in download_files(items, '/tmp/downloads', workers=2):
+        ...     print(url, filepath, error)
+    """
+    os.makedirs(directory, exist_ok=True)
+    if session is None:
+        session = make_session(pool_size=workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(download_file, session, url, directory, checksum): url
+                   for url, checksum in items}
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                yield url, future.result(), None
+            except Exception as e:
+                logger.error('Download of %s failed: %s', url, e)
+                yield url, None, e
+
+
+def download_order(order, client, directory, workers=4, session=None):
+    """Download the items of an ESPA order, skipping those downloaded by a previous run
+
+    The outcome of every item is recorded in ``order.progress`` (item url to path of
+    the downloaded file, or error message) and saved as soon as it is known, so that
+    an interrupted run can be resumed. ``order.downloaded`` is set once every item of
+    the order is on disk.
+
+    Args:
+        order (madmex.models.Order): The order
+        client (madmex.api.remote.EspaApi): Client used to list the items of the order
+        directory (str): Directory where the files are written
+        workers (int): Number of concurrent downloads
+        session (requests.Session): Optional session, see ``download_files``
+
+    Return:
+        bool: Whether all the items of the order are downloaded
+    """
+    payload = client.get_list_order(order.order_id)
+    items = {}
+    for image in payload[order.order_id]:
+        if image['product_dload_url']:
+            items[image['product_dload_url']] = image.get('cksum_download_url') or None
+        else:
+            logger.info('Skipping bad file')
+    # Items downloaded by a previous run are skipped
+    todo = [(url, checksum) for url, checksum in items.items()
+            if not os.path.isfile(order.progress.get(url, ''))]
+    logger.info('%d of %d items left to download', len(todo), len(items))
+    for url, filepath, error in download_files(todo, directory, workers=workers,
+                                               session=session):
+        order.progress[url] = filepath if error is None else 'error: %s' % error
+        order.save(update_fields=['progress'])
+        logger.info('Download %s: %s', url, order.progress[url])
+    order.downloaded = all(os.path.isfile(order.progress.get(url, ''))
+                           for url in items)
+    order.save()
+    return order.downloaded
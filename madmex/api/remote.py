@@ -3,14 +3,24 @@ Created on Dec 13, 2017
 
 @author: agutierrez
 '''
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timedelta
+import hashlib
 import json
 import logging
+import math
+import os
 import sys
+import tempfile
+import threading
+import time
 
 import requests
 
+from madmex.api.download import make_session
 from madmex.settings import USGS_USER, USGS_PASSWORD, SCIHUB_USER, \
-    SCIHUB_PASSWORD
+    SCIHUB_PASSWORD, TEMP_DIR
 
 
 logger = logging.getLogger(__name__)
@@ -18,17 +28,102 @@ logger = logging.getLogger(__name__)
 espa_version = 'v1'
 usgs_version = 'stable'
 
+class RateLimiter():
+    '''Thread safe limiter spacing calls evenly at a maximum rate
+
+    Args:
+        rate (float): Maximum number of calls per second, no limit when None
+    '''
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_call = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        '''Block until the next call is allowed
+        '''
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def split_extent(extent, step):
+    '''Split an extent in a grid of sub-extents
+
+    Args:
+        extent: Tuple (min_lon, min_lat, max_lon, max_lat)
+        step: Size of the sub-extents in degrees
+
+    Returns:
+        A list of (min_lon, min_lat, max_lon, max_lat) tuples covering the extent
+    '''
+    xmin, ymin, xmax, ymax = extent
+    nx = max(1, int(math.ceil((xmax - xmin) / step)))
+    ny = max(1, int(math.ceil((ymax - ymin) / step)))
+    return [(xmin + i * step, ymin + j * step,
+             min(xmax, xmin + (i + 1) * step), min(ymax, ymin + (j + 1) * step))
+            for j in range(ny) for i in range(nx)]
+
+
+def split_dates(start_date, end_date, days):
+    '''Split a time window in consecutive windows
+
+    Args:
+        start_date: The start date in a format yyyy-mm-dd, the window is not split when None.
+        end_date: The end date in a format yyyy-mm-dd, the window is not split when None.
+        days: Maximum length of the windows in days.
+
+    Returns:
+        A list of (start_date, end_date) tuples, both dates inclusive.
+    '''
+    if not start_date or not end_date:
+        return [(start_date, end_date)]
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    end = datetime.strptime(end_date, '%Y-%m-%d')
+    windows = []
+    while start <= end:
+        window_end = min(end, start + timedelta(days=days - 1))
+        windows.append((start.strftime('%Y-%m-%d'), window_end.strftime('%Y-%m-%d')))
+        start = window_end + timedelta(days=1)
+    return windows
+
+
 class UsgsApi():
-    def __init__(self):
+    def __init__(self, host=None, username=None, password=None, rate_limit=2,
+                 pool_size=4, cache_dir=None, cache_max_age=30, cache_lag=30):
         '''
         This is the constructor, it creates an object that holds
         credentials to usgs portal. 
+
+        Args:
+            host: Url of the api, defaults to the earth explorer inventory api.
+            username: User name, defaults to USGS_USER.
+            password: Password, defaults to USGS_PASSWORD.
+            rate_limit: Maximum number of requests per second sent to the api.
+            pool_size: Number of connections kept open, should match the number
+                of concurrent requests.
+            cache_dir: Directory where search responses are cached, defaults to
+                TEMP_DIR/usgs_cache.
+            cache_max_age: Number of days after which cached responses are requested
+                again.
+            cache_lag: Searches whose time window is open or ends less than cache_lag
+                days ago are never cached, recent scenes are still being added and
+                their metadata updated.
         '''
-        if USGS_USER != None and USGS_PASSWORD != None:
-            self.username = USGS_USER
-            self.password = USGS_PASSWORD
-            self.host = 'https://earthexplorer.usgs.gov/inventory/json/v/%s' % usgs_version
+        self.username = username if username is not None else USGS_USER
+        self.password = password if password is not None else USGS_PASSWORD
+        if self.username != None and self.password != None:
+            self.host = host or 'https://earthexplorer.usgs.gov/inventory/json/v/%s' % usgs_version
             self.api_key = None
+            # Api calls are POST requests without side effects, safe to retry
+            self.session = make_session(pool_size=pool_size, methods=('GET', 'HEAD', 'POST'))
+            self.rate_limiter = RateLimiter(rate_limit)
+            self.cache_dir = cache_dir or os.path.join(TEMP_DIR, 'usgs_cache')
+            self.cache_max_age = cache_max_age
+            self.cache_lag = cache_lag
         else:
             logger.error('Please add the usgs credentials to the .env file.')
             sys.exit(-1)
@@ -40,7 +135,8 @@ class UsgsApi():
         depending on whether data parameter is given or not, it makes
         a GET or a POST request. It requires an endpoint to query the
         api if an invalid request is given, then the aip will answer
-        with a 404 error message.
+        with a 404 error message. Requests share a pooled session and are
+        spaced according to the rate limit of the client.
         
         Args:
             endpoint: The endpoint to be consumed.
@@ -50,14 +146,46 @@ class UsgsApi():
             A dictionary representing the json response.
         '''
         url = self.host + endpoint
-        logger.info(url)
+        logger.debug(url)
+        self.rate_limiter.wait()
         if not payload:
-            response = requests.get(url)
+            response = self.session.get(url, timeout=300)
         else: # a POST request
-            response = requests.post(url, data=payload)
+            response = self.session.post(url, data=payload, timeout=300)
         data = response.json()
         return data
-    
+
+    def _cached_request(self, endpoint, data):
+        '''Send a request, reading the response from the on disk cache when present.
+
+        Responses are cached under a key derived from the endpoint and the request
+        data (excluding the api key). Responses reporting an error, and responses
+        of time windows ending after cache_lag days ago, are not cached. Entries older
+        than cache_max_age days are ignored and replaced.
+        '''
+        payload = {'jsonRequest': json.dumps(data)}
+        end_date = data.get('endDate')
+        if (end_date is None or datetime.strptime(end_date, '%Y-%m-%d') >
+                datetime.now() - timedelta(days=self.cache_lag)):
+            return self._consume_api_requests(endpoint, payload)
+        query = {k: v for k, v in data.items() if k != 'apiKey'}
+        key = hashlib.sha1(json.dumps([endpoint, query], sort_keys=True).encode()).hexdigest()
+        path = os.path.join(self.cache_dir, '%s.json' % key)
+        try:
+            if time.time() - os.path.getmtime(path) < self.cache_max_age * 86400:
+                with open(path) as src:
+                    return json.load(src)
+        except (OSError, ValueError):
+            pass
+        response = self._consume_api_requests(endpoint, payload)
+        if not response.get('error'):
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as dst:
+                json.dump(response, dst)
+            os.replace(tmp, path)
+        return response
+
     def login(self):
         '''Function to log into the USGS query service.
 
@@ -68,8 +196,8 @@ class UsgsApi():
         Returns:
             True if the login was successful; False otherwise.
         '''
-        data = {'username': USGS_USER,
-                'password': USGS_PASSWORD}
+        data = {'username': self.username,
+                'password': self.password}
         payload = {'jsonRequest': json.dumps(data)}
         endpoint = '/login'
         response = self._consume_api_requests(endpoint, payload)
@@ -80,13 +208,14 @@ class UsgsApi():
             return False
         return True
     
-    def search(self, extent, collection, node='EE', start_date=None, end_date=None, starting_number=1, max_results=50000, max_cloud_cover=100):
+    def search(self, extent, collection, node='EE', start_date=None, end_date=None, starting_number=1, max_results=50000, max_cloud_cover=100, cache=True):
         '''Queries the USGS api for images in a given extent.
 
         This service requires to be logged into USGS. It is limited to an extent of interest which
         must be a square and it is not suited for more complex polygons. It paginates automatically
         so in order to pull a big set, the query can be split. This behaviour can be controlled by using
-        the max results and starting number attributes. Temporal queries are available by
+        the max results and starting number attributes, or by using iter_search that does it
+        automatically. Temporal queries are available by
         providing a time window. Several collections are available, as of the moment of writing this, only
         collection 1 items are available, so the query must be suffixed with that information, for example:
         LANDSAT_8_C1 would be a valid collection. Details on the api can be found in https://earthexplorer.usgs.gov/inventory
@@ -100,6 +229,8 @@ class UsgsApi():
             starting_number: An int representing where the query should start.
             max_results: The maximum number of scenes that the request will return.
             max_cloud_cover: Limit results by maximum cloud cover between 0-100.
+            cache: Whether to read and write the response from the on disk cache (see
+                the cache_max_age and cache_lag arguments of the constructor).
         Returns:
             The response from the service.
         '''
@@ -132,16 +263,98 @@ class UsgsApi():
             if starting_number:
                 data['startingNumber'] = starting_number
 
-            payload= {'jsonRequest': json.dumps(data)}
-            print(json.dumps(payload, indent=4))
             endpoint = '/search'
-            response = self._consume_api_requests(endpoint, payload)
-            print (response)
+            if cache:
+                response = self._cached_request(endpoint, data)
+            else:
+                response = self._consume_api_requests(endpoint, {'jsonRequest': json.dumps(data)})
         else:
             logger.debug('The client is not logged in, or the key has expired.')
             response = {'error':'Must log into the USGS service in order to use this function.'}
         return response
 
+    def iter_search(self, extent, collection, start_date=None, end_date=None, step=5,
+                    days=366, page_size=5000, workers=4, **kwargs):
+        '''Queries the USGS api for all the images in a large extent and time window.
+
+        The extent and the time window are split in sub-queries whose pages are fetched
+        concurrently (within the rate limit of the client). The first page of every
+        sub-query is requested first, the following pages are requested once the total
+        number of hits of the sub-query is known. At most twice as many requests as
+        workers are submitted at once. Scenes found by several sub-queries are only
+        returned once.
+
+        Args:
+            extent: The extent of the query in a tuple such as (min_lon, min_lat, max_lon, max_lat)
+            collection: A string that represents the collection of interest for example LANDSAT_8_C1
+            start_date: The start date for the temporal window in a format yyyy-mm-dd.
+            end_date: The end date for the temporal window in a format yyyy-mm-dd.
+            step: Size in degrees of the sub-extents.
+            days: Maximum length in days of the sub-windows.
+            page_size: Number of scenes requested per page.
+            workers: Number of concurrent requests.
+            **kwargs: Additional arguments passed to search (node, max_cloud_cover, cache).
+
+        Returns:
+            A generator of the scenes (dictionaries as returned by the api), in the
+            order in which pages are received.
+
+        Raises:
+            ValueError: When the api answers with an error.
+
+        Example:
+            >>> from madmex.api.remote import UsgsApi
+            >>> client = UsgsApi()
+            >>> client.login()
+            >>> scenes = client.iter_search((-118.4, 14.5, -86.7, 32.7), 'LANDSAT_8_C1',
+            ...                             start_date='2017-01-01', end_date='2017-12-31')
+            >>> ids = [scene['displayId'] for scene in scenes]
+        '''
+        queries = deque(((sub_extent, window), 1)
+                        for sub_extent in split_extent(extent, step)
+                        for window in split_dates(start_date, end_date, days))
+        seen = set()
+        pending = {}
+        executor = ThreadPoolExecutor(max_workers=workers)
+
+        def submit():
+            # Requests are submitted as others complete, so that stopping early does
+            # not leave a backlog of queued requests
+            while queries and len(pending) < 2 * workers:
+                query, starting_number = queries.popleft()
+                sub_extent, (start, end) = query
+                future = executor.submit(self.search, sub_extent, collection,
+                                         start_date=start, end_date=end,
+                                         starting_number=starting_number,
+                                         max_results=page_size, **kwargs)
+                pending[future] = (query, starting_number)
+
+        try:
+            submit()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    query, starting_number = pending.pop(future)
+                    response = future.result()
+                    if response.get('error'):
+                        raise ValueError('USGS api error: %s' % response['error'])
+                    data = response.get('data') or {}
+                    if starting_number == 1:
+                        total = data.get('totalHits', 0)
+                        queries.extend((query, number) for number in
+                                       range(1 + page_size, total + 1, page_size))
+                    for scene in data.get('results', []):
+                        if scene['entityId'] not in seen:
+                            seen.add(scene['entityId'])
+                            yield scene
+                submit()
+        finally:
+            # Error or generator closed by the consumer, requests not started yet are
+            # dropped and running ones are not waited for
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
     def logout(self):
         '''Function to log out the USGS query service.
 
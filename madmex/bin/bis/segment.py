@@ -27,6 +27,9 @@ Revisions:
 20120510 Essential functionality refactored from BIS 1.0rc8
 """
 import os
+import contextlib
+import multiprocessing
+import threading
 import numpy as np
 from . import image_gdal as image
 from . import tools
@@ -37,7 +40,7 @@ except ImportError as e:
     print("ERROR: %s" % e)
 
 def segment(imagefile, t=10, s=0.5, c=0.5, tile=False, xt=5, rows=1000, mp=True,
-            nodata=None):
+            nodata=None, workers=None):
     """Open image and send array to segment, save regions as int image file.
     
     't' is threshold integer or ordered list to kick out multiple thresholds.
@@ -46,6 +49,7 @@ def segment(imagefile, t=10, s=0.5, c=0.5, tile=False, xt=5, rows=1000, mp=True,
     'xt' is the tile threshold, raise to put more merging in the tile phase.
     'rows' is the size of the tiles (strips). If RAM problems, decrease this.
     'mp' uses Python multiprocessing module to dispatch tiles to cores.
+    'workers' is the number of tiles processed at once, defaults to cpu count.
     'nodata' is None for off or a masking integer, zero is OK to mask 0.
       Each band of a pixel must have the value to be recognized as nodata.
     
@@ -86,7 +90,7 @@ def segment(imagefile, t=10, s=0.5, c=0.5, tile=False, xt=5, rows=1000, mp=True,
     if not isinstance(t, list):
         t = [t]
     array = image.read(imagefile)
-    generator = segment_gen(array, t, s, c, tile, xt, rows, mp, nodata)
+    generator = segment_gen(array, t, s, c, tile, xt, rows, mp, nodata, workers)
     outfiles = []
     for regions, ti in zip(generator, t):
         outfile = name(imagefile, ti, s, c)
@@ -95,7 +99,7 @@ def segment(imagefile, t=10, s=0.5, c=0.5, tile=False, xt=5, rows=1000, mp=True,
     return outfiles
 
 def segment_gen(array, t=[10], s=0.5, c=0.5, tile=False, xt=5, rows=1000,
-                       mp=True, nodata=None):
+                       mp=True, nodata=None, workers=None):
     """Segment 3D array one threshold at a time and generate the region grids.
     
     Send an array to this function for raw capability to generate array output.
@@ -109,7 +113,7 @@ def segment_gen(array, t=[10], s=0.5, c=0.5, tile=False, xt=5, rows=1000,
     if tile:
         if not t[0] > xt:
             raise ValueError("First t must be larger than tiling threshold xt")
-        merger = segmentor_tiles(array, s, c, xt, rows, mp, nodata)
+        merger = segmentor_tiles(array, s, c, xt, rows, mp, nodata, workers)
     else:
         merger = segmentor(array, s, c, nodata=nodata)
     height, width, nbands = array.shape
@@ -144,9 +148,18 @@ def segmentor(array, s=0.5, c=0.5, istile=False, xt=5, nodata=None):
         return merger
 
 def segmentor_tiles(array, s=0.5, c=0.5, xt=5, rows=1000, mp=True,
-                    nodata=None):
+                    nodata=None, workers=None):
     """Split image by rows, segment the tiles, then combine to new object.
     
+    Tiles are never copied to the workers. Worker processes are always forked
+    (whatever the default start method) and read their rows from the parent array
+    they inherit. Daemonic processes such as dask workers are allowed to fork them
+    too (see _fork_map). Where fork is not available the tiles are processed
+    serially: cregionmerge never releases the GIL (it does not call
+    PyEval_SaveThread), so a thread pool would not run them in parallel.
+    Frozen tile states are combined in row order whatever the order in which the
+    tiles complete, so the output does not depend on mp or workers.
+    
     >>> segmentor_tiles(np.array([[[1, 1, 1]], [[2, 2, 2]]]), rows=1, mp=False)
     ...   #doctest:+ELLIPSIS
     <cregionmerge.cmerger object at 0x...>
@@ -164,21 +177,101 @@ def segmentor_tiles(array, s=0.5, c=0.5, xt=5, rows=1000, mp=True,
     >>> tiled.max()+1, untiled.max()+1 # ...but close, similar num of segments.
     (335, 338)
     >>> os.remove('test/ag.bmp_10_05_05.tif')
+    >>> im = image.read('test/ag.bmp')
+    >>> serial = list(segment_gen(im, tile=True, rows=30, mp=False))[0]
+    >>> forked = list(segment_gen(im, tile=True, rows=30, workers=3))[0]
+    >>> image.compare(serial, forked) # Seams merged identically
+    True
+    >>> again = list(segment_gen(im, tile=True, rows=30, workers=3))[0]
+    >>> image.compare(forked, again) # Not depending on tiles completion order
+    True
     """
-    tiles = split(array, rows)
-    if mp:
-        freezes = tools.map(segmentor,
-                           [(a, s, c, True, xt, nodata) for a in tiles])
+    height, width, nbands = array.shape
+    bounds = strips(height, rows)
+    if not mp or len(bounds) == 1 or not _can_fork():
+        freezes = [segmentor(array[start:stop], s, c, True, xt, nodata)
+                   for start, stop in bounds]
     else:
-        freezes = [segmentor(a, s, c, True, xt, nodata) for a in tiles]
+        # Forked children inherit the array, only row bounds are sent to them
+        _shared['array'] = array
+        try:
+            freezes = _fork_map(_strip_segmentor,
+                                [(None, start, stop, s, c, xt, nodata)
+                                 for start, stop in bounds], workers)
+        finally:
+            _shared.clear()
     tot_regions = sum([freeze['j'].max() + 1 for freeze in freezes])
-    height, width, nbands = array.shape
     nd, ndv = nodata_(nodata)
     big = cregionmerge.cmerger(None, tot_regions, width, height, nbands, s, c,
                                no_load=True, nodata=nd, nd_val=ndv)
     combine(big, freezes, width, xt, nd=nd)
     return big
 
+# Array being tiled, set by segmentor_tiles before forking its worker processes
+_shared = {}
+
+# Number of _fork_map calls running in this process, the daemon flag of the process
+# is cleared while there is any
+_forking = {'count': 0, 'daemon': False}
+_forking_lock = threading.Lock()
+
+def _can_fork():
+    """Whether worker processes can be started with the fork start method.
+    """
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+@contextlib.contextmanager
+def _children_allowed():
+    """Let the current process start child processes even if it is daemonic.
+    
+    multiprocessing refuses to start children from daemonic processes (e.g. dask
+    worker processes). The pools started here are closed and joined before leaving,
+    and their processes are themselves daemonic, so that they are terminated with
+    their parent. Thread safe, the flag is restored when the last caller leaves.
+    """
+    config = multiprocessing.current_process()._config
+    with _forking_lock:
+        if _forking['count'] == 0:
+            _forking['daemon'] = config.get('daemon', False)
+            config['daemon'] = False
+        _forking['count'] += 1
+    try:
+        yield
+    finally:
+        with _forking_lock:
+            _forking['count'] -= 1
+            if _forking['count'] == 0:
+                config['daemon'] = _forking['daemon']
+
+def _fork_map(function, args_list, processes=None):
+    """tools.map with forked worker processes, also from daemonic processes.
+    
+    >>> _fork_map(tools._f, [(1, 1), (2, 2)], 2)
+    [2, 4]
+    """
+    with _children_allowed():
+        return tools.map(function, args_list, processes,
+                         context=multiprocessing.get_context('fork'))
+
+def _strip_segmentor(array, start, stop, s, c, xt, nodata):
+    """Segment rows start to stop of array, or of the shared array if None.
+    """
+    if array is None:
+        array = _shared['array']
+    return segmentor(array[start:stop], s, c, True, xt, nodata)
+
+def strips(height, rows=1000):
+    """Return (start, stop) row bounds of the tiles, as split does.
+    
+    >>> strips(3, 1)
+    [(0, 1), (1, 2), (2, 3)]
+    >>> strips(3, 2)
+    [(0, 2), (2, 3)]
+    >>> strips(3) # If no splitting happening
+    [(0, 3)]
+    """
+    return [(start, min(start + rows, height)) for start in range(0, height, rows)]
+
 def split(array, rows=1000):
     """Return list of views into mama array given how many rows per tile.
     
@@ -8,6 +8,7 @@ For the GDAL/OGR copyright notice and license please see:
   http://svn.osgeo.org/gdal/trunk/gdal/LICENSE.TXT
 """
 import os
+from collections import OrderedDict
 import numpy as np
 from osgeo import ogr
 from .image_gdal import read
@@ -22,17 +23,17 @@ def stats(imagefile, regionfile, vectorfile, outfile=None,
     
     Use this on segmentation output data: original image name, the output
     segments image name, and a filename to save stats as a CSV.
+    Returns the columnar table (ordered dict of 1D arrays) of rstats_columns
+    with the vector statistics inserted after the 'id' column.
     
-    >>> stats('test/ag.bmp', 'test/output.tif', 'test/output.tif.shp',
+    >>> columns = stats('test/ag.bmp', 'test/output.tif', 'test/output.tif.shp',
     ...   'statstest.csv',
     ...   vfunctions={'area': lambda d: d['geometry'].Area()},
-    ...   rfunctions={'max': lambda a: a.max()}) #doctest:+ELLIPSIS
-    {0: {'b2_max': 74, 'b0_max': 152, 'id': 0, 'b1_max': 74, ...}...
+    ...   rfunctions={'max': lambda a: a.max()})
+    >>> list(columns)
+    ['id', 'area', 'b0_max', 'b1_max', 'b2_max']
     >>> open('statstest.csv').read() #doctest:+ELLIPSIS
     'id,area,b0_max,b1_max,b2_max\n0,15200.0,152,74,74\n1...'
-    >>> stats('test/ag.bmp', 'test/output.tif', 'test/output.tif.shp',
-    ...       'statstest.csv') #doctest:+ELLIPSIS
-    {0: {'compact': 93699.092845128442,... 'id': 0, 'b2_min': 36,...}...}
     >>> os.remove('statstest.csv')
     """
     if isinstance(vfunctions, str):
@@ -42,12 +43,20 @@ def stats(imagefile, regionfile, vectorfile, outfile=None,
     source = ogr.Open(vectorfile)
     shapes, regions = list(zip(*[(f.geometry().Clone(), f['id']) for f in source[0]]))
     vtable = vstats(shapes, regions, functions=vfunctions)
-    rtable = rstats(read(imagefile), read(regionfile), functions=rfunctions)
-    for r in vtable:
-        vtable[r].update(rtable[r])
+    rcolumns = rstats_columns(read(imagefile), read(regionfile),
+                              functions=rfunctions)
+    ids = rcolumns.pop('id')
+    # Raster labels without a polygon (e.g. nodata) are dropped, as rows are
+    # those of the vector file
+    keep = np.array([r in vtable for r in ids.tolist()], dtype=bool)
+    ids = ids[keep]
+    columns = OrderedDict([('id', ids)])
+    for name in sorted(vfunctions):
+        columns[name] = np.array([vtable[r][name] for r in ids.tolist()])
+    columns.update((name, column[keep]) for name, column in rcolumns.items())
     if outfile:
-        tools.csvwrite(outfile, vtable, key_field='id')
-    return vtable
+        tools.csvwrite_columns(outfile, columns)
+    return columns
 
 def vstats(shapes, regions, functions={}):
     """Compute vector stats given a list of polgons and their ids.
@@ -69,9 +78,64 @@ def vstats(shapes, regions, functions={}):
         table[region] = row
     return table
 
+def group(regions):
+    """Sort pixels by region id, the only O(pixels log pixels) step of rstats.
+    
+    Returns the pixel order, the ids of the regions present in the image, the
+    position of the first pixel of each region in the sorted order and the
+    pixel count of each region.
+    
+    >>> order, ids, starts, counts = group(np.array([[2, 0, 2, 2]]))
+    >>> order.tolist(), ids.tolist(), starts.tolist(), counts.tolist()
+    ([1, 0, 2, 3], [0, 2], [0, 1], [1, 3])
+    """
+    regions_flat = regions.ravel()
+    order = np.argsort(regions_flat, kind='mergesort')
+    regions_sorted = regions_flat[order]
+    starts = np.concatenate(([0], np.flatnonzero(regions_sorted[1:] !=
+                                                 regions_sorted[:-1]) + 1))
+    counts = np.diff(np.append(starts, regions_sorted.size))
+    return order, regions_sorted[starts], starts, counts
+
+def rstats_columns(image, regions, functions={}):
+    """Compute raster statistics for all image objects at once, as columns.
+    
+    Pixels are sorted by region once, then every band is reordered and each
+    function is computed for all regions in one call. Functions with a true
+    'vectorized' attribute receive (values, starts, counts), the band values
+    sorted by region plus the output of group(), and return one value per
+    region; see stats_raster module. Other functions are called per region
+    with a 1D array, like in the original rstats.
+    
+    Returns an ordered dict of 1D arrays, the 'id' column first, with one
+    row per region present in the regions image.
+    
+    >>> functions = {'max': lambda a: a.max(), 'min': lambda a: a.min()}
+    >>> columns = rstats_columns(np.array([[[10], [20], [21]]]),
+    ...                          np.array([[0, 1, 1]]), functions=functions)
+    >>> [(k, v.tolist()) for k, v in columns.items()]
+    [('id', [0, 1]), ('b0_max', [10, 21]), ('b0_min', [10, 20])]
+    """
+    nbands = image.shape[-1]
+    order, ids, starts, counts = group(regions)
+    columns = OrderedDict([('id', ids)])
+    pixels_flat = image.reshape((-1, nbands))
+    for b in range(nbands):
+        values = pixels_flat[:, b][order]
+        for name, function in sorted(functions.items()):
+            if getattr(function, 'vectorized', False):
+                column = function(values, starts, counts)
+            else:
+                column = np.array([function(v) for v in
+                                   np.split(values, starts[1:])])
+            columns['b%s_%s' % (b, name)] = column
+    return columns
+
 def rstats(image, regions, functions={}):
     """Compute raster statistics across each band for each image object.
     
+    Dict of dicts wrapper around rstats_columns, keyed by region id.
+    
     >>> np.array([[0, 1]]).flatten()
     array([0, 1])
     >>> a = np.array([[[10,11]], [[20,21]]])
@@ -89,20 +153,13 @@ def rstats(image, regions, functions={}):
     
     >>> rstats(np.array([[[10,11], [20,21]]]), np.array([[0, 0]]),
     ...       functions=functions)
-    {0: {'b1_min': 11, 'b0_max': 20, 'b0_min': 10, 'b1_max': 21}}
+    {0: {'b0_max': 20, 'b0_min': 10, 'b1_max': 21, 'b1_min': 11}}
     """
-    table = {}
-    nbands = image.shape[-1]
-    regions_flat, pixels_flat = regions.flat, image.reshape((-1, nbands))
-    for region in range(regions.max() + 1):
-        row = {}
-        masked = np.compress(regions_flat == region, pixels_flat, axis=0)
-        for b in range(nbands):
-            band = masked.T[b]
-            for name, function in list(functions.items()):
-                row['b%s_%s' % (b, name)] = function(band)
-        table[region] = row
-    return table
+    columns = rstats_columns(image, regions, functions=functions)
+    ids = columns.pop('id').tolist()
+    rows = zip(*[column.tolist() for column in columns.values()])
+    return dict((region, dict(zip(columns, row)))
+                for region, row in zip(ids, rows))
 
 
 if __name__ == '__main__':
@@ -1,8 +1,11 @@
 """
 Library of raster functions that will be run during stats computation.
 
-Each function will be called per region per band.
-A 1D numpy array will sent as the sole argument.
+Each function will be called once per band for all regions at once.
+Functions flagged with a true 'vectorized' attribute are sent the band values
+sorted by region, the position of the first pixel of each region and the pixel
+count of each region, and return one value per region (see stats.group).
+Unflagged functions are called per region per band with a 1D numpy array.
 Each function as named here will be a column heading in stats csv file.
 
 Published by Berkeley Environmental Technology International, LLC
@@ -10,37 +13,55 @@ Copyright (c) 2012 James Scarborough - All rights reserved
 """
 import numpy as np
 
-def max(array):
-    """Return max value of the array.
+def _vectorized(function):
+    "Flag a function as computing a statistic for all regions in one call."
+    function.vectorized = True
+    return function
+
+def _sums(values, starts, counts):
+    "Return per region sum and mean, accumulated in float64."
+    sums = np.add.reduceat(values, starts, dtype=np.float64)
+    return sums, sums / counts
+
+@_vectorized
+def max(values, starts, counts):
+    """Return max value of each region.
     
-    >>> max([1, 2])
-    2
+    >>> max(np.array([1, 2, 5]), np.array([0, 2]), np.array([2, 1]))
+    array([2, 5])
     """
-    return np.max(array)
+    return np.maximum.reduceat(values, starts)
 
-def min(array):
-    """Return min value of the array.
+@_vectorized
+def min(values, starts, counts):
+    """Return min value of each region.
     
-    >>> min([1, 2])
-    1
+    >>> min(np.array([1, 2, 5]), np.array([0, 2]), np.array([2, 1]))
+    array([1, 5])
     """
-    return np.min(array)
+    return np.minimum.reduceat(values, starts)
 
-def mean(array):
-    """Return the mean of the array.
+@_vectorized
+def mean(values, starts, counts):
+    """Return the mean of each region.
     
-    >>> mean([1, 2])
-    1.5
+    >>> mean(np.array([1, 2, 5]), np.array([0, 2]), np.array([2, 1]))
+    array([1.5, 5. ])
     """
-    return np.mean(array)
+    return _sums(values, starts, counts)[1]
 
-def std(array):
-    """Return the standard deviation of the array.
+@_vectorized
+def std(values, starts, counts):
+    """Return the standard deviation of each region.
+    
+    Deviations are taken from the region mean (two pass) for precision.
     
-    >>> std([1, 2])
-    0.5
+    >>> std(np.array([1, 2, 5]), np.array([0, 2]), np.array([2, 1]))
+    array([0.5, 0. ])
     """
-    return np.std(array)
+    deviations = values - np.repeat(_sums(values, starts, counts)[1], counts)
+    np.multiply(deviations, deviations, out=deviations)
+    return np.sqrt(np.add.reduceat(deviations, starts) / counts)
 
 
 if __name__ == '__main__':
@@ -7,15 +7,17 @@ import sys, getopt, inspect
 import csv
 import imp, inspect
 
-def map(function, args_list, processes=None):
+def map(function, args_list, processes=None, context=None):
     """Multiprocessing map function allowing different params to one function.
     
     Number of processes defaults to cpu_count(), ie number of cores on system.
+    'context' is an optional multiprocessing context (e.g. get_context('fork')),
+    the default start method is used when None.
     
     >>> map(_f, [(1, 1), (2, 2)]) # Test function _f below: return x+y
     [2, 4]
     """
-    pool = multiprocessing.Pool(processes=processes)
+    pool = (context or multiprocessing).Pool(processes=processes)
     jobs = [pool.apply_async(function, args) for args in args_list]
     pool.close()
     pool.join()
@@ -43,6 +45,21 @@ def csvwrite(filename, table, key_field):
     c.writerow(dict(list(zip(order, order))))
     c.writerows(iter(table.values()))
 
+def csvwrite_columns(filename, columns):
+    r"""Save an ordered dict of equal length columns to CSV, names as headings.
+    
+    >>> from collections import OrderedDict
+    >>> columns = OrderedDict([('id', [1, 2]), ('a', ['a1', 'a2'])])
+    >>> csvwrite_columns('csvtest.csv', columns)
+    >>> open('csvtest.csv').read()
+    'id,a\n1,a1\n2,a2\n'
+    >>> os.remove('csvtest.csv')
+    """
+    with open(filename, 'w') as dst:
+        c = csv.writer(dst, lineterminator='\n')
+        c.writerow(list(columns.keys()))
+        c.writerows(zip(*[list(column) for column in columns.values()]))
+
 def csvadd(left_file, key_field, right_file, add_field, outname):
     r"""Add the new field/column into the target file, joining by the key field.
     
@@ -13,6 +13,9 @@ import netCDF4 as nc
 from affine import Affine
 from osgeo import osr
 
+from django.contrib.gis.geos import Polygon
+from django.db import connection
+
 from madmex.util import randomword
 from configparser import ConfigParser
 
@@ -112,6 +115,60 @@ def add_dataset(pr, dt, metadict, file):
     dataset_resource.add(dataset)
     uid = metadict['id']
     dataset_resource.add_location(uid, file)
+    # Register footprint to the extent index. Imported here so that importing this
+    # module does not require a configured django project
+    from madmex.models import DatasetExtent
+    DatasetExtent.objects.update_or_create(dataset_id=uid,
+                                           defaults={'product': dt.name,
+                                                     'uri': file,
+                                                     'the_geom': extent_geometry(metadict)})
+
+
+def extent_geometry(metadict):
+    """Build the longlat footprint of a dataset from its metadata dictionary
+
+    Args:
+        metadict (dict): Dictionary containing dataset metadata, generally generated
+            by ``metadict_from_netcdf``
+
+    Return:
+        django.contrib.gis.geos.Polygon: The footprint (EPSG:4326) defined by the
+        four corners of the dataset extent
+    """
+    coord = metadict['extent']['coord']
+    ring = [(coord[k]['lon'], coord[k]['lat']) for k in ['ul', 'ur', 'lr', 'll', 'ul']]
+    return Polygon(ring, srid=4326)
+
+
+def index_extents(product):
+    """Register the footprints of all the datasets of a product to the extent index
+
+    Footprints are built from the corners of the dataset metadata already present in the
+    datacube database. Meant to populate the index for datasets indexed before it
+    existed or by other tools than antares; datasets already present are skipped.
+
+    Args:
+        product (str): Name of the datacube product
+
+    Return:
+        int: The number of footprints added
+    """
+    corner = "(d.metadata #>> '{extent,coord,%s,%s}')::double precision"
+    points = ', '.join('st_makepoint(%s, %s)' % (corner % (k, 'lon'), corner % (k, 'lat'))
+                       for k in ['ul', 'ur', 'lr', 'll', 'ul'])
+    query = ("INSERT INTO public.madmex_datasetextent (product, dataset_id, uri, the_geom, added) "
+             "SELECT m.name, d.id::text, coalesce(min(l.uri_body), ''), "
+             "st_setsrid(st_makepolygon(st_makeline(ARRAY[{0}])), 4326), now() "
+             "FROM agdc.dataset AS d "
+             "JOIN agdc.dataset_type AS m ON d.dataset_type_ref = m.id "
+             "LEFT JOIN agdc.dataset_location AS l ON l.dataset_ref = d.id "
+             "WHERE m.name = %s AND d.archived IS NULL "
+             "GROUP BY m.name, d.id "
+             "ON CONFLICT (dataset_id) DO NOTHING").format(points)
+    with connection.cursor() as cursor:
+        cursor.execute(query, [product])
+        count = cursor.rowcount
+    return count
 
 
 def wkt_to_proj4(wkt):
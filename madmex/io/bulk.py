@@ -0,0 +1,357 @@
+"""Bulk loading of vector data to the database
+
+Features are read from vector files in batches, reprojected to longlat by OGR one
+batch at a time and written to the database as hex encoded EWKB through
+``COPY ... FROM STDIN``, bypassing the ORM. Object ids are reserved from the table
+sequences beforehand so that objects and their classifications can be copied
+independently.
+"""
+import csv
+import io
+import logging
+
+import fiona
+from fiona.transform import transform_geom
+from django.db import connection, transaction
+from shapely import wkb
+from shapely.geometry import shape
+
+from madmex.models import Country
+from madmex.util import chunk
+from madmex.util.local import basename
+
+logger = logging.getLogger(__name__)
+
+
+def read_batches(filename, batch_size=10000, every=None):
+    """Read the features of a vector file in batches of longlat geometries
+
+    Args:
+        filename (str): Path of the vector file
+        batch_size (int): Number of features per batch
+        every (int): Optionally only keep one every ``every`` feature
+
+    Return:
+        generator: Batches (lists) of (EWKB hex string, properties) tuples
+    """
+    with fiona.open(filename) as src:
+        # Files without crs are assumed to be in longlat
+        reproject = bool(src.crs)
+        features = src if every is None else (f for i, f in enumerate(src)
+                                              if i % every == 0)
+        for batch in chunk(features, batch_size):
+            batch = list(batch)
+            geometries = [f['geometry'] for f in batch]
+            if reproject:
+                geometries = transform_geom(src.crs_wkt, 'EPSG:4326', geometries)
+            yield [(wkb.dumps(shape(geom), hex=True, srid=4326), f['properties'])
+                   for geom, f in zip(geometries, batch)]
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def copy_rows(cursor, table, columns, rows):
+    """Write rows to a table with COPY
+
+    Args:
+        cursor: Database cursor
+        table (str): Name of the table
+        columns (list): Names of the columns, in the order of the values of each row
+        rows (iterable): Rows (tuples) of values. None is written as NULL
+    """
+    buf = io.StringIO()
+    for row in rows:
+        buf.write('\t'.join(_copy_value(v) for v in row))
+        buf.write('\n')
+    buf.seek(0)
+    cursor.copy_expert('COPY %s (%s) FROM STDIN' % (table, ', '.join(columns)), buf)
+
+
+def reserve_ids(cursor, table, n):
+    """Draw n ids from the primary key sequence of a table
+
+    Return:
+        list: The reserved ids
+    """
+    cursor.execute("SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+                   "FROM generate_series(1, %s)", [table, n])
+    return [row[0] for row in cursor.fetchall()]
+
+
+def upsert_tags(cursor, scheme, codes):
+    """Resolve the tag ids of numeric codes of a classification scheme, creating missing tags
+
+    Args:
+        cursor: Database cursor
+        scheme (str): Name of the classification scheme
+        codes (iterable): Numeric codes
+
+    Return:
+        dict: numeric code to tag id mapping
+    """
+    query = ("WITH codes AS (SELECT DISTINCT unnest(%s::integer[]) AS numeric_code), "
+             "inserted AS ("
+             "INSERT INTO public.madmex_tag (scheme, value, numeric_code, color) "
+             "SELECT %s, '', c.numeric_code, '' FROM codes AS c "
+             "WHERE NOT EXISTS (SELECT 1 FROM public.madmex_tag AS t "
+             "WHERE t.scheme = %s AND t.numeric_code = c.numeric_code) "
+             "RETURNING numeric_code, id) "
+             "SELECT numeric_code, min(id) FROM ("
+             "SELECT numeric_code, id FROM inserted "
+             "UNION ALL "
+             "SELECT t.numeric_code, t.id FROM public.madmex_tag AS t "
+             "JOIN codes AS c ON t.numeric_code = c.numeric_code WHERE t.scheme = %s) AS u "
+             "GROUP BY numeric_code")
+    cursor.execute(query, [[int(x) for x in set(codes)], scheme, scheme, scheme])
+    return dict(cursor.fetchall())
+
+
+def _resolve_tags(cursor, scheme, codes, tag_map):
+    """Update tag_map with the ids of the codes it does not contain yet"""
+    missing = {int(x) for x in codes if x is not None} - set(tag_map)
+    if missing:
+        tag_map.update(upsert_tags(cursor, scheme, missing))
+
+
+def ingest_training(filename, interpret, dataset, scheme, year, predict=None,
+                    every=None, batch_size=10000):
+    """Load a vector file of training data to the madmex_trainobject and madmex_trainclassification tables
+
+    Args:
+        filename (str): Path of the vector file
+        interpret (str): Field holding the numeric code of the interpreted tag
+        dataset (str): Name of the training set
+        scheme (str): Classification scheme of the codes
+        year (str): Creation year of the objects
+        predict (str): Optional field holding the numeric code of the predict tag
+        every (int): Optionally only ingest one every ``every`` feature
+        batch_size (int): Number of features read and copied at once
+
+    Return:
+        int: Number of ingested objects
+
+    Example:
+        >>> from madmex.io.bulk import ingest_training
+        >>> ingest_training('/path/to/training.shp', interpret='interpreta',
+        ...                 dataset='jalisco_bits', scheme='madmex', year='2015')
+    """
+    objfilename = basename(filename, False)
+    tag_map = {}
+    count = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        for batch in read_batches(filename, batch_size=batch_size, every=every):
+            ids = reserve_ids(cursor, 'madmex_trainobject', len(batch))
+            _resolve_tags(cursor, scheme, [p[interpret] for _, p in batch], tag_map)
+            if predict is not None:
+                _resolve_tags(cursor, scheme, [p[predict] for _, p in batch], tag_map)
+            copy_rows(cursor, 'public.madmex_trainobject',
+                      ['id', 'the_geom', 'added', 'filename', 'creation_year'],
+                      ((i, geom, 'now', objfilename, year)
+                       for i, (geom, _) in zip(ids, batch)))
+            copy_rows(cursor, 'public.madmex_trainclassification',
+                      ['train_object_id', 'interpret_tag_id', 'predict_tag_id',
+                       'training_set'],
+                      ((i, tag_map[int(p[interpret])],
+                        None if predict is None else tag_map[int(p[predict])], dataset)
+                       for i, (_, p) in zip(ids, batch)))
+            count += len(batch)
+            logger.info('%d training objects ingested', count)
+    return count
+
+
+def ingest_validation(filename, field, name, scheme, year=-1, batch_size=10000):
+    """Load a vector file of validation data to the madmex_validobject and madmex_validclassification tables
+
+    Args:
+        filename (str): Path of the vector file
+        field (str): Field holding the numeric code of the validation tag
+        name (str): Name of the validation set
+        scheme (str): Classification scheme of the codes
+        year (int): Interpretation year
+        batch_size (int): Number of features read and copied at once
+
+    Return:
+        int: Number of ingested objects
+    """
+    tag_map = {}
+    count = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        for batch in read_batches(filename, batch_size=batch_size):
+            ids = reserve_ids(cursor, 'madmex_validobject', len(batch))
+            _resolve_tags(cursor, scheme, [p[field] for _, p in batch], tag_map)
+            copy_rows(cursor, 'public.madmex_validobject', ['id', 'the_geom', 'added'],
+                      ((i, geom, 'now') for i, (geom, _) in zip(ids, batch)))
+            copy_rows(cursor, 'public.madmex_validclassification',
+                      ['valid_object_id', 'valid_tag_id', 'valid_set',
+                       'interpretation_year'],
+                      ((i, tag_map[int(p[field])], name, year)
+                       for i, (_, p) in zip(ids, batch)))
+            count += len(batch)
+            logger.info('%d validation objects ingested', count)
+    return count
+
+
+def footprint_name_fun(column=None):
+    """Build the function naming footprints from the properties of their features
+
+    Args:
+        column (str): Column holding the footprint names. Defaults to Landsat WRS-2
+            path and row (``PATH`` and ``ROW`` columns, formatted as ``'PPPRRR'``)
+
+    Return:
+        callable: Function of the feature properties returning the footprint name, or
+        None when the feature has no name (written as NULL and skipped on ingestion)
+    """
+    if column is None:
+        return lambda p: '%03d%03d' % (p['PATH'], p['ROW'])
+    def name_fun(p):
+        name = p.get(column)
+        return None if name is None else str(name)
+    return name_fun
+
+
+def ingest_footprints(filename, sensor, country, name_fun):
+    """Load the footprints of a satellite tiling system intersecting a country to the madmex_footprint table
+
+    All features are copied to a temporary staging table, then filtered against the
+    country geometry and deduplicated by name in a single INSERT ... SELECT. Footprints
+    whose name is already registered, and features without name, are left out.
+
+    Args:
+        filename (str): Path of the vector file of footprints
+        sensor (str): Name of the sensor of the footprints (e.g. landsat, sentinel2)
+        country (str): Name of the country in the madmex_country table
+        name_fun (callable): Function building the name of a footprint from the
+            properties of the corresponding feature (see ``footprint_name_fun``).
+            None names are written as NULL
+
+    Return:
+        tuple: Tuple of (number of footprints read, number of footprints added)
+
+    Raises:
+        Country.DoesNotExist: When there is no country with that name
+
+    Example:
+        >>> from madmex.io.bulk import ingest_footprints, footprint_name_fun
+        >>> ingest_footprints('/path/to/wrs2_descending.shp', sensor='landsat', country='MEX',
+        ...                   name_fun=footprint_name_fun())
+    """
+    # Fail early, without fetching the geometry
+    country_id = Country.objects.values_list('id', flat=True).get(name=country)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("CREATE TEMPORARY TABLE footprint_staging "
+                       "(name varchar(50), the_geom geometry(Geometry, 4326)) "
+                       "ON COMMIT DROP")
+        rows = ((name_fun(properties), geom) for batch in read_batches(filename)
+                for geom, properties in batch)
+        copy_rows(cursor, 'footprint_staging', ['name', 'the_geom'], rows)
+        cursor.execute('SELECT count(*) FROM footprint_staging')
+        n_read = cursor.fetchone()[0]
+        cursor.execute("INSERT INTO public.madmex_footprint (name, the_geom, sensor, added) "
+                       "SELECT DISTINCT ON (s.name) s.name, s.the_geom, %s, now() "
+                       "FROM footprint_staging AS s "
+                       "JOIN public.madmex_country AS c "
+                       "ON c.id = %s AND st_intersects(c.the_geom, s.the_geom) "
+                       "WHERE s.name IS NOT NULL AND s.name <> '' "
+                       "ORDER BY s.name "
+                       "ON CONFLICT (name) DO NOTHING",
+                       [sensor, country_id])
+        n_added = cursor.rowcount
+    return n_read, n_added
+
+
+# Scene fields and the corresponding columns of the USGS bulk metadata files
+CATALOG_COLUMNS = [('scene_id', 'sceneID'),
+                   ('landsat_product_id', 'LANDSAT_PRODUCT_ID'),
+                   ('acquisition_date', 'acquisitionDate'),
+                   ('cloud_cover', 'cloudCoverFull'),
+                   ('cloud_cover_land', 'CLOUD_COVER_LAND'),
+                   ('min_lat', 'lowerRightCornerLatitude'),
+                   ('min_lon', 'upperLeftCornerLongitude'),
+                   ('max_lat', 'upperLeftCornerLatitude'),
+                   ('max_lon', 'lowerRightCornerLongitude')]
+
+
+def catalog_scenes(rows, headers, path_row):
+    """Select and parse the day time scenes of registered footprints from rows of a USGS bulk metadata file
+
+    Args:
+        rows (iterable): Rows (lists of strings) of the csv file
+        headers (list): Header row of the csv file
+        path_row (dict): Mapping of landsat footprint names (``'PPPRRR'``) to footprint ids
+
+    Return:
+        generator: Lists of footprint id followed by the values of the ``CATALOG_COLUMNS``
+        fields, in that order
+    """
+    positions = [headers.index(column) for _, column in CATALOG_COLUMNS]
+    path_pos = headers.index('path')
+    row_pos = headers.index('row')
+    day_pos = headers.index('dayOrNight')
+    for row in rows:
+        footprint_id = path_row.get('%03d%03d' % (int(row[path_pos]), int(row[row_pos])))
+        if footprint_id is not None and row[day_pos].lower() == 'day':
+            yield [footprint_id] + [row[i] for i in positions]
+
+
+def ingest_catalog(filename, batch_size=50000):
+    """Merge a USGS Landsat bulk metadata file into the madmex_scene table
+
+    Day time scenes of path rows registered as landsat footprints are copied in
+    batches to a temporary staging table and upserted on ``scene_id``, so that
+    re-ingesting a file (e.g. the daily updated catalog) only adds new scenes and
+    updates the cloud cover of existing ones. Reprocessed scenes keep their
+    ``scene_id`` but get a new ``landsat_product_id``, which embeds the processing
+    date; the greatest product id of a scene wins, so that older versions of a
+    catalog never overwrite newer products. Every batch is committed independently.
+
+    Args:
+        filename (str): Path of the csv file (e.g. LANDSAT_8_C1.csv)
+        batch_size (int): Number of scenes merged at once
+
+    Return:
+        tuple: Tuple of (number of rows read, number of scenes merged)
+    """
+    fields = [f for f, _ in CATALOG_COLUMNS]
+    merge = ("INSERT INTO public.madmex_scene (footprint_id, {0}) "
+             "SELECT DISTINCT ON (scene_id) footprint_id, {0} "
+             "FROM scene_staging "
+             "ORDER BY scene_id, landsat_product_id DESC "
+             "ON CONFLICT (scene_id) DO UPDATE SET {1} "
+             "WHERE madmex_scene.landsat_product_id <= EXCLUDED.landsat_product_id").format(
+                 ', '.join(fields),
+                 ', '.join('%s = EXCLUDED.%s' % (f, f) for f in fields
+                           if f != 'scene_id'))
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name, id FROM public.madmex_footprint WHERE sensor = 'landsat'")
+        path_row = dict(cursor.fetchall())
+        cursor.execute("DROP TABLE IF EXISTS scene_staging")
+        cursor.execute("CREATE TEMPORARY TABLE scene_staging ("
+                       "footprint_id integer, scene_id varchar(50), "
+                       "landsat_product_id varchar(50), acquisition_date timestamp with time zone, "
+                       "cloud_cover double precision, cloud_cover_land double precision, "
+                       "min_lat double precision, min_lon double precision, "
+                       "max_lat double precision, max_lon double precision) "
+                       "ON COMMIT DELETE ROWS")
+    n_read = 0
+    n_merged = 0
+    with open(filename, 'rt') as f:
+        reader = csv.reader(f)
+        headers = next(reader)
+        for rows in chunk(reader, batch_size):
+            rows = list(rows)
+            n_read += len(rows)
+            with transaction.atomic(), connection.cursor() as cursor:
+                copy_rows(cursor, 'scene_staging', ['footprint_id'] + fields,
+                          catalog_scenes(rows, headers, path_row))
+                cursor.execute(merge)
+                n_merged += cursor.rowcount
+            logger.info('%d catalog rows read, %d scenes merged', n_read, n_merged)
+    with connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS scene_staging")
+    return n_read, n_merged
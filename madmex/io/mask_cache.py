@@ -0,0 +1,195 @@
+"""On disk cache of country and region geometries and masks
+
+Country and region boundaries are large multipolygons. Instead of fetching and
+parsing them at full resolution on every call, this module caches:
+
+- simplified geometries per tolerance, as gzipped GeoJSON
+  (``MASK_CACHE_DIR/geometries/{name}/{key}.json.gz``). Used by ``gwf_query``
+  to select the tiles of a region
+- rasterized masks per grid cell (transform, shape and crs), as compressed
+  numpy archives (``MASK_CACHE_DIR/masks/{name}/{key}.npz``). Used by
+  ``make_country_mask``
+
+Cache keys include an md5 digest of the geometry computed by the database, so
+entries of a country or region whose geometry is modified are never read again.
+The digest is computed once per process.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+import numpy as np
+from django.db import connection
+from rasterio import features
+
+from madmex.models import Region
+from madmex.settings import MASK_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Geometry versions computed by this process, name -> (table, id, digest)
+_versions = {}
+
+
+def geometry_version(name):
+    """Find a country or region by name and compute the digest of its geometry
+
+    Countries take precedence over regions with the same name, as in ``gwf_query``.
+    The digest is computed by the database on the first call for a name and reused
+    by the following calls of the process; geometries modified while a process runs
+    are therefore only picked up by new processes
+
+    Args:
+        name (str): Name of a country (ISO code) or region
+
+    Return:
+        tuple: (table, id, digest) with table the name of the table holding the
+        geometry
+
+    Raises:
+        Region.DoesNotExist: When neither a country nor a region has that name
+    """
+    if name in _versions:
+        return _versions[name]
+    query = ("SELECT 'public.madmex_country', id, md5(st_asewkb(the_geom)) "
+             "FROM public.madmex_country WHERE name = %s "
+             "UNION ALL "
+             "SELECT 'public.madmex_region', id, md5(st_asewkb(the_geom)) "
+             "FROM public.madmex_region WHERE name = %s "
+             "LIMIT 1")
+    with connection.cursor() as c:
+        c.execute(query, [name, name])
+        row = c.fetchone()
+    if row is None:
+        raise Region.DoesNotExist('No country or region named %s' % name)
+    _versions[name] = tuple(row)
+    return _versions[name]
+
+
+def _cache_path(kind, name, *items):
+    key = hashlib.sha1('|'.join(str(x) for x in items).encode()).hexdigest()
+    return os.path.join(MASK_CACHE_DIR, kind, name, key)
+
+
+def _write_atomic(path, write):
+    """Write a cache entry to a temporary file and rename it, so that concurrent
+    workers never read partial entries"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as dst:
+        write(dst)
+    os.replace(tmp, path)
+
+
+def write_mask(path, mask):
+    """Write a mask to a compressed numpy archive"""
+    _write_atomic(path, lambda dst: np.savez_compressed(dst, mask=mask))
+
+
+def read_mask(path):
+    """Read a mask written by ``write_mask``"""
+    with np.load(path) as src:
+        return src['mask']
+
+
+def simplified_geometry(name, tolerance=0.0, cover=False):
+    """Get the geometry of a country or region, simplified to a given tolerance
+
+    Args:
+        name (str): Name of a country (ISO code) or region
+        tolerance (float): Simplification tolerance in units of the geometry
+            (degrees). 0 returns the full resolution geometry
+        cover (bool): Buffer the simplified geometry by tolerance, so that it
+            covers the original geometry. Use it when the geometry is used to
+            select tiles or datasets
+
+    Return:
+        tuple: (geojson, srid) with geojson a geometry dictionary
+
+    Example:
+        >>> from madmex.io.mask_cache import simplified_geometry
+        >>> geojson, srid = simplified_geometry('Jalisco', tolerance=0.01, cover=True)
+    """
+    table, id, digest = geometry_version(name)
+    path = _cache_path('geometries', name, digest, tolerance, cover) + '.json.gz'
+    try:
+        with gzip.open(path, 'rt') as src:
+            entry = json.load(src)
+        return entry['geometry'], entry['srid']
+    except (OSError, ValueError):
+        pass
+    geom = 'the_geom'
+    params = []
+    if tolerance:
+        geom = 'st_simplifypreservetopology(%s, %%s)' % geom
+        params.append(tolerance)
+        if cover:
+            geom = 'st_buffer(%s, %%s)' % geom
+            params.append(tolerance)
+    query = 'SELECT st_asgeojson({0}), st_srid(the_geom) FROM {1} WHERE id = %s'.format(geom, table)
+    with connection.cursor() as c:
+        c.execute(query, params + [id])
+        geojson, srid = c.fetchone()
+    entry = {'geometry': json.loads(geojson), 'srid': srid}
+    _write_atomic(path, lambda dst: dst.write(gzip.compress(json.dumps(entry).encode())))
+    logger.info('Cached geometry of %s at tolerance %s', name, tolerance)
+    return entry['geometry'], entry['srid']
+
+
+def region_mask(name, affine, shape, crs='+proj=longlat +datum=WGS84 +no_defs',
+                all_touched=False):
+    """Get the rasterized mask of a country or region over a grid cell
+
+    Only the part of the geometry intersecting the cell is fetched from the
+    database and rasterized
+
+    Args:
+        name (str): Name of a country (ISO code) or region
+        affine (affine.Affine): Transform of the cell
+        shape (tuple): (rows, columns) shape of the cell
+        crs (str): proj4 string of the crs of the cell (e.g.
+            ``geobox.crs._crs.ExportToProj4()`` for a datacube tile)
+        all_touched (bool): Whether every pixel touched by the geometry is part
+            of the mask (see ``rasterio.features.rasterize``)
+
+    Return:
+        numpy.ndarray: uint8 array of the cell shape, 1 inside the geometry and
+        0 outside
+
+    Example:
+        >>> from affine import Affine
+        >>> from madmex.io.mask_cache import region_mask
+        >>> mask = region_mask('MEX', Affine(0.001, 0, -104, 0, -0.001, 22), (2000, 2000))
+    """
+    table, id, digest = geometry_version(name)
+    path = _cache_path('masks', name, digest, tuple(affine), tuple(shape), crs,
+                       all_touched) + '.npz'
+    try:
+        return read_mask(path)
+    except (OSError, ValueError, KeyError):
+        pass
+    xmin, ymax = affine * (0, 0)
+    xmax, ymin = affine * (shape[1], shape[0])
+    xmin, xmax = sorted((xmin, xmax))
+    ymin, ymax = sorted((ymin, ymax))
+    # The envelope is densified so that its bounding box in the crs of the
+    # geometry covers the cell
+    query = ('SELECT st_asgeojson(st_transform(st_clipbybox2d(the_geom, '
+             'st_transform(st_segmentize(st_makeenvelope(%s, %s, %s, %s), %s), '
+             '%s::text, st_srid(the_geom))::box2d), %s::text)) '
+             'FROM {0} WHERE id = %s').format(table)
+    with connection.cursor() as c:
+        c.execute(query, [xmin, ymin, xmax, ymax, (xmax - xmin) / 16, crs, crs, id])
+        geojson = c.fetchone()[0]
+    geom = json.loads(geojson) if geojson is not None else None
+    if geom is None or not geom.get('coordinates'):
+        mask = np.zeros(shape, dtype=np.uint8)
+    else:
+        mask = features.rasterize([(geom, 1)], out_shape=shape, transform=affine,
+                                  all_touched=all_touched, dtype=np.uint8)
+    write_mask(path, mask)
+    return mask
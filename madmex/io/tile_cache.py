@@ -0,0 +1,171 @@
+"""On disk cache of datacube tiles
+
+Decoding a tile from compressed NetCDF is a significant part of the cost of every
+processing step. Tiles loaded through ``load_tile`` are written once to the cache
+directory as one uncompressed ``.npy`` file per measurement and read back as memory
+mapped arrays by the following steps (segmentation, object prediction, change
+detection, ...) working on the same tile.
+"""
+import hashlib
+import itertools
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import xarray as xr
+from datacube.api import GridWorkflow
+
+from madmex.settings import TILE_CACHE_DIR, TILE_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+def tile_key(tile, measurements=None):
+    """Build the cache key of a datacube tile
+
+    Args:
+        tile (datacube.api.Tile): Tile as returned by ``GridWorkflow.list_cells()[1]``
+        measurements (list): Optional list of measurements to load
+
+    Return:
+        str: Hexadecimal digest of the tile's dataset ids, geobox and measurements
+    """
+    ids = sorted(str(ds.id) for ds in
+                 itertools.chain.from_iterable(tile.sources.values))
+    geobox = tile.geobox
+    items = ids + [str(tuple(geobox.affine)), str(geobox.shape), str(geobox.crs),
+                   str(None if measurements is None else list(measurements))]
+    return hashlib.sha1('|'.join(items).encode()).hexdigest()
+
+
+class TileCache(object):
+    """Size limited, least recently used on disk cache of xarray Datasets
+
+    Every entry is a directory holding the data variables as ``.npy`` files and a
+    pickled Dataset skeleton (coordinates and attributes). Entries are written
+    to a temporary directory and renamed, so that concurrent workers never read
+    partial entries.
+    """
+    def __init__(self, directory, max_size):
+        """Instantiate cache
+
+        Args:
+            directory (str): Cache directory, created if it does not exist
+            max_size (float): Maximum size of the cache in bytes. Least recently
+                read entries are evicted when it is exceeded
+        """
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """Read an entry
+
+        Args:
+            key (str): Entry key
+
+        Return:
+            xarray.Dataset: The cached Dataset, data variables being backed by
+            copy on write memory maps. None if the key is not in the cache
+        """
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, 'skeleton.pkl'), 'rb') as src:
+                skeleton, variables = pickle.load(src)
+            data_vars = {name: (dims, np.load(os.path.join(path, '%s.npy' % name),
+                                              mmap_mode='c'), attrs)
+                         for name, (dims, attrs) in variables.items()}
+        except (OSError, EOFError):
+            # Missing or concurrently evicted entry
+            return None
+        # Mark as recently used
+        os.utime(path)
+        dataset = xr.Dataset(data_vars, coords=skeleton.coords, attrs=skeleton.attrs)
+        return dataset[list(variables)]
+
+    def put(self, key, dataset):
+        """Write a Dataset to the cache and evict old entries if needed
+
+        Args:
+            key (str): Entry key
+            dataset (xarray.Dataset): Dataset to cache
+        """
+        tmp = tempfile.mkdtemp(dir=self.directory, prefix='.tmp_')
+        try:
+            variables = {}
+            for name, var in dataset.data_vars.items():
+                np.save(os.path.join(tmp, '%s.npy' % name), var.values)
+                variables[name] = (var.dims, var.attrs)
+            skeleton = dataset.drop(list(variables))
+            with open(os.path.join(tmp, 'skeleton.pkl'), 'wb') as dst:
+                pickle.dump((skeleton, variables), dst)
+            os.rename(tmp, self._path(key))
+        except OSError:
+            # Entry written in the meantime by another worker
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_size
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            path = self._path(name)
+            if name.startswith('.') or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(f.stat().st_size for f in os.scandir(path))
+                entries.append((os.stat(path).st_mtime, size, path))
+            except OSError:
+                continue
+        total = sum(e[1] for e in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            logger.info('Evicted %s from tile cache', path)
+
+
+def load_tile(tile, measurements=None):
+    """Load a datacube tile, reading through the tile cache
+
+    Drop in replacement of ``GridWorkflow.load``. The cache is only used when a
+    ``TILE_CACHE_DIR`` is configured, its size being limited by ``TILE_CACHE_SIZE``
+    (in GB).
+
+    Args:
+        tile (datacube.api.Tile): Tile as returned by ``GridWorkflow.list_cells()[1]``
+        measurements (list): Optional list of measurements to load. All
+            measurements of the product are loaded when None
+
+    Return:
+        xarray.Dataset: The loaded tile
+
+    Example:
+        >>> from madmex.wrappers import gwf_query
+        >>> from madmex.io.tile_cache import load_tile
+
+        >>> tiles = gwf_query('s2_001_jalisco_2017_0', region='Jalisco')
+        >>> geoarray = load_tile(tiles[0][1], measurements=['ndvi_mean'])
+    """
+    if TILE_CACHE_DIR is None:
+        return GridWorkflow.load(tile, measurements=measurements)
+    cache = TileCache(TILE_CACHE_DIR, float(TILE_CACHE_SIZE) * 2**30)
+    key = tile_key(tile, measurements)
+    dataset = cache.get(key)
+    if dataset is not None:
+        return dataset
+    t0 = time.time()
+    dataset = GridWorkflow.load(tile, measurements=measurements)
+    logger.debug('Tile %s decoded in %.1f s', key, time.time() - t0)
+    cache.put(key, dataset)
+    return dataset
@@ -0,0 +1,181 @@
+"""Materialized assignment of database objects to the cells of a datacube product grid
+
+Tile based processing (object based prediction, training data extraction, change
+classification) needs, for every tile, the objects falling in its extent. Rather than
+running a spatial query per tile and processing stage, objects are assigned to the
+cells of the product grid once (see ``antares index_tiles``) and retrieved by
+equality on (product, x, y).
+"""
+from django.contrib.gis.geos import Polygon
+from django.db import connection
+
+from madmex.models import SegmentationInformation
+from madmex.util.datacube import tile_cell
+
+
+def _cell_polygon(tile):
+    left, bottom, right, top = tile.geobox.geographic_extent.boundingbox
+    return Polygon.from_bbox((left, bottom, right, top))
+
+
+def segmentation_cell_query(product, x, y, cell_ewkt, segmentation_id):
+    """Build the query assigning the objects of a segmentation to a grid cell
+
+    Args:
+        product (str): Name of the datacube product
+        x, y (int): Grid cell index
+        cell_ewkt (str): EWKT geographic extent of the cell
+        segmentation_id (int): Id of the segmentation
+
+    Return:
+        tuple: (query, params)
+    """
+    query = """
+INSERT INTO public.madmex_predictobjecttile (product, x, y, segmentation_information_id, predict_object_id, contained)
+SELECT
+    %s, %s, %s, obj.segmentation_information_id, obj.id, obj.the_geom @ cell.geom
+FROM
+    public.madmex_predictobject AS obj,
+    (SELECT st_geomfromewkt(%s) AS geom) AS cell
+WHERE
+    obj.segmentation_information_id = %s
+    AND
+    obj.the_geom && cell.geom;
+    """
+    return query, [product, x, y, cell_ewkt, segmentation_id]
+
+
+def assign_segmentation_cells(segmentation_name, cells):
+    """Assign the objects of a segmentation to product grid cells
+
+    Any previous assignment of that segmentation to the same product is replaced.
+
+    Args:
+        segmentation_name (str): Name of the segmentation
+        cells (dict): Dictionary of (x, y) cell index to tile, as returned by
+            ``madmex.wrappers.gwf_query(..., view=False)``
+
+    Return:
+        int: Number of (cell, object) pairs inserted
+    """
+    seg_id = SegmentationInformation.objects.get(name=segmentation_name).id
+    count = 0
+    products = set()
+    with connection.cursor() as c:
+        for key, tile in cells.items():
+            product, x, y = tile_cell(key, tile)
+            if product not in products:
+                c.execute('DELETE FROM public.madmex_predictobjecttile WHERE product = %s AND segmentation_information_id = %s;',
+                          [product, seg_id])
+                products.add(product)
+            c.execute(*segmentation_cell_query(product, x, y, _cell_polygon(tile).ewkt,
+                                               seg_id))
+            count += c.rowcount
+    return count
+
+
+def training_set_cell_query(product, x, y, cell_ewkt, training_set):
+    """Build the query assigning the objects of a training set to a grid cell
+
+    Args:
+        product (str): Name of the datacube product
+        x, y (int): Grid cell index
+        cell_ewkt (str): EWKT geographic extent of the cell
+        training_set (str): Training set identifier
+
+    Return:
+        tuple: (query, params)
+    """
+    query = """
+INSERT INTO public.madmex_trainobjecttile (product, x, y, training_set, train_object_id)
+SELECT DISTINCT
+    %s, %s, %s, tc.training_set, obj.id
+FROM
+    public.madmex_trainclassification AS tc
+INNER JOIN
+    public.madmex_trainobject AS obj ON tc.train_object_id = obj.id
+WHERE
+    tc.training_set = %s
+    AND
+    obj.the_geom @ st_geomfromewkt(%s);
+    """
+    return query, [product, x, y, training_set, cell_ewkt]
+
+
+def assign_training_set_cells(training_set, cells):
+    """Assign the objects of a training set to product grid cells
+
+    Only objects contained in a cell are assigned, consistently with
+    ``madmex.io.vector_db.VectorDb.load_training_from_dataset``. Any previous assignment
+    of that training set to the same product is replaced.
+
+    Args:
+        training_set (str): Training set identifier
+        cells (dict): Dictionary of (x, y) cell index to tile, as returned by
+            ``madmex.wrappers.gwf_query(..., view=False)``
+
+    Return:
+        int: Number of (cell, object) pairs inserted
+    """
+    count = 0
+    products = set()
+    with connection.cursor() as c:
+        for key, tile in cells.items():
+            product, x, y = tile_cell(key, tile)
+            if product not in products:
+                c.execute('DELETE FROM public.madmex_trainobjecttile WHERE product = %s AND training_set = %s;',
+                          [product, training_set])
+                products.add(product)
+            c.execute(*training_set_cell_query(product, x, y, _cell_polygon(tile).ewkt,
+                                               training_set))
+            count += c.rowcount
+    return count
+
+
+def is_segmentation_indexed(segmentation_name, product):
+    """Whether a segmentation has been assigned to the grid of a product
+    """
+    query = """
+SELECT EXISTS (
+    SELECT 1
+    FROM public.madmex_predictobjecttile AS t
+    INNER JOIN public.madmex_segmentationinformation AS seg ON t.segmentation_information_id = seg.id
+    WHERE t.product = %s AND seg.name = %s
+);
+    """
+    with connection.cursor() as c:
+        c.execute(query, [product, segmentation_name])
+        return c.fetchone()[0]
+
+
+def is_training_set_indexed(training_set, product):
+    """Whether a training set has been assigned to the grid of a product
+    """
+    query = """
+SELECT EXISTS (
+    SELECT 1 FROM public.madmex_trainobjecttile WHERE product = %s AND training_set = %s
+);
+    """
+    with connection.cursor() as c:
+        c.execute(query, [product, training_set])
+        return c.fetchone()[0]
+
+
+def is_classification_indexed(name, product):
+    """Whether the segmentation a classification is based on has been assigned to the grid of a product
+    """
+    query = """
+SELECT EXISTS (
+    SELECT 1 FROM public.madmex_predictobjecttile
+    WHERE product = %s AND segmentation_information_id = (
+        SELECT obj.segmentation_information_id
+        FROM public.madmex_predictclassification AS cl
+        INNER JOIN public.madmex_predictobject AS obj ON cl.predict_object_id = obj.id
+        WHERE cl.name = %s
+        LIMIT 1
+    )
+);
+    """
+    with connection.cursor() as c:
+        c.execute(query, [product, name])
+        return c.fetchone()[0]
@@ -1,9 +1,10 @@
 from . import AntaresDb
-from madmex.overlay.conversions import train_object_to_feature, predict_object_to_feature
-from madmex.models import TrainClassification, PredictObject
-from math import floor
-
 from django.contrib.gis.geos import Polygon
+from django.db import connection
+from shapely import wkb
+
+from madmex.io.tile_index import is_segmentation_indexed, is_training_set_indexed
+from madmex.util.db import get_segmentation_ids
 
 @classmethod
 def from_geobox(cls, geobox):
@@ -21,50 +22,178 @@ Polygon.from_geobox = from_geobox
 # TODO: Get rid of this class
 class VectorDb(AntaresDb):
     """Query, read and write geometries between python's memory and the database"""
-    def load_training_from_dataset(self, dataset, training_set, sample=0.2):
+    def load_training_from_dataset(self, dataset, training_set, sample=0.2, seed=0,
+                                   itersize=20000, cell=None):
         """Retieves training data from the database based on intersection with an xr Dataset
 
+        Geometries are reprojected by PostGIS and retrieved as WKB in batches
+
         Args:
             dataset (xarray.Dataset): Typical Dataset object generated using one of
                 the datacube load method (GridWorkflow or Datacube clases)
             training_set (str): Name of the training set identifier to select the right
                 training data
             sample (float): Float between 0 and 1. Proportion of intersection geometry to sample.
-                Performs random sampling of the geometries
+                Performs random sampling of the geometries. The sampling key of an
+                object is a hash of its id and seed, so that no sorting is needed and
+                the same objects are drawn for a given seed
+            seed (int): Seed of the random sampling
+            itersize (int): Number of rows fetched at once from the server side cursor
+            cell (tuple): Optional (product, x, y) grid cell of dataset (see
+                ``madmex.util.datacube.tile_cell``). When the training set has been
+                assigned to the grid of that product (``madmex.io.tile_index``),
+                objects are retrieved by cell rather than by spatial query
 
         Return:
-            list: A feature collection reprojected to the CRS of the xarray Dataset
+            list: A feature collection reprojected to the CRS of the xarray Dataset.
+            Geometries are shapely geometries
         """
         geobox = dataset.geobox
-        crs = str(dataset.crs)
+        crs = dataset.crs._crs.ExportToProj4()
         poly = Polygon.from_geobox(geobox)
-        query_set = TrainClassification.objects.filter(train_object__the_geom__contained=poly,
-                                                       training_set=training_set).prefetch_related('train_object', 'interpret_tag')
-        if  0 < sample < 1:
-            nsample = floor(query_set.count() * sample)
-            query_set = query_set.order_by('?')[:nsample]
+        if cell is not None and not is_training_set_indexed(training_set, cell[0]):
+            cell = None
+        query, params = training_query(crs, training_set, poly.ewkt, cell=cell,
+                                       sample=sample, seed=seed)
+        return _query_features(query, params, 'class', itersize)
 
-        fc = (train_object_to_feature(x, crs) for x in query_set)
-        return fc
-
-def load_segmentation_from_dataset(geoarray, segmentation_name):
+def load_segmentation_from_dataset(geoarray, segmentation_name, itersize=20000, cell=None):
     """Retrieve a segmentation intersecting with a geoarray from the database
 
+    Only the ids and the geometries, reprojected by PostGIS and transfered as WKB,
+    are retrieved. Rows are streamed through a server side cursor and geometries
+    are parsed in bulk by shapely.
+
     Args:
         geoarray (xarray.Dataset): Typical Dataset object generated using one of
             the datacube load method (GridWorkflow or Datacube clases)
-        segmentation_name (str): Unique segmentation identifier
+        segmentation_name (str): Segmentation identifier. The objects of all the
+            segmentations with that name are retrieved
+        itersize (int): Number of rows fetched at once from the server side cursor
+        cell (tuple): Optional (product, x, y) grid cell of geoarray (see
+            ``madmex.util.datacube.tile_cell``). When the segmentation has been
+            assigned to the grid of that product (``madmex.io.tile_index``), objects
+            are retrieved by cell rather than by spatial query
 
     Return:
-        list: A geojson like feature collection. See ``madmex.overlay.conversions.predict_object_to_feature``
-        for more details about the structure of each feature.
+        list: A geojson like feature collection, in the crs of geoarray. Each feature
+        has a single ``id`` property (database id of the object) and a shapely geometry
+        as geometry, which can be passed as is to ``rasterio.features.rasterize``
+        (see ``madmex.overlay.extractions.zonal_stats_xarray``)
     """
     # TODO: We'll probably have to introduce a buffer here to account for the curving of reprojected extent
     geobox = geoarray.geobox
     crs = geoarray.crs._crs.ExportToProj4()
     poly = Polygon.from_geobox(geobox)
-    query_set = PredictObject.objects.filter(the_geom__contained=poly,
-                                             segmentation_information__name=segmentation_name)
-    fc = [predict_object_to_feature(x, crs) for x in query_set]
+    if cell is not None and not is_segmentation_indexed(segmentation_name, cell[0]):
+        cell = None
+    # Ids are resolved first and passed as constants, one query per segmentation with
+    # that name, so that the partial spatial index of each segmentation
+    # (madmex.util.db.index_segmentation) can be used
+    fc = []
+    for segmentation_id in get_segmentation_ids(segmentation_name):
+        query, params = segmentation_query(crs, segmentation_id, poly.ewkt, cell=cell)
+        fc += _query_features(query, params, 'id', itersize)
     return fc
 
+
+def training_query(crs, training_set, geom_ewkt, cell=None, sample=0, seed=0):
+    """Build the query of the objects of a training set falling in a tile
+
+    Args:
+        crs (str): proj4 string of the crs geometries are reprojected to
+        training_set (str): Training set identifier
+        geom_ewkt (str): EWKT extent of the tile, objects must be contained in it
+        cell (tuple): Optional (product, x, y) grid cell of the tile. When set,
+            objects are selected from the cell assignment (``madmex.io.tile_index``)
+            instead of the extent
+        sample (float): Proportion of the objects to sample (see
+            ``VectorDb.load_training_from_dataset``)
+        seed (int): Seed of the sampling
+
+    Return:
+        tuple: (query, params). Rows are (tag id, WKB geometry)
+    """
+    conditions = ['tc.training_set = %s']
+    params = [crs, training_set]
+    if cell is None:
+        conditions.append('obj.the_geom @ st_geomfromewkt(%s)')
+        params.append(geom_ewkt)
+    else:
+        conditions.append("""obj.id IN (
+        SELECT train_object_id FROM public.madmex_trainobjecttile
+        WHERE product = %s AND training_set = %s AND x = %s AND y = %s
+    )""")
+        params += [cell[0], training_set, cell[1], cell[2]]
+    if 0 < sample < 1:
+        # Uniform key in [0, 1) derived from the object id and the seed
+        conditions.append("(hashtext(tc.id::text || ':' || %s::text)::bigint + 2147483648) / 4294967296.0 < %s")
+        params += [seed, sample]
+    query = """
+SELECT
+    tc.interpret_tag_id,
+    st_asbinary(st_transform(obj.the_geom, %s::text))
+FROM
+    public.madmex_trainclassification AS tc
+INNER JOIN
+    public.madmex_trainobject AS obj ON tc.train_object_id = obj.id
+WHERE
+    {0}
+    """.format('\n    AND\n    '.join(conditions))
+    return query, params
+
+
+def segmentation_query(crs, segmentation_id, geom_ewkt, cell=None):
+    """Build the query of the objects of a segmentation falling in a tile
+
+    Args:
+        crs (str): proj4 string of the crs geometries are reprojected to
+        segmentation_id (int): Id of the segmentation
+        geom_ewkt (str): EWKT extent of the tile, objects must be contained in it
+        cell (tuple): Optional (product, x, y) grid cell of the tile. When set,
+            objects are selected from the cell assignment (``madmex.io.tile_index``)
+            instead of the extent
+
+    Return:
+        tuple: (query, params). Rows are (object id, WKB geometry)
+    """
+    conditions = ['obj.segmentation_information_id = %s']
+    params = [crs, segmentation_id]
+    if cell is None:
+        conditions.append('obj.the_geom @ st_geomfromewkt(%s)')
+        params.append(geom_ewkt)
+    else:
+        conditions.append("""obj.id IN (
+        SELECT predict_object_id FROM public.madmex_predictobjecttile AS t
+        WHERE t.product = %s AND t.segmentation_information_id = %s
+        AND t.x = %s AND t.y = %s AND t.contained
+    )""")
+        params += [cell[0], segmentation_id, cell[1], cell[2]]
+    query = """
+SELECT
+    obj.id,
+    st_asbinary(st_transform(obj.the_geom, %s::text))
+FROM
+    public.madmex_predictobject AS obj
+WHERE
+    {0}
+    """.format('\n    AND\n    '.join(conditions))
+    return query, params
+
+
+def _query_features(query, params, field, itersize):
+    """Run a query returning (property, WKB geometry) rows and build a feature collection
+
+    Rows are streamed through a server side cursor
+    """
+    fc = []
+    with connection.chunked_cursor() as c:
+        c.execute(query, params)
+        while True:
+            rows = c.fetchmany(itersize)
+            if not rows:
+                break
+            fc += [{'type': 'Feature',
+                    'geometry': wkb.loads(bytes(geom)),
+                    'properties': {field: value}} for value, geom in rows]
+    return fc
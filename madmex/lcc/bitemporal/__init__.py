@@ -14,11 +14,13 @@ from shapely import geometry
 from django.db import connection
 
 from madmex.io.vector_db import from_geobox
+from madmex.io.tile_index import is_classification_indexed
 from madmex.lcc.transform.elliptic import Transform as Elliptic
 from madmex.lcc.transform.kapur import Transform as Kapur
 from madmex.models import PredictClassification, ChangeObject, ChangeClassification
 from madmex.util.spatial import geometry_transform
 from madmex.util import randomword
+from madmex.util.xarray import to_band_array
 import numpy as np
 
 
@@ -31,6 +33,9 @@ class BaseBiChange(metaclass=abc.ABCMeta):
     Parent class implementing generic methods related to change detection results
     handling.
     """
+    # dtype of the array built by from_geoarray, None keeps the data type of the bands
+    dtype = None
+
     def __init__(self, array, affine, crs):
         """Parent class to run bi-temporal change detection
 
@@ -48,18 +53,25 @@ class BaseBiChange(metaclass=abc.ABCMeta):
 
 
     @classmethod
-    def from_geoarray(cls, geoarray, **kwargs):
+    def from_geoarray(cls, geoarray, release=False, **kwargs):
         """Instantiate class from a geoarray (xarray read with datacube.load)
 
         Args:
             geoarray (xarray.Dataset): a Dataset with crs and affine attribute. Typically
                 coming from a call to Datacube.load or GridWorkflow.load
+            release (bool): Remove the bands from geoarray as soon as they are copied,
+                leaving it empty, to lower peak memory. Only set it when geoarray is
+                not used afterwards
             **kwargs: Additional arguments. Allow children class to set algorithm specific
                 parameters during instantiation
+
+        The bands are copied one by one to a (bands, y, x) array of the ``dtype``
+        of the class
         """
-        array = geoarray.squeeze().to_array().values
         affine = Affine(*list(geoarray.affine)[0:6])
         crs = geoarray.crs._crs.ExportToProj4()
+        array = to_band_array(geoarray, band_axis=0, dtype=cls.dtype,
+                              release=release)
         return cls(array=array, affine=affine, crs=crs, **kwargs)
 
 
@@ -257,12 +269,17 @@ class BaseBiChange(metaclass=abc.ABCMeta):
         ChangeClassification.objects.bulk_create(class_list)
 
 
-    def read_land_cover(self, name):
+    def read_land_cover(self, name, cell=None):
         """Read the specified land cover map covering the extent of the instance array
 
         Args:
             name (str): Database classification identifier (see madmex_predictclassification
                 table)
+            cell (tuple): Optional (product, x, y) grid cell of the instance array (see
+                ``madmex.util.datacube.tile_cell``). When the segmentation of the
+                classification has been assigned to the grid of that product
+                (``madmex.io.tile_index``), only the objects of that cell are intersected
+                with the changes
 
         Return:
             list: A list of (geometry, tag_id) tupples in the crs of the instance.
@@ -293,12 +310,22 @@ INNER JOIN
 	AND
 	public.madmex_predictclassification.name = %%s
 INNER JOIN
-    %s ON st_intersects(obj.the_geom, %s.the_geom);
+    %s ON st_intersects(obj.the_geom, %s.the_geom)
         """ % (t_name, t_name)
+        params = [self.crs, name]
+        if cell is not None and is_classification_indexed(name, cell[0]):
+            query2 += """
+WHERE
+    obj.id IN (
+        SELECT predict_object_id FROM public.madmex_predictobjecttile
+        WHERE product = %s AND x = %s AND y = %s
+    )
+            """
+            params += list(cell)
         with connection.cursor() as c:
             c.execute(query0)
             c.execute(query1)
-            c.execute(query2, [self.crs, name])
+            c.execute(query2, params)
             fc = c.fetchall()
         # Deserialize geojson geometries
         fc = [(json.loads(x[0]), x[1]) for x in fc]
@@ -1,4 +1,5 @@
 from madmex.lcc.bitemporal import BaseBiChange
+from madmex.lcc.transform.distance import Transform as Distance
 import numpy as np
 
 
@@ -46,15 +47,21 @@ class BiChange(BaseBiChange):
     """Antares implementation of a simple distance based bi-temporal change detection algorithm
     """
     def __init__(self, array, affine, crs, norm='hist', threshold='kapur',
-                 **kwargs):
-        """Euclidean distance based change detection
+                 metric='euclidean', chunk_size=256, **kwargs):
+        """Distance based change detection
 
         Optionally performs histogram matching to normalize input arrays, compute
-        euclidean distance and determines change using the distance threshold
+        the distance between both arrays and determines change using the distance
+        threshold
 
         Args:
             norm (str): Normalization method to use in order to match source and
                 destination arrays (one of ``'hist'`` or ``None``)
+            metric (str): Pixel-wise distance to compute. One of ``'euclidean'``
+                (change vector magnitude), ``'angle'`` (spectral angle) or
+                ``'mahalanobis'``. See ``madmex.lcc.transform.distance.Transform``
+            chunk_size (int): Number of rows processed at once by the distance
+                kernel
             threshold (float or str): If numeric, distance value above which a
                 change is considered a change. If str, one of the automatic thresholding
                 method exposed in ``madmex.lcc.bitemporal.BaseBiChange.threshold_change``
@@ -86,6 +93,8 @@ class BiChange(BaseBiChange):
         self.algorithm = 'distance'
         self.norm = norm
         self.threshold = threshold
+        self.metric = metric
+        self.chunk_size = chunk_size
         self.kwargs = kwargs
 
 
@@ -96,7 +105,7 @@ class BiChange(BaseBiChange):
                 arr0_t = _hist_match_band(arr0, arr1)
             elif arr0.ndim == 3:
                 # Iterate over each band
-                arr0_t = np.empty(arr0.shape)
+                arr0_t = np.empty(arr0.shape, dtype=np.float32)
                 for i, band in enumerate(arr0):
                     arr0_t[i] = _hist_match_band(band, arr1[i])
             else:
@@ -106,13 +115,11 @@ class BiChange(BaseBiChange):
         else:
             raise ValueError('Invalid normalization method selected')
         # Compute distance between both ndarrays
-        if arr0.ndim == 2:
-            dist = np.absolute(arr0_t - arr1)
-        else: # 3
-            dist = np.linalg.norm(arr0_t - arr1, axis=0)
+        dist = Distance(arr0_t, arr1, metric=self.metric,
+                        chunk_size=self.chunk_size).transform()
         # Apply threshold and generate binary array
         if isinstance(self.threshold, (float, int)):
-            out_arr = np.where(dist > self.threshold, 1, 0).astype(np.uint8)
+            out_arr = np.greater(dist, self.threshold).view(np.uint8)
         else:
             if self.threshold == 'kapur':
                 self.kwargs.update(symmetrical=False)
@@ -0,0 +1,155 @@
+import numpy
+
+from madmex.lcc.transform import BitransformBase
+
+
+METRICS = ('euclidean', 'angle', 'mahalanobis')
+
+
+def _difference_moments(X, Y, chunk_size):
+    '''
+    Computes the mean vector and covariance matrix of the difference image X - Y,
+    accumulating sums chunk by chunk so that no full size difference image is ever
+    allocated. Sums are taken around the mean of the first chunk to limit the loss
+    of precision of the single pass algorithm.
+    '''
+    bands, rows, cols = X.shape
+    shift = None
+    s1 = numpy.zeros(bands)
+    s2 = numpy.zeros((bands, bands))
+    buf = numpy.empty((bands, chunk_size * cols), dtype=numpy.float32)
+    for start in range(0, rows, chunk_size):
+        stop = min(start + chunk_size, rows)
+        D = buf[:, :(stop - start) * cols]
+        numpy.subtract(X[:, start:stop].reshape(bands, -1),
+                       Y[:, start:stop].reshape(bands, -1),
+                       out=D, dtype=numpy.float32)
+        if shift is None:
+            shift = D.mean(axis=1, dtype=numpy.float64).astype(numpy.float32)
+        numpy.subtract(D, shift[:,numpy.newaxis], out=D)
+        s1 += D.sum(axis=1, dtype=numpy.float64)
+        s2 += numpy.matmul(D, D.T)
+    n = rows * cols
+    mean = shift + s1 / n
+    cov = (s2 - numpy.outer(s1, s1) / n) / (n - 1)
+    return mean, cov
+
+
+class Transform(BitransformBase):
+    '''Antares implementation of a fused pixel-wise distance between two arrays
+
+    Computes, for every pixel, the distance between the spectral vectors of two
+    matching arrays. The computation is done by blocks of rows in float32, re-using
+    a fixed set of scratch buffers and writing directly into the output array, so
+    that the memory footprint does not grow with the number of bands.
+
+    Supported metrics are:
+        - ``euclidean``: Norm of the difference vector (change vector magnitude)
+        - ``angle``: Spectral angle (in radians) between both vectors
+        - ``mahalanobis``: Norm of the difference vector whitened by the
+          covariance of the difference image
+    '''
+    def __init__(self, X, Y, metric='euclidean', chunk_size=256, out=None):
+        '''Instantiate distance transform class
+
+        Args:
+            metric (str): Distance metric to compute. One of ``'euclidean'``,
+                ``'angle'`` or ``'mahalanobis'``
+            chunk_size (int): Number of rows processed at once
+            out (np.ndarray): Optional 2D float32 array of shape (y, x) in which the
+                result is written. Allocated when not provided
+        '''
+        super().__init__(X, Y)
+        if metric not in METRICS:
+            raise ValueError('metric must be one of %s' % ', '.join(METRICS))
+        if out is not None and (out.shape != (self.rows, self.cols)
+                                or out.dtype != numpy.float32):
+            raise ValueError('out must be a float32 array of shape (%d, %d)'
+                             % (self.rows, self.cols))
+        self.metric = metric
+        self.chunk_size = max(1, min(int(chunk_size), self.rows))
+        self.out = out
+
+
+    def _euclidean(self, X, Y, out, buf):
+        numpy.subtract(X[0], Y[0], out=out, dtype=numpy.float32)
+        numpy.multiply(out, out, out=out)
+        for i in range(1, X.shape[0]):
+            numpy.subtract(X[i], Y[i], out=buf, dtype=numpy.float32)
+            numpy.multiply(buf, buf, out=buf)
+            numpy.add(out, buf, out=out)
+        numpy.sqrt(out, out=out)
+
+
+    def _angle(self, X, Y, out, buf):
+        buf, norm_x, norm_y = buf
+        norm_x.fill(0)
+        norm_y.fill(0)
+        out.fill(0)
+        for i in range(X.shape[0]):
+            x = X[i].astype(numpy.float32, copy=False)
+            y = Y[i].astype(numpy.float32, copy=False)
+            numpy.multiply(x, y, out=buf)
+            numpy.add(out, buf, out=out)
+            numpy.multiply(x, x, out=buf)
+            numpy.add(norm_x, buf, out=norm_x)
+            numpy.multiply(y, y, out=buf)
+            numpy.add(norm_y, buf, out=norm_y)
+        numpy.multiply(norm_x, norm_y, out=norm_x)
+        numpy.sqrt(norm_x, out=norm_x)
+        # Null vectors are given an angle of zero
+        numpy.divide(out, norm_x, out=out, where=norm_x > 0)
+        out[norm_x == 0] = 1
+        numpy.clip(out, -1, 1, out=out)
+        numpy.arccos(out, out=out)
+
+
+    def _mahalanobis(self, X, Y, out, buf, mean, whitening):
+        bands = X.shape[0]
+        D, Z = buf
+        n = out.size
+        D = D[:, :n]
+        Z = Z[:, :n]
+        numpy.subtract(X.reshape(bands, -1), Y.reshape(bands, -1), out=D,
+                       dtype=numpy.float32)
+        numpy.subtract(D, mean[:,numpy.newaxis], out=D)
+        numpy.matmul(whitening, D, out=Z)
+        numpy.multiply(Z, Z, out=Z)
+        numpy.sum(Z, axis=0, out=out.reshape(-1))
+        numpy.sqrt(out, out=out)
+
+
+    def transform(self):
+        '''Computes the pixel-wise distance between both arrays
+
+        Return:
+            np.ndarray: 2D float32 array of distances
+        '''
+        out = self.out
+        if out is None:
+            out = numpy.empty((self.rows, self.cols), dtype=numpy.float32)
+        chunk = self.chunk_size
+        if self.metric == 'mahalanobis':
+            mean, cov = _difference_moments(self.X, self.Y, chunk)
+            # Inverse of the cholesky factor of the covariance matrix whitens the differences
+            lower = numpy.linalg.cholesky(cov)
+            whitening = numpy.linalg.inv(lower).astype(numpy.float32)
+            mean = mean.astype(numpy.float32)
+            buf = (numpy.empty((self.bands, chunk * self.cols), dtype=numpy.float32),
+                   numpy.empty((self.bands, chunk * self.cols), dtype=numpy.float32))
+        elif self.metric == 'angle':
+            buf = numpy.empty((3, chunk, self.cols), dtype=numpy.float32)
+        else:
+            buf = numpy.empty((chunk, self.cols), dtype=numpy.float32)
+        for start in range(0, self.rows, chunk):
+            stop = min(start + chunk, self.rows)
+            X = self.X[:, start:stop]
+            Y = self.Y[:, start:stop]
+            out_chunk = out[start:stop]
+            if self.metric == 'euclidean':
+                self._euclidean(X, Y, out_chunk, buf[:stop - start])
+            elif self.metric == 'angle':
+                self._angle(X, Y, out_chunk, buf[:, :stop - start])
+            else:
+                self._mahalanobis(X, Y, out_chunk, buf, mean, whitening)
+        return out
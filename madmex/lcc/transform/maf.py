@@ -8,19 +8,38 @@ import numpy
 from madmex.lcc.transform import TransformBase
 
 
-def _spatial_covariance(X, h):
+def _overlap(shift, length):
     '''
-    This method computes the spatial covariance for an image. This is, the covariance of an
-    image with itself, but shifted by an amount specified with h.
+    Returns a pair of slices selecting the elements of an axis of size length that
+    overlap when the axis is shifted by an amount specified with shift.
     '''
-    X_mean = numpy.average(X, axis=(1,2))
-    X_shifted = numpy.roll(numpy.roll(X, h[1], axis=1), h[0], axis=2)
-    bands = X.shape[0]
-    pixels = X.shape[1] * X.shape[2]
-    X_centered = (X - X_mean[:,numpy.newaxis,numpy.newaxis]).reshape(bands, pixels)
-    X_shifted_centered = (X_shifted - X_mean[:,numpy.newaxis,numpy.newaxis]).reshape(bands, pixels)
-    C = numpy.matmul(X_centered, X_shifted_centered.T) / (pixels - 1)
-    return C
+    if shift >= 0:
+        return slice(shift, length), slice(0, length - shift)
+    return slice(0, length + shift), slice(-shift, length)
+
+
+def _spatial_covariance(X_centered, h):
+    '''
+    This method computes the spatial covariance for an already centered image. This is,
+    the covariance of an image with itself, but shifted by an amount specified with h.
+
+    Instead of shifting a copy of the image, the covariance is accumulated row by row
+    over the two overlapping slices (views) of the image. Since the covariance for -h
+    is the transpose of the covariance for h, both are obtained from a single pass.
+
+    Return:
+        tuple: The covariance matrices for h and -h
+    '''
+    bands, rows, cols = X_centered.shape
+    rows_0, rows_1 = _overlap(h[1], rows)
+    cols_0, cols_1 = _overlap(h[0], cols)
+    X_0 = X_centered[:, rows_0, cols_0]
+    X_1 = X_centered[:, rows_1, cols_1]
+    C = numpy.zeros((bands, bands))
+    for i in range(X_0.shape[1]):
+        C += numpy.matmul(X_0[:, i], X_1[:, i].T)
+    C /= (X_0.shape[1] * X_0.shape[2] - 1)
+    return C, C.T
 
 
 class Transform(TransformBase):
@@ -50,8 +69,15 @@ class Transform(TransformBase):
         Return:
             np.ndarray: Transformed array
         '''
-        sigma = _spatial_covariance(self.X, numpy.array((0,0)))
-        gamma = 2 * sigma - _spatial_covariance(self.X, self.h) - _spatial_covariance(self.X, -self.h)
+        pixels = self.rows * self.cols
+        X_mean = numpy.average(self.X, axis=(1,2))
+        X_centered = self.X - X_mean[:,numpy.newaxis,numpy.newaxis]
+        X_pixel_band = X_centered.reshape(self.bands, pixels)
+        sigma = numpy.matmul(X_pixel_band, X_pixel_band.T) / (pixels - 1)
+        C_plus, C_minus = _spatial_covariance(X_centered, self.h)
+        # Release the centered copy before allocating the transformed array
+        del X_centered, X_pixel_band
+        gamma = 2 * sigma - C_plus - C_minus
         lower = numpy.linalg.cholesky(sigma)
         lower_inverse = numpy.linalg.inv(lower)
         eig_problem = numpy.matmul(numpy.matmul(lower_inverse, gamma), lower_inverse.T)
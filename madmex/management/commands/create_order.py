@@ -32,6 +32,9 @@ Example usage:
 --------------
 # Downloads the Landsat 8 scenes that intersect the state of Jalisco and where taken during 2017.
 antares create_order --shape 'Jalisco'  --start-date '2017-01-01' --end-date '2017-12-31' --landsat 8
+
+# Same, ignoring the search results cached by a previous run
+antares create_order --shape 'Jalisco'  --start-date '2017-01-01' --end-date '2017-12-31' --landsat 8 --no-cache
 '''
     def add_arguments(self, parser):
         '''
@@ -46,6 +49,9 @@ antares create_order --shape 'Jalisco'  --start-date '2017-01-01' --end-date '20
                             type=int,
                             default=100, 
                             help='Maximum amount of cloud cover.')
+        parser.add_argument('--no-cache',
+                            action='store_true',
+                            help='Query the usgs api again instead of reading the cached search results.')
 
     def handle(self, **options):
         '''This method takes a given shape names and queries the usgs api for available scenes.
@@ -91,24 +97,23 @@ antares create_order --shape 'Jalisco'  --start-date '2017-01-01' --end-date '20
                 collection_espa = 'tm5_collection'
                 collection_regex = '^lt05_{1}\\w{4}_{1}[0-9]{6}_{1}[0-9]{8}_{1}[0-9]{8}_{1}[0-9]{2}_{1}\\w{2}$'
 
-            data = usgs_client.search(extent, collection_usgs, start_date=start_date, end_date=end_date, max_cloud_cover=cloud_cover).get('data')
+            scenes = usgs_client.iter_search(extent, collection_usgs, start_date=start_date,
+                                             end_date=end_date, max_cloud_cover=cloud_cover,
+                                             cache=not options['no_cache'])
 
             products = ['sr', 'pixel_qa']
             interest = []
-            if data:
-                results= data.get('results')
-                if results:
-                    for scene in results:
-                        coords = tuple(point_from_object(scene.get(coord)) for coord in ['lowerLeftCoordinate', 'upperLeftCoordinate', 'upperRightCoordinate', 'lowerRightCoordinate', 'lowerLeftCoordinate'])
-                        scene_extent = Polygon(coords)
-                        entity_id = scene.get('displayId')
-                        # we use the same regular expression that espa uses to filter the names that are valid; otherwise, the order throws an error
-                        if scene_extent.intersects(shape_object.the_geom) and re.match(collection_regex, entity_id.lower()):
-                            interest.append(entity_id)
-                            footprint, _ = Footprint.objects.get_or_create(
-                                name=entity_id,
-                                the_geom=scene_extent
-                            )
+            for scene in scenes:
+                coords = tuple(point_from_object(scene.get(coord)) for coord in ['lowerLeftCoordinate', 'upperLeftCoordinate', 'upperRightCoordinate', 'lowerRightCoordinate', 'lowerLeftCoordinate'])
+                scene_extent = Polygon(coords)
+                entity_id = scene.get('displayId')
+                # we use the same regular expression that espa uses to filter the names that are valid; otherwise, the order throws an error
+                if scene_extent.intersects(shape_object.the_geom) and re.match(collection_regex, entity_id.lower()):
+                    interest.append(entity_id)
+                    footprint, _ = Footprint.objects.get_or_create(
+                        name=entity_id,
+                        the_geom=scene_extent
+                    )
             print(json.dumps(interest, indent=4))
             data = espa_client.order(collection_espa, interest, products)
             if data.get('status') == 'ordered':
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+"""
+Author: Loic Dutrieux
+Date: 2026-10-19
+Purpose: Maintain the indexes and physical ordering of the prediction tables
+"""
+import logging
+
+from madmex.management.base import AntaresBaseCommand
+from madmex.models import SegmentationInformation
+from madmex.util.db import (index_segmentation, drop_orphan_segmentation_indexes,
+                            cluster_predict_objects)
+
+logger = logging.getLogger(__name__)
+
+class Command(AntaresBaseCommand):
+    help = """
+Maintain indexes and spatial clustering of the madmex_predictobject table
+
+Every segmentation can be given its own partial spatial index, restricted to its objects, which
+partitions the spatial index of the table by segmentation. Queries filtering objects by segmentation
+and geometry (object based prediction, db_to_vector, validate, ...) resolve the segmentation id first
+and pass it as a constant, so that the planner can use the index and only scan the entries of that
+segmentation. Classification queries are covered by the (name, predict_object) index of the
+madmex_predictclassification table created by the migrations.
+
+Clustering rewrites the table in the order of its spatial index so that neighbouring objects are
+stored together; it should be ran after bulk loads (segment command) and takes an exclusive lock
+on the table.
+
+Note that declarative partitioning of the tables is not used, PostgreSQL (< 12) does not support
+foreign keys referencing partitioned tables (madmex_predictclassification -> madmex_predictobject)
+
+--------------
+Example usage:
+--------------
+# Create the partial spatial index of a segmentation
+antares db_maintenance --segmentation s2_001_jalisco_2017
+
+# Index all segmentations, drop indexes of deleted segmentations and re-cluster the table
+antares db_maintenance --all --drop_orphans --cluster
+"""
+    def add_arguments(self, parser):
+        parser.add_argument('-seg', '--segmentation',
+                            type=str,
+                            nargs='*',
+                            default=[],
+                            help='Names of the segmentations to index')
+        parser.add_argument('--all',
+                            action='store_true',
+                            help='Index every segmentation registered in the database')
+        parser.add_argument('--drop_orphans',
+                            action='store_true',
+                            help='Drop the indexes of segmentations that no longer exist')
+        parser.add_argument('--cluster',
+                            action='store_true',
+                            help='Cluster the predict object table on its spatial index and update planner statistics')
+
+    def handle(self, *args, **options):
+        qs = SegmentationInformation.objects.all()
+        if not options['all']:
+            qs = qs.filter(name__in=options['segmentation'])
+        for seg in qs:
+            name = index_segmentation(seg.id)
+            logger.info('Index %s created for segmentation %s', name, seg.name)
+        if options['drop_orphans']:
+            for name in drop_orphan_segmentation_indexes():
+                logger.info('Dropped index %s', name)
+        if options['cluster']:
+            cluster_predict_objects()
+            logger.info('Table madmex_predictobject clustered')
@@ -10,6 +10,9 @@ from madmex.management.base import AntaresBaseCommand
 
 from madmex.models import Country, Region, PredictClassification
 from madmex.util.spatial import feature_transform
+from madmex.util.db import get_classification_segmentation_ids
+
+from itertools import chain
 
 import fiona
 from fiona.crs import from_string
@@ -106,12 +109,16 @@ antares db_to_vector --region Jalisco --name s2_001_jalisco_2017_bis_rf_1 --file
 
         # Query objects
         logger.info('Querying the database for intersecting records')
-        qs = PredictClassification.objects.filter(name=name)
-        qs = qs.filter(predict_object__the_geom__intersects=region).prefetch_related('predict_object', 'tag')
-
-        # Convert query set to feature collection generator
+        # One query per (constant) segmentation id allows use of their partial spatial index
+        qs_list = [PredictClassification.objects.filter(
+                       name=name, predict_object__segmentation_information_id=segmentation_id,
+                       predict_object__the_geom__intersects=region)
+                   .prefetch_related('predict_object', 'tag')
+                   for segmentation_id in get_classification_segmentation_ids(name)]
+
+        # Convert query sets to feature collection generator
         logger.info('Generating feature collection')
-        fc = (to_fc(x) for x in qs)
+        fc = (to_fc(x) for x in chain(*qs_list))
         crs = '+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs'
         if proj4 is not None:
             fc = (feature_transform(x, crs_out=proj4) for x in fc)
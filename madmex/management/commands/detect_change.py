@@ -16,6 +16,7 @@ from madmex.management.base import AntaresBaseCommand
 from madmex.util import parser_extra_args, join_dicts
 from madmex.wrappers import gwf_query, detect_and_classify_change
 from madmex.models import ChangeInformation
+from madmex.rest.vector_tiles import invalidate_tiles
 
 logger = logging.getLogger(__name__)
 
@@ -168,6 +169,7 @@ using the antares bi_change_params command line''')
                           'extra_args': extra_args,
                           'filter_labels': filter_labels})
         result = client.gather(C)
+        invalidate_tiles('change', name)
 
         print('Successfully ran change detection on %d tiles' % sum(result))
         print('%d tiles failed' % result.count(False))
@@ -5,11 +5,11 @@ Created on Jan 9, 2018
 '''
 import logging
 
+from madmex.api.download import download_order
 from madmex.api.remote import EspaApi
 from madmex.management.base import AntaresBaseCommand
 from madmex.models import Order
 from madmex.settings import TEMP_DIR
-from madmex.util.local import aware_download
 
 
 logger = logging.getLogger(__name__)
@@ -20,24 +20,33 @@ Command line option to download scenes using the ESPA api. An order must be plac
 advanced using the create_order command. When an order is placed, ESPA will take some
 time to process the order. When it is ready an email confirmation is sent. This command
 looks into the database for orders that had not been downloaded yet. It then parses the
-contents of the order.
+contents of the order and downloads its items concurrently. Items are verified against
+their checksum and the download state of each order is recorded in the database; an order
+is marked as downloaded once all its items are complete.
 
 --------------
 Example usage:
 --------------
 # Downloads the orders found in the database that have not been downloaded yet.
 antares download_order
+
+# Same with 8 concurrent downloads. Interrupted downloads are resumed when the
+# command is ran again
+antares download_order --workers 8
 '''
+    def add_arguments(self, parser):
+        parser.add_argument('-w', '--workers',
+                            type=int,
+                            default=4,
+                            help='Number of files downloaded concurrently')
+        parser.add_argument('-d', '--directory',
+                            type=str,
+                            default=TEMP_DIR,
+                            help='Directory where the files are downloaded. Defaults to TEMP_DIR')
+
     def handle(self, **options):
         client = EspaApi()
         for order in Order.objects.filter(downloaded=False):
             logger.info(order.order_id)
-            payload = client.get_list_order(order.order_id)
-            for image in payload[order.order_id]:
-                if image['product_dload_url']:
-                    logger.info('Download %s' % image['product_dload_url'])
-                    aware_download(image['product_dload_url'], TEMP_DIR)
-                else:
-                    logger.info('Skipping bad file')
-            order.downloaded = True
-            order.save()
+            download_order(order, client, options['directory'],
+                           workers=options['workers'])
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+
+"""
+Author: Loic Dutrieux
+Date: 2026-10-19
+Purpose: Register the footprints of already indexed datasets to the extent index
+"""
+import logging
+
+from madmex.management.base import AntaresBaseCommand
+from madmex.indexing import index_extents
+
+logger = logging.getLogger(__name__)
+
+class Command(AntaresBaseCommand):
+    help = """
+Register the footprints of the datasets of one or several datacube products to the extent index
+
+Datasets indexed by antares (apply_recipe) are added to the extent index as
+they are indexed; this command only needs to be ran for datasets indexed before the index
+existed or by other tools (e.g. datacube dataset add, datacube ingest). The footprints
+are then served by the datacube and datacube_landsat_tiles endpoints of the web application.
+
+--------------
+Example usage:
+--------------
+antares index_extents -p ls8_espa_mexico_uncompressed s2_001_jalisco_2017_0
+"""
+    def add_arguments(self, parser):
+        parser.add_argument('-p', '--product',
+                            type=str,
+                            nargs='+',
+                            required=True,
+                            help='Names of the datacube products whose datasets footprints are registered')
+
+    def handle(self, *args, **options):
+        for product in options['product']:
+            count = index_extents(product)
+            logger.info('Product %s: %d dataset footprints added to the extent index',
+                        product, count)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+"""
+Author: Loic Dutrieux
+Date: 2026-10-19
+Purpose: Assign segmentation and training objects to the cells of a datacube product grid
+"""
+import logging
+
+from madmex.management.base import AntaresBaseCommand
+from madmex.io.tile_index import assign_segmentation_cells, assign_training_set_cells
+from madmex.wrappers import gwf_query
+
+logger = logging.getLogger(__name__)
+
+class Command(AntaresBaseCommand):
+    help = """
+Materialize the assignment of segmentation and/or training objects to the tiles of a datacube product
+
+Once a segmentation (or training set) has been indexed for a product, object based prediction
+(model_predict_object), training data extraction (model_fit) and change classification (detect_change)
+running on tiles of that product retrieve the objects of every tile by equality lookup instead
+of running spatial queries. Indexing has to be re-ran when objects of the segmentation or training
+set are added or removed.
+
+--------------
+Example usage:
+--------------
+# Assign the objects of a segmentation to the tiles of the product used for prediction
+antares index_tiles -p s2_001_jalisco_2017_0 -r Jalisco --segmentation s2_001_jalisco_2017
+
+# Same for a training set
+antares index_tiles -p s2_001_jalisco_2017_0 -r Jalisco --training_set jalisco_bits
+"""
+    def add_arguments(self, parser):
+        parser.add_argument('-p', '--product',
+                            type=str,
+                            required=True,
+                            help='Name of the datacube product whose grid is used')
+        parser.add_argument('-lat', '--lat',
+                            type=float,
+                            nargs=2,
+                            default=None,
+                            help='minimum and maximum latitude of the bounding box to index')
+        parser.add_argument('-long', '--long',
+                            type=float,
+                            nargs=2,
+                            default=None,
+                            help='minimum and maximum longitude of the bounding box to index')
+        parser.add_argument('-r', '--region',
+                            type=str,
+                            default=None,
+                            help=('Name of the region to index. The geometry of the region should be present '
+                                  'in the madmex-region or the madmex-country table of the database (Overrides lat and long when present) '
+                                  'Use ISO country code for country name'))
+        parser.add_argument('-seg', '--segmentation',
+                            type=str,
+                            nargs='*',
+                            default=[],
+                            help='Names of the segmentations to index')
+        parser.add_argument('-ts', '--training_set',
+                            type=str,
+                            nargs='*',
+                            default=[],
+                            help='Names of the training sets to index')
+
+    def handle(self, *args, **options):
+        gwf_kwargs = {k: options[k] for k in ['product', 'lat', 'long', 'region']}
+        cells = gwf_query(view=False, **gwf_kwargs)
+
+        for name in options['segmentation']:
+            count = assign_segmentation_cells(name, cells)
+            logger.info('Segmentation %s: %d objects assigned to %d tiles', name, count,
+                        len(cells))
+        for name in options['training_set']:
+            count = assign_training_set_cells(name, cells)
+            logger.info('Training set %s: %d objects assigned to %d tiles', name, count,
+                        len(cells))
@@ -5,18 +5,10 @@ Created on Jan 19, 2018
 @author: agutierrez
 '''
 
-from functools import partial
 import logging
 
-from django.contrib.gis.geos.geometry import GEOSGeometry
-from django.db.utils import IntegrityError
-import fiona
-import pyproj
-from shapely.geometry.geo import shape
-from shapely.ops import transform
-
+from madmex.io.bulk import ingest_footprints, footprint_name_fun
 from madmex.management.base import AntaresBaseCommand
-from madmex.models import Footprint, Country
 
 
 logger = logging.getLogger(__name__)
@@ -30,38 +22,19 @@ class Command(AntaresBaseCommand):
         parser.add_argument('--shape', nargs=1, help='The name of the shape to ingest.')
         parser.add_argument('--sensor', nargs=1, help='The name of the sensor for these footprints.')
         parser.add_argument('--country', nargs=1, help='Country to filter the footprints.')
-        parser.add_argument('--column', nargs=1, help='Column of interest in shapefile.')
+        parser.add_argument('--column', nargs=1, default=None,
+                            help=('Column of the shapefile holding the footprint names. '
+                                  'Defaults to Landsat path and row (PATH and ROW columns).'))
 
     def handle(self, **options):
         shape_file = options['shape'][0]
         sensor = options['sensor'][0]
         country = options['country'][0]
-        column = options['column'][0]
-
-        country_object = Country.objects.get(name=country)
-
-
-        with fiona.open(shape_file) as source:
-            print(source.crs)
-            for feat in source:
-                s1 = shape(feat['geometry'])
-
-                if source.crs['init'] !=  'epsg:4326':
-                    project = partial(
-                        pyproj.transform,
-                        pyproj.Proj(source.crs),
-                        pyproj.Proj(init='EPSG:4326'))
-                    s2 = transform(project, s1)
-                else:
-                    s2 = s1
-                geom = GEOSGeometry(s2.wkt)
+        column = options['column']
 
-                if country_object.the_geom.intersects(geom):
-                    name = '%03d%03d' % (feat['properties']['PATH'], feat['properties']['ROW'])
-                    if name:
-                        try:
-                            o = Footprint(the_geom = geom, sensor=sensor, name=name)
-                            o.save()
-                        except IntegrityError:
-                            logger.error('Name %s already exists.' % name)
+        name_fun = footprint_name_fun(column[0] if column else None)
 
+        n_read, n_added = ingest_footprints(shape_file, sensor=sensor, country=country,
+                                            name_fun=name_fun)
+        logger.info('%d footprints read, %d intersecting %s added (existing names are skipped)',
+                    n_read, n_added, country)
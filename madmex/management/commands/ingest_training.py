@@ -4,18 +4,11 @@ Created on Jan 19, 2018
 @author: agutierrez
 '''
 
-from functools import partial
 import logging
 
-from django.contrib.gis.geos.geometry import GEOSGeometry
-import fiona
-import pyproj
-from shapely.geometry.geo import shape
-from shapely.ops import transform
-
+from madmex.io.bulk import ingest_training
 from madmex.management.base import AntaresBaseCommand
-from madmex.models import TrainObject, Tag, TrainClassification
-from madmex.util.local import basename
+from madmex.rest.vector_tiles import invalidate_tiles
 
 
 logger = logging.getLogger(__name__)
@@ -74,61 +67,11 @@ antares ingest_training --shape <path-to-file>/1349025_finalcut.shp
         scheme = options['scheme']
         filter = options['filter']
         
-        filename = basename(shape_file, False)
-        
         if filter is not None and filter <= 1:
             filter = None
 
-        with fiona.open(shape_file) as source:
-            project = partial(
-                pyproj.transform,
-                pyproj.Proj(source.crs),
-                pyproj.Proj(init='EPSG:4326'))
-            if filter == None:
-                object_list = [(TrainObject(the_geom = GEOSGeometry(transform(project, shape(feat['geometry'])).wkt),
-                                        filename=filename,
-                                        creation_year=year), feat['properties']) for feat in source]
-            else:
-                object_list = [(TrainObject(the_geom = GEOSGeometry(transform(project, shape(feat['geometry'])).wkt),
-                                        filename=filename,
-                                        creation_year=year), feat['properties']) for ind, feat in enumerate(source) if ind % filter == 0]
-        TrainObject.objects.bulk_create(list(map(lambda x: x[0], object_list)))
-
-        
-        train_classification_objects = []
-        
-        tag_map = {}
-
-        for tup in object_list:
-            o = tup[0]
-            p = tup[1]
-            
-            value = p[interpret]
-            interpret_tag = tag_map.get(value)                
-            if not interpret_tag:                    
-                interpret_tag, created = Tag.objects.get_or_create(
-                    numeric_code=value,
-                    scheme=scheme
-                )
-                tag_map[value] = interpret_tag
-                if created:
-                    logger.info('New tag created with values: numeric_code=%s, scheme=%s' % (value, scheme))
-            
-            predict_tag = None
-            if predict is not None:
-                value = p[predict]
-                predict_tag = tag_map.get(value)
-                if not predict_tag:
-                    try:
-                        predict_tag = Tag.objects.get(numeric_code=value, scheme=scheme)
-                    except Tag.DoesNotExist:
-                        predict_tag = Tag.objects.get(numeric_code=value, scheme=scheme)
-                        predict_tag.save()
-                    tag_map[value] = predict_tag
-            
-            train_classification_objects.append(TrainClassification(train_object=o,
-                                                           predict_tag=predict_tag,
-                                                           interpret_tag=interpret_tag,
-                                                           training_set=dataset))
-        TrainClassification.objects.bulk_create(train_classification_objects)
-        
\ No newline at end of file
+        count = ingest_training(shape_file, interpret=interpret, dataset=dataset,
+                                scheme=scheme, year=year, predict=predict,
+                                every=filter)
+        logger.info('%d objects ingested to training set %s' % (count, dataset))
+        invalidate_tiles('training', dataset)
@@ -7,17 +7,9 @@ Purpose: Ingest a vector file containing validation data into the antares databa
 """
 
 import logging
-import json
-import os
-
-from django.contrib.gis.geos.geometry import GEOSGeometry
-import fiona
-from fiona.crs import to_string
-from pyproj import Proj
 
+from madmex.io.bulk import ingest_validation
 from madmex.management.base import AntaresBaseCommand
-from madmex.models import ValidObject, Tag, ValidClassification
-from madmex.util.spatial import feature_transform
 
 logger = logging.getLogger(__name__)
 
@@ -54,48 +46,8 @@ antares ingest_validation /path/to/file.shp --scheme madmex --year 2015 --name r
         scheme = options['scheme']
         field = options['field']
         name = options['name']
-        # Create ValidClassification objects list
-        # Push it to database
-
-        # Read file and Optionally reproject the features to longlat
-        with fiona.open(input_file) as src:
-            p = Proj(src.crs)
-            if p.is_latlong(): # Here we assume that geographic coordinates are automatically 4326 (not quite true)
-                fc = list(src)
-            else:
-                crs_str = to_string(src.crs)
-                fc = [feature_transform(x, crs_out='+proj=longlat', crs_in=crs_str)
-                      for x in src]
-
-        # Write features to ValidObject table
-        def valid_obj_builder(x):
-            """Build individual ValidObjects
-            """
-            geom = GEOSGeometry(json.dumps(x['geometry']))
-            obj = ValidObject(the_geom=geom)
-            return obj
-
-        obj_list = [valid_obj_builder(x) for x in fc]
-        ValidObject.objects.bulk_create(obj_list)
-
-        # Get list of unique tags
-        unique_numeric_codes = list(set([x['properties'][field] for x in fc]))
-
-        # Update Tag table using get or create
-        def make_tag_tuple(x):
-            obj, _ = Tag.objects.get_or_create(numeric_code=x, scheme=scheme)
-            return (x, obj)
-
-        tag_dict = dict([make_tag_tuple(x) for x in unique_numeric_codes])
-
-        # Build validClassification object list (valid_tag, valid_object, valid_set)
-        def valid_class_obj_builder(x):
-            """x is a tuple (ValidObject, feature)"""
-            tag = tag_dict[x[1]['properties'][field]]
-            obj = ValidClassification(valid_tag=tag, valid_object=x[0],
-                                      valid_set=name, interpretation_year=year)
-            return obj
-
-        valid_class_obj_list = [valid_class_obj_builder(x) for x in zip(obj_list, fc)]
-
-        ValidClassification.objects.bulk_create(valid_class_obj_list)
+        # Features are streamed from the file and copied to the
+        # ValidObject and ValidClassification tables in batches
+        count = ingest_validation(input_file, field=field, name=name, scheme=scheme,
+                                  year=year)
+        logger.info('%d objects ingested to validation set %s', count, name)
@@ -5,19 +5,12 @@ Author: Loic Dutrieux
 Date: 2018-07-23
 Purpose: Generates a raster mask for a given country
 """
-import json
-from math import ceil, floor
-import itertools
 import os
 
 from madmex.management.base import AntaresBaseCommand
-from madmex.models import Country
+from madmex.io.mask_cache import region_mask
 from django.db import connection
 import rasterio
-from rasterio import features
-from affine import Affine
-import numpy as np
-import dask.array as da
 from madmex.util import s3, parsers
 from madmex.util.spatial import grid_gen
 
@@ -70,23 +63,19 @@ antares make_country_mask --country mex -res 100 -tile 5000 --path sandbox --buc
         bucket = options['bucket']
         path = options['path']
 
-        # Retrieve data from database (country extent and POLYGON)
+        # Retrieve country extent from database
         query_0 = 'SELECT st_extent(the_geom) FROM public.madmex_country WHERE name = %s;'
-        query_1 = 'SELECT st_asgeojson(the_geom, 6) FROM public.madmex_country WHERE name = %s;'
         with connection.cursor() as c:
             c.execute(query_0, [country.upper()])
             bbox = c.fetchone()
-            c.execute(query_1, [country.upper()])
-            geom = c.fetchone()
         extent = parsers.postgis_box_parser(bbox[0])
-        geom = json.loads(geom[0])
 
         # Generate the binary rasters (1 for inside country, 0 for outside)
+        # Masks of every tile are rasterized once and then read from the mask cache
         grid_generator = grid_gen(extent, resolution, tile_size,
                                   prefix='land_mask_tile')
         for shape, aff, filename in grid_generator:
-            arr = features.rasterize([(geom, 1)], out_shape=shape, transform=aff,
-                                     dtype=np.uint8)
+            arr = region_mask(country.upper(), aff, shape)
             meta = {'driver': 'GTiff',
                     'height': shape[0],
                     'width': shape[1],
@@ -84,6 +84,10 @@ antares model_fit -p s2_001_jalisco_2017_0 -t jalisco_bits --region Jalisco --fi
                             type=float,
                             default=0.2,
                             help='Proportion of the training data to use. Must be float between 0 and 1. A random sampling of the training objects is performed (defaults to 0.2).')
+        parser.add_argument('-seed', '--seed',
+                            type=int,
+                            default=0,
+                            help='Seed of the random sampling of the training data. The same training objects are sampled for a given seed (defaults to 0).')
         parser.add_argument('-name', '--name',
                             type=str,
                             default=None,
@@ -113,6 +117,13 @@ antares model_fit -p s2_001_jalisco_2017_0 -t jalisco_bits --region Jalisco --fi
 Additional named arguments passed to the selected model class constructor. These arguments have
 to be passed in the form of key=value pairs. e.g.: model_fit ... -extra arg1=12 arg2=median
 To consult the exposed arguments for each model, use the "model_params" command line''')
+        parser.add_argument('-shape', '--shape_features',
+                            type=str,
+                            nargs='*',
+                            default=None,
+                            help=('Optional list of shape metrics of the geometries to use as additional features '
+                                  '(any of area, perimeter, bperim, para, compact, smooth, shape, frac). '
+                                  'The same list must be used for model fitting and prediction'))
         parser.add_argument('-sc', '--scheduler',
                             type=str,
                             default=None,
@@ -128,8 +139,10 @@ To consult the exposed arguments for each model, use the "model_params" command
         kwargs = parser_extra_args(options['extra_kwargs'])
         categorical_variables = options['categorical_variables']
         sample = options['sample']
+        seed = options['seed']
         filename = options['filename']
         scheduler_file = options['scheduler']
+        shape_features = options['shape_features']
         remove_outliers = options['remove_outliers']
 
         # Prepare encoding of categorical variables if any specified
@@ -156,7 +169,9 @@ To consult the exposed arguments for each model, use the "model_params" command
                        pure=False,
                        **{'sp': sp,
                           'training_set': training,
-                          'sample': sample})
+                          'sample': sample,
+                          'seed': seed,
+                          'shape_features': shape_features})
         arr_list = client.gather(C)
 
         logger.info('Completed extraction of training data from %d tiles' , len(arr_list))
@@ -13,6 +13,7 @@ from dask.distributed import Client, LocalCluster
 from madmex.management.base import AntaresBaseCommand
 
 from madmex.wrappers import gwf_query, predict_object
+from madmex.rest.vector_tiles import invalidate_tiles
 
 logger = logging.getLogger(__name__)
 
@@ -74,6 +75,13 @@ antares model_predict_object -p landsat_madmex_001_jalisco_2017_2 -m rf_madmex_0
                             nargs='*',
                             default=None,
                             help='List of categorical variables to be encoded using One Hot Encoding before model fit')
+        parser.add_argument('-shape', '--shape_features',
+                            type=str,
+                            nargs='*',
+                            default=None,
+                            help=('Optional list of shape metrics of the geometries to use as additional features '
+                                  '(any of area, perimeter, bperim, para, compact, smooth, shape, frac). '
+                                  'The same list must be used for model fitting and prediction'))
         parser.add_argument('-sc', '--scheduler',
                             type=str,
                             default=None,
@@ -87,6 +95,7 @@ antares model_predict_object -p landsat_madmex_001_jalisco_2017_2 -m rf_madmex_0
         spatial_aggregation = options['spatial_aggregation']
         categorical_variables = options['categorical_variables']
         scheduler_file = options['scheduler']
+        shape_features = options['shape_features']
 
         # datacube query
         gwf_kwargs = { k: options[k] for k in ['product', 'lat', 'long', 'region']}
@@ -103,8 +112,11 @@ antares model_predict_object -p landsat_madmex_001_jalisco_2017_2 -m rf_madmex_0
                           'categorical_variables': categorical_variables,
                           'aggregation': spatial_aggregation,
                           'name': name,
+                          'shape_features': shape_features,
                           })
         result = client.gather(C)
+        # Cached vector tiles of a previous run under the same name are outdated
+        invalidate_tiles('predict', name)
 
         print('Successfully ran prediction on %d tiles' % sum(result))
         print('%d tiles failed' % result.count(False))
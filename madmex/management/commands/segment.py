@@ -17,6 +17,7 @@ from madmex.management.base import AntaresBaseCommand
 from madmex.util import parser_extra_args
 from madmex.wrappers import gwf_query, segment
 from madmex.models import SegmentationInformation
+from madmex.util.db import index_segmentation
 
 logger = logging.getLogger(__name__)
 
@@ -30,8 +31,19 @@ Example usage:
 # Run slic segmentation
 antares segment --algorithm slic -n landsat_slic_test_2017 -p landsat_madmex_001_jalisco_2017_2 -r Jalisco -b green_mean red_mean ndvi_mean nir_mean swir1_mean swir2_mean --datasource landsat8 --year 2017 -extra compactness=0.01 n_segments=300000
 
+# Run slic segmentation by blocks of 2000 pixels, 4 blocks being segmented at once
+antares segment --algorithm slic -n landsat_slic_test_2017 -p landsat_madmex_001_jalisco_2017_2 -r Jalisco -b green_mean red_mean ndvi_mean nir_mean swir1_mean swir2_mean --datasource landsat8 --year 2017 -extra compactness=0.01 n_segments=300000 block_size=2000 workers=4
+
 # Run BIS segmentation on sentinel2
 antares segment --algorithm bis -n s2_001_jalisco_2017 -p s2_001_jalisco_2017_0 -r Jalisco -b green_mean red_mean nir_mean swir1_mean swir2_mean ndvi_mean ndmi_mean --datasource sentinel_2 --year 2017 -extra t=40 s=0.5 c=0.7
+
+# Run multi-scale BIS segmentation; the merge is ran once and each threshold is registered under
+# its own name (s2_001_jalisco_2017_20, s2_001_jalisco_2017_40, s2_001_jalisco_2017_80), objects
+# being linked to the object containing them in the next coarser level
+antares segment --algorithm bis -n s2_001_jalisco_2017 -p s2_001_jalisco_2017_0 -r Jalisco -b green_mean red_mean nir_mean swir1_mean swir2_mean ndvi_mean ndmi_mean --datasource sentinel_2 --year 2017 -extra t=20,40,80 s=0.5 c=0.7
+
+# Run BIS segmentation splitting every tile in strips of 2000 rows, segmented by 8 parallel workers
+antares segment --algorithm bis -n s2_001_jalisco_2017 -p s2_001_jalisco_2017_0 -r Jalisco -b green_mean red_mean nir_mean swir1_mean swir2_mean ndvi_mean ndmi_mean --datasource sentinel_2 --year 2017 -extra t=40 s=0.5 c=0.7 tile=True rows=2000 workers=8
 """
     def add_arguments(self, parser):
         parser.add_argument('-a', '--algorithm',
@@ -83,6 +95,7 @@ antares segment --algorithm bis -n s2_001_jalisco_2017 -p s2_001_jalisco_2017_0
                             help='''
 Additional named arguments passed to the selected segmentation class constructor. These arguments have
 to be passed in the form of key=value pairs. e.g.: antares segment ... -extra arg1=12 arg2=0.2
+A comma separated list of thresholds runs a multi-scale bis segmentation (e.g.: -extra t=20,40,80)
 The list of parameters corresponding to every implemented segmentation algorithm can be retrieved
 using the antares segment_params command line''')
         parser.add_argument('-sc', '--scheduler',
@@ -102,12 +115,31 @@ using the antares segment_params command line''')
         scheduler_file = options['scheduler']
 
         # Build segmentation meta object
-        meta, _ = SegmentationInformation.objects.get_or_create(
-            algorithm=algorithm, datasource=datasource,
-            parameters=json.dumps(extra_args),
-            datasource_year=year,
-            name=name,
-        )
+        thresholds = extra_args.get('t')
+        if algorithm == 'bis' and isinstance(thresholds, str) and ',' in thresholds:
+            thresholds = json.loads('[%s]' % thresholds)
+            extra_args['t'] = thresholds
+        if algorithm == 'bis' and isinstance(thresholds, list):
+            # Multi-scale; one meta object per level, each level being the parent
+            # of the next finer one
+            meta = {}
+            parent = None
+            for t in sorted(thresholds, reverse=True):
+                meta[t], _ = SegmentationInformation.objects.get_or_create(
+                    algorithm=algorithm, datasource=datasource,
+                    parameters=json.dumps(dict(extra_args, t=t)),
+                    datasource_year=year,
+                    name='%s_%s' % (name, t),
+                    parent=parent,
+                )
+                parent = meta[t]
+        else:
+            meta, _ = SegmentationInformation.objects.get_or_create(
+                algorithm=algorithm, datasource=datasource,
+                parameters=json.dumps(extra_args),
+                datasource_year=year,
+                name=name,
+            )
 
         # datacube query
         gwf_kwargs = { k: options[k] for k in ['product', 'lat', 'long', 'region']}
@@ -127,3 +159,7 @@ using the antares segment_params command line''')
 
         print('Successfully ran segmentation on %d tiles' % sum(result))
         print('%d tiles failed' % result.count(False))
+
+        # Partial spatial index of the objects of the new segmentation(s)
+        for m in (meta.values() if isinstance(meta, dict) else [meta]):
+            index_segmentation(m.id)
@@ -0,0 +1,24 @@
+# Generated by Django 2.0.3 on 2026-10-19 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('madmex', '0046_auto_20180706_1958'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='segmentationinformation',
+            name='parent',
+            field=models.ForeignKey(default=None, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='madmex.SegmentationInformation'),
+        ),
+        migrations.AddField(
+            model_name='predictobject',
+            name='parent',
+            field=models.ForeignKey(default=None, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='children', to='madmex.PredictObject'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.0.3 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('madmex', '0047_segmentation_hierarchy'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='predictclassification',
+            index=models.Index(fields=['name', 'predict_object'], name='predictclass_name_obj_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 2.0.3 on 2026-10-19 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('madmex', '0048_predictclassification_name_object_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PredictObjectTile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product', models.CharField(max_length=200)),
+                ('x', models.IntegerField()),
+                ('y', models.IntegerField()),
+                ('contained', models.BooleanField(default=True)),
+                ('predict_object', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='madmex.PredictObject')),
+                ('segmentation_information', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='madmex.SegmentationInformation')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrainObjectTile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product', models.CharField(max_length=200)),
+                ('x', models.IntegerField()),
+                ('y', models.IntegerField()),
+                ('training_set', models.CharField(max_length=100)),
+                ('train_object', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='madmex.TrainObject')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='predictobjecttile',
+            index=models.Index(fields=['product', 'segmentation_information', 'x', 'y'], name='predictobjecttile_cell_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='predictobjecttile',
+            index=models.Index(fields=['product', 'x', 'y'], name='predictobjecttile_pcell_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trainobjecttile',
+            index=models.Index(fields=['product', 'training_set', 'x', 'y'], name='trainobjecttile_cell_idx'),
+        ),
+    ]
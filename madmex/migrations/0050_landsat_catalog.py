@@ -0,0 +1,32 @@
+# Generated by Django 2.0.3 on 2026-10-19 12:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('madmex', '0049_tile_index'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                ("CREATE MATERIALIZED VIEW madmex_landsatcatalog AS "
+                 "SELECT f.name AS path_row, "
+                 "extract(year from s.acquisition_date)::integer AS year, "
+                 "CASE substring(s.landsat_product_id from 1 for 4) "
+                 "WHEN 'LT04' THEN 4 WHEN 'LT05' THEN 5 WHEN 'LE07' THEN 7 WHEN 'LC08' THEN 8 END AS mission, "
+                 "count(*) AS number_of_scenes, "
+                 "now() AS refreshed "
+                 "FROM madmex_scene AS s "
+                 "JOIN madmex_footprint AS f ON f.id = s.footprint_id "
+                 "WHERE s.cloud_cover_land < 20 "
+                 "AND substring(s.landsat_product_id from 1 for 4) IN ('LT04', 'LT05', 'LE07', 'LC08') "
+                 "GROUP BY 1, 2, 3"),
+                ("CREATE UNIQUE INDEX landsatcatalog_key_idx "
+                 "ON madmex_landsatcatalog (mission, path_row, year)"),
+            ],
+            reverse_sql="DROP MATERIALIZED VIEW IF EXISTS madmex_landsatcatalog",
+        ),
+    ]
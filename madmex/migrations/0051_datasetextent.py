@@ -0,0 +1,29 @@
+# Generated by Django 2.0.3 on 2026-10-19 12:00
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('madmex', '0050_landsat_catalog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetExtent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product', models.CharField(max_length=200)),
+                ('dataset_id', models.CharField(max_length=36, unique=True)),
+                ('uri', models.CharField(default='', max_length=500)),
+                ('the_geom', django.contrib.gis.db.models.fields.PolygonField(srid=4326)),
+                ('added', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='datasetextent',
+            index=models.Index(fields=['product'], name='datasetextent_product_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.0.3 on 2026-10-19 12:00
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('madmex', '0051_datasetextent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='progress',
+            field=django.contrib.postgres.fields.jsonb.JSONField(default=dict),
+        ),
+    ]
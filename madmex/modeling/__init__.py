@@ -21,6 +21,74 @@ from madmex.util.numpy import groupby
 
 LOGGER = logging.getLogger(__name__)
 
+
+class PredictionSession(object):
+    """Batched prediction with a fixed thread budget
+
+    Observations are copied batch by batch to a float32 buffer allocated once for
+    the session and passed to ``BaseModel.predict_with_confidence``, so that class
+    probabilities are never computed twice.
+
+    Instances are obtained with ``BaseModel.prediction_session``
+    """
+    def __init__(self, model, n_threads=1, batch_size=100000):
+        """Instantiate session
+
+        Args:
+            model (BaseModel): Fitted model
+            n_threads (int): Number of threads the underlying estimator may use.
+                Should be 1 when several sessions run in parallel processes (e.g.
+                dask workers)
+            batch_size (int): Number of observations predicted at once. Bounds the
+                memory used by the buffer and the probabilities arrays
+        """
+        self.model = model
+        self.n_threads = n_threads
+        self.batch_size = batch_size
+        self._buffer = None
+        model.set_threads(n_threads)
+
+    def _get_buffer(self, n_features):
+        if self._buffer is None or self._buffer.shape[1] != n_features:
+            self._buffer = np.empty((self.batch_size, n_features), dtype=np.float32)
+        return self._buffer
+
+    def predict(self, X, confidence=False):
+        """Predict labels and optionally the confidence of every observation
+
+        Args:
+            X (array): The array of predictors, of shape (n, m)
+            confidence (bool): Also return the highest class probability of every
+                observation
+
+        Return:
+            np.ndarray or tuple: Array of predicted labels of shape (n,), or tuple
+            of (labels, confidence) arrays when ``confidence`` is True
+
+        Example:
+            >>> from madmex.modeling import BaseModel
+            >>> model = BaseModel.from_db('test_model')
+            >>> session = model.prediction_session(n_threads=1, batch_size=50000)
+            >>> y_pred, y_conf = session.predict(X, confidence=True)
+        """
+        X = np.asarray(X)
+        n = X.shape[0]
+        y_pred = np.empty(n, dtype=self.model.model.classes_.dtype)
+        y_conf = np.empty(n, dtype=np.float32) if confidence else None
+        buf = self._get_buffer(X.shape[1])
+        for start in range(0, n, self.batch_size):
+            stop = min(start + self.batch_size, n)
+            batch = buf[:stop - start]
+            np.copyto(batch, X[start:stop], casting='unsafe')
+            pred, conf = self.model.predict_with_confidence(batch)
+            y_pred[start:stop] = pred
+            if confidence:
+                y_conf[start:stop] = conf
+        if confidence:
+            return y_pred, y_conf
+        return y_pred
+
+
 class BaseModel(abc.ABC):
     '''
     This class works as a wrapper to have a single interface to several
@@ -59,6 +127,51 @@ class BaseModel(abc.ABC):
         NotImplementedError('Children of BaseModel need to implement their own predict_confidence method')
 
 
+    def predict_with_confidence(self, X):
+        '''
+        Predict labels of unseen data together with their confidence (highest
+        probability), class probabilities being computed only once
+
+        Return:
+            tuple: Tuple of (labels, confidence) arrays
+        '''
+        raise NotImplementedError('Children of BaseModel need to implement their own predict_with_confidence method')
+
+
+    def _label_confidence(self, proba):
+        '''
+        Derive labels and confidence from an array of class probabilities of
+        shape (n, n_classes)
+        '''
+        idx = proba.argmax(axis=1)
+        return self.model.classes_[idx], proba[np.arange(idx.size), idx]
+
+
+    def set_threads(self, n_threads):
+        '''
+        Set the number of threads used by the underlying estimator for prediction
+
+        Children whose estimator keeps its own thread setting (e.g. a native
+        booster) should override this method
+        '''
+        if hasattr(self.model, 'n_jobs'):
+            self.model.n_jobs = n_threads
+
+
+    def prediction_session(self, n_threads=1, batch_size=100000):
+        '''
+        Open a batched prediction session with a fixed thread budget
+
+        Args:
+            n_threads (int): Number of threads used by the underlying estimator
+            batch_size (int): Number of observations predicted at once
+
+        Return:
+            PredictionSession: See ``madmex.modeling.PredictionSession``
+        '''
+        return PredictionSession(self, n_threads=n_threads, batch_size=batch_size)
+
+
     def hot_encode_training(self, X):
         """Apply one hot encoding to one or several predictors determined by the list
         of indices of the hot_encode attribute
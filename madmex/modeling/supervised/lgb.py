@@ -43,3 +43,17 @@ class Model(BaseModel):
         """
         X = self.hot_encode_predict(X)
         return self.model.predict_proba(X).max(axis=1)
+
+    def predict_with_confidence(self, X):
+        """Get prediction and confidence of every observation from a single
+        computation of class probabilities
+        """
+        X = self.hot_encode_predict(X)
+        return self._label_confidence(self.model.predict_proba(X))
+
+    def set_threads(self, n_threads):
+        '''
+        Set the number of threads of the classifier, passed down to the booster
+        as num_threads when predicting
+        '''
+        self.model.set_params(n_jobs=n_threads)
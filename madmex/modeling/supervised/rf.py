@@ -49,6 +49,13 @@ class Model(BaseModel):
         X = self.hot_encode_predict(X)
         return self.model.predict_proba(X).max(axis=1)
 
+    def predict_with_confidence(self, X):
+        """Get prediction and confidence of every observation from a single
+        computation of class probabilities
+        """
+        X = self.hot_encode_predict(X)
+        return self._label_confidence(self.model.predict_proba(X))
+
     def score(self, X, y):
         '''
         Test the model given a dataset and a target vector.
@@ -49,3 +49,20 @@ class Model(BaseModel):
         """
         X = self.hot_encode_predict(X)
         return self.model.predict_proba(X).max(axis=1)
+
+    def predict_with_confidence(self, X):
+        """Get prediction and confidence of every observation from a single
+        computation of class probabilities
+        """
+        X = self.hot_encode_predict(X)
+        return self._label_confidence(self.model.predict_proba(X))
+
+    def set_threads(self, n_threads):
+        '''
+        Set the number of threads (nthread) of the classifier and of its
+        fitted booster
+        '''
+        self.model.set_params(n_jobs=n_threads)
+        booster = getattr(self.model, '_Booster', None)
+        if booster is not None:
+            booster.set_param('nthread', n_threads)
@@ -39,6 +39,9 @@ class Order(models.Model):
     order_id = models.CharField(max_length=100, unique=True)
     downloaded = models.BooleanField()
     added = models.DateTimeField(auto_now_add=True)
+    # Download state of the items of the order, url -> path of the downloaded file
+    # or error message (see madmex.api.download.download_order)
+    progress = JSONField(default=dict)
 
 class Model(models.Model):
     '''A database entry that handles the models that we train.
@@ -80,6 +83,7 @@ class SegmentationInformation(models.Model):
     parameters = models.CharField(max_length=200, default='')
     datasource_year = models.CharField(max_length=20, default='2015')
     name = models.CharField(max_length=200, default='')
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, related_name='children', null=True, default=None)
 
 class PredictObject(models.Model):
     '''This table holds objects that will be used for training. They must be related to
@@ -90,6 +94,28 @@ class PredictObject(models.Model):
     added = models.DateTimeField(auto_now_add=True)
     prediction_tags = models.ManyToManyField(Tag, through='PredictClassification')
     segmentation_information = models.ForeignKey(SegmentationInformation, on_delete=models.CASCADE, default=-1)
+    parent = models.ForeignKey('self', on_delete=models.SET_NULL, related_name='children', null=True, default=None)
+
+class PredictObjectTile(models.Model):
+    '''Materialized assignment of the objects of a segmentation to the cells of a datacube
+    product grid. Built once per segmentation and product (see the index_tiles command) so
+    that the objects of a tile are retrieved by equality rather than spatial lookup.
+    '''
+    product = models.CharField(max_length=200)
+    x = models.IntegerField()
+    y = models.IntegerField()
+    segmentation_information = models.ForeignKey(SegmentationInformation, on_delete=models.CASCADE)
+    predict_object = models.ForeignKey(PredictObject, on_delete=models.CASCADE)
+    # Whether the object bounding box is fully contained in the cell, objects overlapping
+    # several cells are assigned to all of them
+    contained = models.BooleanField(default=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'segmentation_information', 'x', 'y'],
+                         name='predictobjecttile_cell_idx'),
+            models.Index(fields=['product', 'x', 'y'], name='predictobjecttile_pcell_idx'),
+        ]
 
 class TrainClassification(models.Model):
     '''This tables relates the train objects with a tag, we add information about the
@@ -100,6 +126,22 @@ class TrainClassification(models.Model):
     train_object = models.ForeignKey(TrainObject, related_name='train_object', on_delete=models.CASCADE)
     training_set = models.CharField(max_length=100, default='')
 
+class TrainObjectTile(models.Model):
+    '''Materialized assignment of the objects of a training set to the cells of a datacube
+    product grid (see PredictObjectTile)
+    '''
+    product = models.CharField(max_length=200)
+    x = models.IntegerField()
+    y = models.IntegerField()
+    training_set = models.CharField(max_length=100)
+    train_object = models.ForeignKey(TrainObject, on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'training_set', 'x', 'y'],
+                         name='trainobjecttile_cell_idx'),
+        ]
+
 class ChangeInformation(models.Model):
     """Gathers information about change objects
     """
@@ -163,6 +205,11 @@ class PredictClassification(models.Model):
     name = models.CharField(max_length=200, default='')
     confidence = models.FloatField(default=-1.0)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', 'predict_object'], name='predictclass_name_obj_idx'),
+        ]
+
 class Scene(models.Model):
     '''This table represents a satellite scene and information to build a catalalog.
     '''
@@ -177,6 +224,22 @@ class Scene(models.Model):
     max_lat = models.FloatField(default=-1)
     max_lon = models.FloatField(default=-1)
 
+class DatasetExtent(models.Model):
+    '''Footprint (longlat) of every dataset indexed in the datacube database, filled when
+    datasets are added by antares (see madmex.indexing.add_dataset) so that dataset extents
+    can be served without reading datacube metadata or storage units.
+    '''
+    product = models.CharField(max_length=200)
+    dataset_id = models.CharField(max_length=36, unique=True)
+    uri = models.CharField(max_length=500, default='')
+    the_geom = models.PolygonField()
+    added = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product'], name='datasetextent_product_idx'),
+        ]
+
 def ingest_countries_from_shape(path, mapping):
     '''Ingestion function for countries to database.
 
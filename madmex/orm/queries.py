@@ -40,33 +40,127 @@ def get_datacube_chunks(dataset_name):
         result = cursor.fetchall()
     return result
 
+def get_dataset_extents(product, tolerance=0.001, precision=5):
+    """Serialize the footprints of the datasets of a product as a GeoJSON FeatureCollection
+
+    Footprints are read from the extent index (madmex_datasetextent table, see
+    ``madmex.indexing.add_dataset`` and ``madmex.indexing.index_extents``), simplified
+    and serialized by the database
+
+    Args:
+        product (str): Name of the datacube product
+        tolerance (float): Simplification tolerance in degrees
+        precision (int): Maximum number of decimals of the coordinates
+
+    Return:
+        str: The GeoJSON FeatureCollection
+    """
+    query = ("SELECT json_build_object('type', 'FeatureCollection', 'features', coalesce(json_agg(json_build_object("
+             "'type', 'Feature', "
+             "'geometry', st_asgeojson(st_simplifypreservetopology(the_geom, %s), %s)::json, "
+             "'properties', json_build_object('id', dataset_id, 'uri', uri)) ORDER BY id), '[]'::json))::text "
+             "FROM public.madmex_datasetextent "
+             "WHERE product = %s")
+    with connection.cursor() as cursor:
+        cursor.execute(query, [tolerance, precision, product])
+        result = cursor.fetchone()[0]
+    return result
+
+def get_storage_unit_extents(product, tolerance=0.001, precision=5):
+    """Serialize the footprints of the storage units (files) of a product as a GeoJSON FeatureCollection
+
+    The footprint of a storage unit (e.g. a NetCDF chunk of an ingested product) is
+    the union of the footprints of the datasets it holds, read from the extent index
+    (madmex_datasetextent table)
+
+    Args:
+        product (str): Name of the datacube product
+        tolerance (float): Simplification tolerance in degrees
+        precision (int): Maximum number of decimals of the coordinates
+
+    Return:
+        str: The GeoJSON FeatureCollection. Features have the uri of the storage unit
+        and its number of datasets as properties
+    """
+    query = ("SELECT json_build_object('type', 'FeatureCollection', 'features', coalesce(json_agg(json_build_object("
+             "'type', 'Feature', "
+             "'geometry', st_asgeojson(st_simplifypreservetopology(unit.geom, %s), %s)::json, "
+             "'properties', json_build_object('uri', unit.uri, 'datasets', unit.datasets)) ORDER BY unit.uri), '[]'::json))::text "
+             "FROM (SELECT uri, st_union(the_geom) AS geom, count(*) AS datasets "
+             "FROM public.madmex_datasetextent "
+             "WHERE product = %s "
+             "GROUP BY uri) AS unit")
+    with connection.cursor() as cursor:
+        cursor.execute(query, [tolerance, precision, product])
+        result = cursor.fetchone()[0]
+    return result
+
 def get_landsat_catalog(mission):
-    
-    query = ("SELECT f.name AS path_row, extract(year from s.acquisition_date) AS year, count(f.the_geom) AS number_of_scenes " 
-             "FROM madmex_scene AS s, madmex_footprint AS f " 
-             "WHERE f.id = s.footprint_id AND s.cloud_cover_land < 20 AND s.landsat_product_id like '%s' " 
-             "GROUP BY f.name, extract(year from s.acquisition_date) " 
+    """Read the number of low cloud cover scenes per path row and year of a Landsat mission
+
+    Counts are read from the madmex_landsatcatalog materialized view, refreshed by
+    ``refresh_landsat_catalog``
+
+    Args:
+        mission (int): Landsat mission (4, 5, 7 or 8)
+
+    Return:
+        list: List of (path_row, year, number_of_scenes) tuples
+    """
+    query = ("SELECT path_row, year, number_of_scenes "
+             "FROM madmex_landsatcatalog "
+             "WHERE mission = %s "
              "ORDER BY path_row, year")
+    with connection.cursor() as cursor:
+        cursor.execute(query, [int(mission)])
+        result = cursor.fetchall()
+    return result
 
-    mission_name = 'LE07%'
+def get_landsat_catalog_footprints(mission):
+    """Build the Landsat footprints feature collection of the catalog page
 
-    if int(mission) == 7:
-        mission_name = 'LE07%'  
-    elif int(mission) == 8: 
-        mission_name = 'LC08%'
-    elif int(mission) == 5: 
-        mission_name = 'LT05%'
-    elif int(mission) == 4:
-        mission_name = 'LT04%'
+    Every feature has the path row name and a year to number of scenes mapping
+    (counts) as properties. The collection is serialized by the database.
 
-    print(mission_name)
-    print(query % mission_name)
+    Args:
+        mission (int): Landsat mission (4, 5, 7 or 8)
 
+    Return:
+        tuple: Tuple of (geojson string, min_year, max_year)
+    """
+    query = ("SELECT json_build_object('type', 'FeatureCollection', 'features', coalesce(json_agg(json_build_object("
+             "'type', 'Feature', "
+             "'geometry', st_asgeojson(f.the_geom, 5)::json, "
+             "'properties', json_build_object('name', f.name, 'counts', coalesce(c.counts, '{}'::json)))), '[]'::json))::text, "
+             "min(c.min_year), max(c.max_year) "
+             "FROM madmex_footprint AS f "
+             "LEFT JOIN (SELECT path_row, json_object_agg(year, number_of_scenes) AS counts, "
+             "min(year) AS min_year, max(year) AS max_year "
+             "FROM madmex_landsatcatalog WHERE mission = %s GROUP BY path_row) AS c "
+             "ON c.path_row = f.name "
+             "WHERE f.sensor = 'landsat'")
     with connection.cursor() as cursor:
-        cursor.execute(query % mission_name)
-        result = cursor.fetchall()
+        cursor.execute(query, [int(mission)])
+        result = cursor.fetchone()
     return result
 
+def get_landsat_catalog_version():
+    """Time at which the Landsat catalog was last refreshed, None when it is empty
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT refreshed FROM madmex_landsatcatalog LIMIT 1')
+        result = cursor.fetchone()
+    return result[0] if result is not None else None
+
+def refresh_landsat_catalog():
+    """Recompute the scene counts of the madmex_landsatcatalog materialized view
+
+    Meant to be called after scenes have been ingested (see ingest_catalog command). Readers
+    are not blocked while the view is refreshed.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('REFRESH MATERIALIZED VIEW CONCURRENTLY madmex_landsatcatalog')
+
 def calculate_quality_by_year_tile_cloud_cover(scene_name, cloud_cover_land, year, mission=8):
     query = ("SELECT cloud_cover_land, acquisition_date "
              "FROM madmex_scene AS s, madmex_footprint AS f "
@@ -12,6 +12,7 @@ import numpy as np
 import xarray as xr
 
 from madmex.overlay.conversions import rasterize_xarray
+from madmex.overlay.shape_metrics import fc_shape_metrics
 from madmex.util import chunk
 
 logger = logging.getLogger(__name__)
@@ -43,7 +44,7 @@ def calculate_zonal_statistics(array, labels, index, statistics):
 
 
 def zonal_stats_xarray(dataset, fc, field, aggregation='mean',
-                       categorical_variables=None):
+                       categorical_variables=None, shape_features=None):
     """Perform extraction and grouping using pandas' groupby method
 
     Data are first coerced to pandas dataframe and pandas' groupby method is used
@@ -58,6 +59,9 @@ def zonal_stats_xarray(dataset, fc, field, aggregation='mean',
             median, std, min, max)
         categorical_variable (list): A list of strings corresponding to the names
             of the categorical_variables
+        shape_features (list): Optional list of shape metrics of the geometries
+            to append as additional predictors, after the dataset variables.
+            See ``madmex.overlay.shape_metrics.METRICS``
 
     Return:
         list: A list of [0] predictors array, and [2] target values [X, y]
@@ -87,9 +91,13 @@ def zonal_stats_xarray(dataset, fc, field, aggregation='mean',
         df = combined.to_dataframe()
         combined = None
         df = df.groupby('features_id').agg(agg_ordered_dict)
-        X_list.append(df.values)
         # TODO: Use numpy.array instead of list here to reduce memory footprint (see np.vectorize)
         ids = list(df.index.values.astype('uint32') - 1)
+        if shape_features:
+            shapes = fc_shape_metrics(fc_sub, shape_features)
+            X_list.append(np.hstack([df.values, shapes[ids]]))
+        else:
+            X_list.append(df.values)
         df = None
         y_list.append(np.array([fc_sub[x]['properties'][field] for x in ids]))
         gc.collect()
@@ -0,0 +1,144 @@
+"""Vectorized shape metrics of polygon feature collections
+
+Metrics are the ones of the BIS stats_vector module (``madmex.bin.bis.stats_vector``)
+but are computed for all geometries at once from flat coordinates arrays, rather than
+one OGR geometry at a time.
+"""
+from collections import OrderedDict
+from itertools import chain
+
+import numpy as np
+
+
+METRICS = ('area', 'perimeter', 'bperim', 'para', 'compact', 'smooth', 'shape',
+           'frac')
+
+
+def fc_to_ragged(fc):
+    """Flatten the polygons of a feature collection to coordinates and offsets arrays
+
+    Args:
+        fc (list): Feature collection of Polygon or MultiPolygon geojson like features.
+            Geometries can also be objects implementing ``__geo_interface__``
+
+    Return:
+        tuple: (coords, ring_offsets, polygon_offsets, geom_offsets). ``coords`` is
+        a (n, 2) array of all vertices. ``ring_offsets`` indexes the first vertex of
+        every ring in ``coords``, ``polygon_offsets`` the first ring of every polygon
+        and ``geom_offsets`` the first polygon of every feature. Each offsets array
+        has one more element than the number of items it indexes.
+    """
+    rings = []
+    polygon_sizes = []
+    geom_sizes = []
+    for feature in fc:
+        geometry = feature['geometry']
+        if not isinstance(geometry, dict):
+            # e.g. shapely geometry
+            geometry = geometry.__geo_interface__
+        if geometry['type'] == 'Polygon':
+            polygons = [geometry['coordinates']]
+        elif geometry['type'] == 'MultiPolygon':
+            polygons = geometry['coordinates']
+        else:
+            raise ValueError('Unsupported geometry type: %s' % geometry['type'])
+        geom_sizes.append(len(polygons))
+        for polygon in polygons:
+            polygon_sizes.append(len(polygon))
+            rings.extend(polygon)
+    coords = np.array([xy[:2] for xy in chain.from_iterable(rings)],
+                      dtype=np.float64).reshape((-1, 2))
+    ring_sizes = [len(ring) for ring in rings]
+    def offsets(sizes):
+        return np.concatenate(([0], np.cumsum(sizes, dtype=np.int64)))
+    return coords, offsets(ring_sizes), offsets(polygon_sizes), offsets(geom_sizes)
+
+
+def shape_metrics(coords, ring_offsets, polygon_offsets, geom_offsets,
+                  metrics=METRICS):
+    """Compute shape metrics of many polygons from flat coordinates arrays
+
+    Rings must be closed (last vertex equal to first vertex) and the first ring
+    of every polygon must be its exterior ring, as in geojson. Geometries must not
+    be empty. Distances and areas are in the unit of the coordinates.
+
+    Args:
+        coords, ring_offsets, polygon_offsets, geom_offsets (np.ndarray): See
+            ``fc_to_ragged``
+        metrics (list): Subset of ``METRICS`` to return. ``area``: area of the
+            polygon minus its holes, ``perimeter``: length of all rings,
+            ``bperim``: perimeter of the bounding box, ``para``: perimeter area
+            ratio, ``compact``, ``smooth``: BIS compactness and smoothness,
+            ``shape``: circularity ratio, ``frac``: fractal dimension index
+            (FRAGSTATS P9)
+
+    Return:
+        collections.OrderedDict: Metric name to 1D array (one value per geometry)
+    """
+    invalid = [m for m in metrics if m not in METRICS]
+    if invalid:
+        raise ValueError('Unknown shape metrics: %s' % ', '.join(invalid))
+    ring_starts = ring_offsets[:-1]
+    ring_sizes = np.diff(ring_offsets)
+    # First ring and first vertex of every geometry
+    geom_ring_starts = polygon_offsets[geom_offsets[:-1]]
+    geom_coord_starts = ring_offsets[geom_ring_starts]
+    # Coordinates relative to the first vertex of their ring, for precision
+    local = coords - np.repeat(coords[ring_starts], ring_sizes, axis=0)
+    # Segments joining consecutive vertices; the ones bridging two rings are zeroed
+    # A trailing zero keeps segment and vertex indices aligned for reduceat
+    x0, y0 = local[:-1,0], local[:-1,1]
+    x1, y1 = local[1:,0], local[1:,1]
+    cross = np.append(x0 * y1 - x1 * y0, 0)
+    length = np.append(np.hypot(x1 - x0, y1 - y0), 0)
+    bridges = ring_offsets[1:-1] - 1
+    cross[bridges] = 0
+    length[bridges] = 0
+    # Per ring, then per geometry, holes being subtracted from their exterior ring
+    ring_area = 0.5 * np.absolute(np.add.reduceat(cross, ring_starts))
+    holes = np.ones(ring_area.size, dtype=bool)
+    holes[polygon_offsets[:-1]] = False
+    ring_area[holes] *= -1
+    ring_length = np.add.reduceat(length, ring_starts)
+    area = np.add.reduceat(ring_area, geom_ring_starts)
+    perimeter = np.add.reduceat(ring_length, geom_ring_starts)
+    bperim = 2 * (np.maximum.reduceat(coords[:,0], geom_coord_starts)
+                  - np.minimum.reduceat(coords[:,0], geom_coord_starts)
+                  + np.maximum.reduceat(coords[:,1], geom_coord_starts)
+                  - np.minimum.reduceat(coords[:,1], geom_coord_starts))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frac_perimeter = 0.25 * perimeter
+        frac = np.where((area <= 1) | (frac_perimeter < 1), 1.0,
+                        2 * np.log(frac_perimeter) / np.log(area))
+        out = {'area': area,
+               'perimeter': perimeter,
+               'bperim': bperim,
+               'para': perimeter / area,
+               'compact': bperim * np.sqrt(area),
+               'smooth': area * bperim / perimeter,
+               'shape': 4 * np.pi * area / perimeter ** 2,
+               'frac': frac}
+    return OrderedDict((m, out[m]) for m in metrics)
+
+
+def fc_shape_metrics(fc, metrics=METRICS):
+    """Compute shape metrics for every feature of a feature collection
+
+    Args:
+        fc (list): Feature collection of Polygon or MultiPolygon geojson like features
+        metrics (list): Subset of ``METRICS`` to compute
+
+    Return:
+        np.ndarray: Array of shape (n_features, n_metrics), columns ordered as
+        ``metrics``
+
+    Example:
+        >>> from madmex.overlay.shape_metrics import fc_shape_metrics
+        >>> fc = [{'type': 'Feature', 'properties': {'id': 1},
+        ...        'geometry': {'type': 'Polygon',
+        ...                     'coordinates': [[[0,0], [4,0], [4,4], [0,4], [0,0]]]}}]
+        >>> fc_shape_metrics(fc, ['area', 'perimeter'])
+        array([[16., 16.]])
+    """
+    columns = shape_metrics(*fc_to_ragged(fc), metrics=metrics)
+    return np.column_stack(list(columns.values()))
@@ -0,0 +1,101 @@
+"""Streaming GeoJSON feature collections of predictions, training objects and change objects
+
+Features are serialized by PostGIS (``ST_AsGeoJSON``) and streamed to the client
+while they are read from a server side cursor. Large collections are split in pages
+using keyset pagination on the object id: a page ending before the end of the
+collection carries the id to pass as ``after`` to get the next page.
+"""
+import json
+
+from django.db import connection
+
+from madmex.rest.vector_tiles import LAYERS
+
+
+def simplify_tolerance(zoom):
+    """Simplification tolerance (in degrees) matching half a 256 pixels tile pixel at a zoom level
+    """
+    return 360.0 / (256 * 2 ** zoom) / 2
+
+
+def features_query(layer, name, polygon=None, zoom=None, precision=6, after=0,
+                   limit=10000):
+    """Build the query of a page of GeoJSON features
+
+    Args:
+        layer (str): One of ``madmex.rest.vector_tiles.LAYERS``
+        name (str): Name of the classification, training set or change objects
+        polygon (str): Optional WKT or EWKT geometry (in longlat), only objects
+            intersecting it are returned
+        zoom (int): Optional web map zoom level. When set, geometries are simplified
+            to a tolerance matching the resolution of that zoom level
+        precision (int): Maximum number of decimals of the coordinates
+        after (int): Only return objects whose id is greater than after
+        limit (int): Maximum number of features
+
+    Return:
+        tuple: Tuple of (query, params). Rows are (id, feature) with feature
+        a GeoJSON string
+    """
+    columns, tables, name_column = LAYERS[layer]
+    expressions = [c.split(' AS ') for c in columns]
+    properties = ', '.join("'%s', %s" % (alias, expr) for expr, alias in expressions)
+    if zoom is None:
+        geometry = 'obj.the_geom'
+        params = []
+    else:
+        geometry = 'st_simplifypreservetopology(obj.the_geom, %s)'
+        params = [simplify_tolerance(zoom)]
+    query = ("SELECT obj.id, json_build_object('type', 'Feature', 'id', obj.id, "
+             "'geometry', st_asgeojson({0}, %s)::json, "
+             "'properties', json_build_object({1}))::text "
+             "FROM {2} "
+             "WHERE {3} = %s AND obj.id > %s").format(geometry, properties, tables,
+                                                      name_column)
+    params += [precision, name, after]
+    if polygon is not None:
+        query += (" AND obj.the_geom && st_geomfromewkt(%s) "
+                  "AND st_intersects(obj.the_geom, st_geomfromewkt(%s))")
+        polygon = polygon if polygon.upper().startswith('SRID') else 'SRID=4326;%s' % polygon
+        params += [polygon, polygon]
+    query += " ORDER BY obj.id LIMIT %s"
+    params.append(limit)
+    return query, params
+
+
+def stream_features(layer, name, itersize=2000, **kwargs):
+    """Stream a page of GeoJSON features as a FeatureCollection
+
+    Args:
+        layer (str): One of ``madmex.rest.vector_tiles.LAYERS``
+        name (str): Name of the classification, training set or change objects
+        itersize (int): Number of rows fetched at once from the database
+        **kwargs: Additional arguments passed to ``features_query``
+
+    Return:
+        generator: Chunks of the serialized collection. The collection has a
+        ``next`` member holding the ``after`` value of the following page, or
+        null when it is the last page
+
+    Example:
+        >>> from madmex.rest.geojson import stream_features
+        >>> fc = ''.join(stream_features('predict', 's2_001_jalisco_2017_bis_rf_0',
+        ...                              polygon='POLYGON((-104 20, -103 20, -103 21, -104 21, -104 20))',
+        ...                              zoom=12, limit=1000))
+    """
+    query, params = features_query(layer, name, **kwargs)
+    limit = params[-1]
+    yield '{"type": "FeatureCollection", "features": ['
+    count = 0
+    last_id = None
+    with connection.chunked_cursor() as c:
+        c.execute(query, params)
+        while True:
+            rows = c.fetchmany(itersize)
+            if not rows:
+                break
+            yield ('' if count == 0 else ',') + ','.join(row[1] for row in rows)
+            count += len(rows)
+            last_id = rows[-1][0]
+    next_after = last_id if count == limit else None
+    yield '], "next": %s}' % json.dumps(next_after)
@@ -0,0 +1,140 @@
+"""Mapbox Vector Tiles of predictions, training objects and change objects
+
+Tiles are encoded by PostGIS (``ST_AsMVT``) and cached on disk under
+``TEMP_DIR/tiles/{layer}/{name}/{z}/{x}/{y}.pbf``. The cache of a layer is
+invalidated (``invalidate_tiles``) by the commands writing to it, e.g. when a
+classification is (re)written by model_predict_object.
+"""
+import logging
+import math
+import os
+import shutil
+import tempfile
+
+from django.db import connection
+
+from madmex.settings import TEMP_DIR
+
+logger = logging.getLogger(__name__)
+
+# Half of the extent of the web mercator (EPSG:3857) projection
+ORIGIN_SHIFT = 2 * math.pi * 6378137 / 2.0
+
+# Attribute columns, tables and name column of each layer. The name is the
+# classification name for predictions, the training set for training objects and
+# the change information name for change objects. Geometries are always obj.the_geom
+LAYERS = {
+    'predict': (('obj.id AS id', 'cla.tag_id AS tag', 'cla.confidence AS confidence'),
+                ('public.madmex_predictclassification AS cla '
+                 'JOIN public.madmex_predictobject AS obj ON cla.predict_object_id = obj.id'),
+                'cla.name'),
+    'training': (('obj.id AS id', 'cla.interpret_tag_id AS tag'),
+                 ('public.madmex_trainclassification AS cla '
+                  'JOIN public.madmex_trainobject AS obj ON cla.train_object_id = obj.id'),
+                 'cla.training_set'),
+    'change': (('obj.id AS id',),
+               ('public.madmex_changeobject AS obj '
+                'JOIN public.madmex_changeinformation AS meta ON obj.meta_id = meta.id'),
+               'meta.name'),
+}
+
+
+def tile_bounds(z, x, y):
+    """Compute the web mercator bounds of a tile of the slippy map grid
+
+    Args:
+        z (int): Zoom level
+        x (int): Tile column
+        y (int): Tile row (counted from the north)
+
+    Return:
+        tuple: (xmin, ymin, xmax, ymax) in EPSG:3857 coordinates
+
+    Example:
+        >>> from madmex.rest.vector_tiles import tile_bounds
+        >>> tile_bounds(1, 0, 0)
+        (-20037508.342789244, 0.0, 0.0, 20037508.342789244)
+    """
+    size = 2 * ORIGIN_SHIFT / 2 ** z
+    xmin = -ORIGIN_SHIFT + x * size
+    ymax = ORIGIN_SHIFT - y * size
+    return (xmin, ymax - size, xmin + size, ymax)
+
+
+def tile_path(layer, name, z, x, y):
+    """Path of a tile in the on disk cache
+    """
+    return os.path.join(TEMP_DIR, 'tiles', layer, name, str(z), str(x),
+                        '%d.pbf' % y)
+
+
+def query_tile(layer, name, z, x, y, extent=4096, buffer=64):
+    """Encode a vector tile in the database
+
+    Args:
+        layer (str): One of ``LAYERS``
+        name (str): Name of the classification, training set or change objects
+            to render
+        z, x, y (int): Tile coordinates
+        extent (int): Tile extent in screen space
+        buffer (int): Clipping buffer in screen space
+
+    Return:
+        bytes: The protobuf encoded tile, empty when no object intersects it
+    """
+    columns, tables, name_column = LAYERS[layer]
+    query = ("WITH bounds AS (SELECT st_makeenvelope(%s, %s, %s, %s, 3857) AS geom), "
+             "mvtgeom AS ("
+             "SELECT st_asmvtgeom(st_transform(obj.the_geom, 3857), bounds.geom, %s, %s, true) AS geom, "
+             "{0} "
+             "FROM {1} CROSS JOIN bounds "
+             "WHERE {2} = %s AND obj.the_geom && st_transform(bounds.geom, 4326)) "
+             "SELECT st_asmvt(mvtgeom.*, %s, %s, 'geom') FROM mvtgeom").format(', '.join(columns),
+                                                                        tables,
+                                                                        name_column)
+    params = list(tile_bounds(z, x, y)) + [extent, buffer, name, layer, extent]
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        tile = cursor.fetchone()[0]
+    return bytes(tile) if tile is not None else b''
+
+
+def get_tile(layer, name, z, x, y):
+    """Read a vector tile from the cache, encoding and caching it when missing
+
+    Args:
+        layer (str): One of ``LAYERS``
+        name (str): Name of the classification, training set or change objects
+        z, x, y (int): Tile coordinates
+
+    Return:
+        bytes: The protobuf encoded tile
+    """
+    path = tile_path(layer, name, z, x, y)
+    try:
+        with open(path, 'rb') as src:
+            return src.read()
+    except OSError:
+        pass
+    tile = query_tile(layer, name, z, x, y)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # Write and rename so that concurrent requests never read a partial tile
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as dst:
+        dst.write(tile)
+    os.replace(tmp, path)
+    return tile
+
+
+def invalidate_tiles(layer, name):
+    """Remove all cached tiles of a classification, training set or change objects
+
+    Args:
+        layer (str): One of ``LAYERS``
+        name (str): Name of the classification, training set or change objects
+    """
+    path = os.path.join(TEMP_DIR, 'tiles', layer, name)
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+        logger.info('Invalidated cached %s tiles of %s', layer, name)
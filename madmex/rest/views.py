@@ -4,29 +4,34 @@ Created on Jan 22, 2018
 @author: agutierrez
 '''
 import json
-import math
-import os
 
 from django.contrib.gis.geos.geometry import GEOSGeometry
 from django.contrib.gis.geos.polygon import Polygon
-from django.core.serializers import serialize
-from django.http.response import JsonResponse
+from django.core.cache import cache
+from django.http import Http404
+from django.http.response import HttpResponse, HttpResponseBadRequest, \
+    StreamingHttpResponse
 from django.template.response import TemplateResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from rest_framework import viewsets
 from rest_framework.generics import GenericAPIView
 from rest_framework.mixins import RetrieveModelMixin
-import xarray
 
 from madmex.models import TrainObject, Footprint, TrainClassification, \
     PredictClassification, Tag
-from madmex.orm.queries import get_datacube_objects, get_datacube_chunks, \
-    get_landsat_catalog
+from madmex.orm.queries import get_dataset_extents, get_storage_unit_extents, \
+    get_landsat_catalog_footprints, get_landsat_catalog_version
+from madmex.rest.geojson import stream_features
 from madmex.rest.serializers import ObjectSerializer, FootprintSerializer, \
     PredictSerializer, TagSerializer
-from madmex.settings import TEMP_DIR
+from madmex.rest.vector_tiles import LAYERS, get_tile
 from madmex.wrappers import predict_object
 
 
+EXTENTS_CACHE_TIMEOUT = 600
+
+
 class ObjectViewSet(viewsets.ModelViewSet):
     """
     API endpoint that allows users to be viewed or edited.
@@ -77,118 +82,101 @@ class PredictViewSet(viewsets.ModelViewSet):
     queryset = PredictClassification.objects.all()
     serializer_class = PredictSerializer
 
-def datacube_landsat_tiles(request):
-    count = 0
-    datacube_landsat_tiles = []
-    flag = True
-    for s in get_datacube_objects('ls8_espa_mexico_uncompressed'):
-        
-        if flag:
-            print(json.dumps(s, indent=4))
-            flag = False
-        
-        
-        chunk = {}
-        chunk['id'] = count
-        ll = s[0].get('extent').get('coord').get('ll')
-        lr = s[0].get('extent').get('coord').get('lr')
-        ul = s[0].get('extent').get('coord').get('ul')
-        ur = s[0].get('extent').get('coord').get('ur')    
-        polygon_wkt = 'SRID=4326;POLYGON ((%s %s, %s %s, %s %s, %s %s, %s %s))' % (ul.get('lon'), ul.get('lat'), ur.get('lon'), ur.get('lat'), lr.get('lon'), lr.get('lat'), ll.get('lon'), ll.get('lat'), ul.get('lon'), ul.get('lat'))
-        chunk['the_geom'] = polygon_wkt
-        datacube_landsat_tiles.append(chunk)
-        count = count + 1
-    response = {}
-    response['count'] = len(datacube_landsat_tiles)
-    response['results'] = datacube_landsat_tiles
-    return JsonResponse(response)
+def _extents(request, product, kind):
+    """Footprints of the datasets or storage units of a product (product query parameter)
+    read from the extent index
 
+    The serialized collection is cached for ``EXTENTS_CACHE_TIMEOUT`` seconds
+    """
+    product = request.GET.get('product', product)
+    key = '%s_extents_%s' % (kind, product)
+    payload = cache.get(key)
+    if payload is None:
+        if kind == 'storage_unit':
+            payload = get_storage_unit_extents(product)
+        else:
+            payload = get_dataset_extents(product)
+        cache.set(key, payload, EXTENTS_CACHE_TIMEOUT)
+    return HttpResponse(payload, content_type='application/geo+json')
 
-def datacube_chunks(request):
-    count = 0
-    datacube_landsat_tiles = []
-    flag = True
-    base = '/LUSTRE/MADMEX/tasks/2018_tasks/datacube_madmex/datacube_directories_mapping_docker_2'
-    for s in get_datacube_chunks('ls8_espa_mexico_uncompressed'):
-        name = '%s%s' % (base, s[0][19:])
-        polygon_wkt = 'SRID=4326;%s' %xarray.open_dataset(name).attrs['geospatial_bounds']
-        chunk = {}
-        chunk['id'] = count
-        chunk['the_geom'] = polygon_wkt
-        datacube_landsat_tiles.append(chunk)
-        count = count + 1
-        print(count)
-    response = {}
-    response['count'] = len(datacube_landsat_tiles)
-    response['results'] = datacube_landsat_tiles
-    return JsonResponse(response)
-
-
-def tile_ul(x, y, z):
-    n = 2.0 ** z
-    lon_deg = x / n * 360.0 - 180.0
-    lat_rad = math.atan(math.sinh(math.pi * (1 - 2 * y / n)))
-    lat_deg = math.degrees(lat_rad)
-    return  lon_deg,lat_deg
-
-def get_tile(z,x,y):
-    xmin,ymin = tile_ul(x, y, z)
-    xmax,ymax = tile_ul(x + 1, y + 1, z)
-    
-    tile = None
-    
-    tilefolder = "{}/{}/{}".format(TEMP_DIR,z,x)
-    tilepath = "{}/{}.pbf".format(tilefolder,y)
-    
-    
-    print(xmin, ymin)
-    print(xmax,ymax)
-    
-    return tile
 
+def datacube_landsat_tiles(request):
+    """GeoJSON footprints of the datasets of a product"""
+    return _extents(request, 'ls8_espa_mexico_uncompressed', 'dataset')
 
-def training_objects(request, z, x, y):
 
-    print(dir(request))
+def datacube_chunks(request):
+    """GeoJSON footprints of the storage units (chunk files) of a product"""
+    return _extents(request, 'ls8_espa_mexico_uncompressed', 'storage_unit')
 
-    print(z,x,y)
-    tile = get_tile(z, x, y)
-    
-    response = {'Hello':'World'}
 
-    
-    return JsonResponse(response)
+def vector_tile(request, layer, name, z, x, y):
+    """Serve a Mapbox Vector Tile of a classification, training set or change objects
+
+    See ``madmex.rest.vector_tiles``
+    """
+    if layer not in LAYERS or name.startswith('.'):
+        raise Http404('Unknown layer %s' % layer)
+    if not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+        raise Http404('Tile out of range')
+    tile = get_tile(layer, name, z, x, y)
+    response = HttpResponse(tile, content_type='application/vnd.mapbox-vector-tile')
+    response['Access-Control-Allow-Origin'] = '*'
+    return response
+
+def geojson_features(request, layer, name):
+    """Stream predictions, training objects or change objects as a GeoJSON FeatureCollection
+
+    Query parameters: polygon (WKT, longlat), zoom (simplify geometries for that
+    zoom level), precision (coordinates decimals, default 6), after (keyset
+    pagination, id of the last object of the previous page) and limit (page size,
+    default 10000). See ``madmex.rest.geojson``
+    """
+    if layer not in LAYERS:
+        raise Http404('Unknown layer %s' % layer)
+    params = request.GET
+    try:
+        kwargs = {'polygon': params.get('polygon'),
+                  'zoom': int(params['zoom']) if 'zoom' in params else None,
+                  'precision': int(params.get('precision', 6)),
+                  'after': int(params.get('after', 0)),
+                  'limit': min(int(params.get('limit', 10000)), 100000)}
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    return StreamingHttpResponse(stream_features(layer, name, **kwargs),
+                                 content_type='application/geo+json')
 
 def catalog(request, mission):
-    queryset = get_landsat_catalog(mission)
-    result = {}
-    min_year = math.inf
-    max_year = 0
-    for row in queryset:
-        path_row_id = row[0]
-        path_row = result.get(path_row_id, None)
-        if path_row == None:
-            result.update({path_row_id:{}})
-            path_row = result.get(path_row_id)
-        path_row.update({int(row[1]):row[2]})
-        
-        if int(row[1]) < min_year:
-            min_year = int(row[1])
-            
-        if int(row[1]) > max_year:
-            max_year = int(row[1])
-    
-    footprints = json.loads(serialize('geojson', Footprint.objects.filter(sensor='landsat'),
-              geometry_field='the_geom',
-              fields=('name',)))
-    for feat in footprints['features']:
-        props = feat.get('properties')
-        name = props.get('name')
-        props.update({'counts': result.get(name)})
-    
-    return TemplateResponse(request, 'catalog.html', {'footprints':json.dumps(footprints),
-                                                      'min_year':min_year,
-                                                      'max_year':max_year})
+    """Landsat catalog page
+
+    The page is built from the scene counts precomputed by ``refresh_landsat_catalog``.
+    Its context is cached per mission along with the catalog version it was built
+    from, and replaced after the next refresh. Clients get a 304 when their copy is
+    up to date (ETag)
+    """
+    version = get_landsat_catalog_version()
+    if version is None:
+        etag = None
+    else:
+        etag = quote_etag('%s-%d' % (mission, version.timestamp()))
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            return response
+    key = 'landsat_catalog_%s' % mission
+    cached = cache.get(key)
+    if etag is not None and cached is not None and cached[0] == etag:
+        context = cached[1]
+    else:
+        footprints, min_year, max_year = get_landsat_catalog_footprints(mission)
+        context = {'footprints': footprints,
+                   'min_year': min_year if min_year is not None else 0,
+                   'max_year': max_year if max_year is not None else 0}
+        if etag is not None:
+            cache.set(key, (etag, context), None)
+    response = TemplateResponse(request, 'catalog.html', context)
+    if etag is not None:
+        response['ETag'] = etag
+    return response
 
 def map(request):
     tags_list = TagSerializer(Tag.objects.all(), many=True).data
@@ -10,6 +10,7 @@ from rasterio import features
 from django.contrib.gis.geos.geometry import GEOSGeometry
 
 from madmex.util.spatial import feature_transform
+from madmex.util.xarray import to_band_array
 from madmex.models import PredictObject
 from madmex.util import chunk
 
@@ -19,6 +20,9 @@ class BaseSegmentation(metaclass=abc.ABCMeta):
     algorithms on raster data, converting input and output data and interacting with the
     database.
     """
+    # dtype of the array built by from_geoarray, None keeps the data type of the bands
+    dtype = None
+
     def __init__(self, array, affine, crs):
         """Parent class to run spatial segmentation
 
@@ -36,19 +40,25 @@ class BaseSegmentation(metaclass=abc.ABCMeta):
         self.algorithm = None
 
     @classmethod
-    def from_geoarray(cls, geoarray, **kwargs):
+    def from_geoarray(cls, geoarray, release=False, **kwargs):
         """Instantiate class from a geoarray (xarray read with datacube.load)
 
         Args:
             geoarray (xarray.Dataset): a Dataset with crs and affine attribute. Typically
                 coming from a call to Datacube.load or GridWorkflow.load
+            release (bool): Remove the bands from geoarray as soon as they are copied,
+                leaving it empty, to lower peak memory. Only set it when geoarray is
+                not used afterwards
             **kwargs: Additional arguments. Allow children class to set algorithm specific
                 parameters during instantiation
+
+        The bands are copied one by one to a (y, x, bands) array of the ``dtype``
+        of the class
         """
-        array = geoarray.squeeze().to_array().values
-        array = np.moveaxis(array, 0, 2)
         affine = Affine(*list(geoarray.affine)[0:6])
         crs = geoarray.crs._crs.ExportToProj4()
+        array = to_band_array(geoarray, band_axis=2, dtype=cls.dtype,
+                              release=release)
         return cls(array=array, affine=affine, crs=crs, **kwargs)
 
     @abc.abstractmethod
@@ -69,7 +79,7 @@ class BaseSegmentation(metaclass=abc.ABCMeta):
             raise ValueError("self.segments_array is None, you must run segment before this method")
         # Use rasterio.features.shapes to generate a geometries collection from the
         # segmented raster
-        geom_collection = features.shapes(self.segments_array.astype(np.uint16),
+        geom_collection = features.shapes(self.segments_array.astype(np.int32),
                                           transform=self.affine)
         # Make it a valid featurecollection
         def to_feature(feature):
@@ -91,12 +101,20 @@ class BaseSegmentation(metaclass=abc.ABCMeta):
         self.fc = fc_out
 
 
-    def to_db(self, meta_object):
+    def to_db(self, meta_object, parents=None):
         """Write the result of a segmentation to the database
 
         Args:
             meta_object (madmex.models.SegmentationInformation.object): The python mapping
                 of a django object containing segmentation metadata information
+            parents (dict): Optional mapping of segment labels (``id`` property of the
+                polygonized features) to the database id of the object containing them
+                in a coarser segmentation level. Used to set ``PredictObject.parent``
+
+        Return:
+            dict: Mapping of segment labels to the database id of the corresponding
+            object. When a label was polygonized into several features, the first
+            one is used
 
         Example:
             >>> from madmex.models import SegmentationInformation
@@ -116,15 +134,24 @@ class BaseSegmentation(metaclass=abc.ABCMeta):
         if self.fc is None:
             raise ValueError('fc (feature collection) attribute is empty, you must first run the polygonize method')
 
+        if parents is None:
+            parents = {}
+
         def predict_obj_builder(x):
             # The zero buffering should avoid invalid geometries generated by rasterio.shape
             geom = GEOSGeometry(json.dumps(x['geometry'])).buffer(0)
-            obj = PredictObject(the_geom=geom, segmentation_information=meta_object)
+            obj = PredictObject(the_geom=geom, segmentation_information=meta_object,
+                                parent_id=parents.get(x['properties']['id']))
             return obj
 
+        ids = {}
         for fc_chunk in chunk(self.fc, 30000):
+            fc_chunk = list(fc_chunk)
             obj_list = [predict_obj_builder(x) for x in fc_chunk]
             PredictObject.objects.bulk_create(obj_list)
+            for x, obj in zip(fc_chunk, obj_list):
+                ids.setdefault(x['properties']['id'], obj.id)
             gc.collect()
+        return ids
 
 
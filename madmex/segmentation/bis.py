@@ -1,18 +1,52 @@
+from collections import OrderedDict
+
+import numpy as np
+
 from madmex.segmentation import BaseSegmentation
 from madmex.bin.bis import segment_gen
 
 
+def _parent_labels(regions, coarser_regions):
+    """Map every label of a segmentation level to the label containing it in a coarser level
+
+    Levels produced with the same shape and compactness parameters geometrically
+    nest, the coarser label of any pixel of a region is therefore the label of
+    the whole region.
+
+    Args:
+        regions (np.ndarray): 2D array of labels
+        coarser_regions (np.ndarray): 2D array of labels of the coarser level
+
+    Return:
+        dict: label to coarser label mapping
+    """
+    labels, index = np.unique(regions, return_index=True)
+    return dict(zip(labels.tolist(), coarser_regions.ravel()[index].tolist()))
+
 
 class Segmentation(BaseSegmentation):
     """Antares implementation of Berkeley Image segmentation algorithm
     """
-    def __init__(self, array, affine, crs, t=12, s=0.3, c=0.8):
+    def __init__(self, array, affine, crs, t=12, s=0.3, c=0.8, tile=False, rows=1000,
+                 workers=None, xt=5):
         """BIS segmentation algorithm
 
         Args:
-            t (int): threshold. Threshold controls size, a larger threshold maps bigger objects
+            t (int or list): threshold. Threshold controls size, a larger threshold maps bigger objects.
+                When a list of thresholds is provided, the region merging is ran once and
+                a segmentation level is generated for every threshold (see ``hierarchy_to_db``)
             s (float): Shape
             c (float): Compactness
+            tile (bool): Split the array in strips of rows that are segmented in parallel
+                up to threshold xt and then combined. Strips are read from shared memory
+                by the workers
+            rows (int): Number of rows per strip when tiling. Decrease to use less memory
+                per worker
+            workers (int): Number of strips segmented at once when tiling. Defaults to
+                the number of cpus. Strips are segmented by forked processes, also
+                when running within a dask worker
+            xt (int): Threshold reached in the strips phase, must be smaller than t. Raise
+                to put more merging in the parallel phase (at the cost of visible seams)
 
         Example:
             >>> from madmex.segmentation.bis import Segmentation
@@ -27,15 +61,61 @@ class Segmentation(BaseSegmentation):
             >>>                                datasource_year='2018')
             >>> meta.save()
             >>> Seg.to_db()
+
+            >>> # Multi-scale
+            >>> Seg = Segmentation.from_geoarray(geoarray, t=[20, 40], s=0.3, c=0.8)
+            >>> Seg.segment()
+            >>> meta_40 = SegmentationInformation(algorithm='bis', name='seg_40',
+            >>>                                   parameters="{'t': 40, 's': 0.3, 'c': 0.8}")
+            >>> meta_40.save()
+            >>> meta_20 = SegmentationInformation(algorithm='bis', name='seg_20', parent=meta_40,
+            >>>                                   parameters="{'t': 20, 's': 0.3, 'c': 0.8}")
+            >>> meta_20.save()
+            >>> Seg.hierarchy_to_db({40: meta_40, 20: meta_20})
         """
         super().__init__(array=array, affine=affine, crs=crs)
         self.algorithm = 'bis'
         self.t = t
         self.s = s
         self.c = c
+        self.tile = tile
+        self.rows = rows
+        self.workers = workers
+        self.xt = xt
+        self.levels = None
 
     def segment(self):
-        arr_gen = segment_gen(self.array, t=[self.t], s=self.s, c=self.c,
-                              tile=False, nodata=None)
-        arr = next(arr_gen)
-        self.segments_array = arr
+        # Thresholds must be increasing for the merger to produce every level
+        t = sorted(self.t) if isinstance(self.t, (list, tuple)) else [self.t]
+        arr_gen = segment_gen(self.array, t=t, s=self.s, c=self.c,
+                              tile=self.tile, xt=self.xt, rows=self.rows,
+                              workers=self.workers, nodata=None)
+        self.levels = OrderedDict(zip(t, arr_gen))
+        self.segments_array = self.levels[t[0]]
+
+    def hierarchy_to_db(self, meta_objects):
+        """Polygonize and write every segmentation level to the database
+
+        Levels are written from the coarsest to the finest, each object being linked
+        (``PredictObject.parent``) to the object that contains it in the next coarser
+        level.
+
+        Args:
+            meta_objects (dict): Mapping of threshold to the
+                ``madmex.models.SegmentationInformation`` object under which the
+                corresponding level is registered
+        """
+        if self.levels is None:
+            raise ValueError("self.levels is None, you must run segment before this method")
+        parents = None
+        coarser_regions = None
+        coarser_ids = None
+        for t in sorted(self.levels, reverse=True):
+            regions = self.levels[t]
+            if coarser_regions is not None:
+                parents = {label: coarser_ids.get(parent) for label, parent in
+                           _parent_labels(regions, coarser_regions).items()}
+            self.segments_array = regions
+            self.polygonize()
+            coarser_ids = self.to_db(meta_objects[t], parents=parents)
+            coarser_regions = regions
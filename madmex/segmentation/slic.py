@@ -1,4 +1,8 @@
+from math import ceil, sqrt
+
+import numpy as np
 from madmex.segmentation import BaseSegmentation
+from madmex.util.numpy import label_blocks
 from skimage.segmentation import slic
 
 
@@ -6,7 +10,10 @@ from skimage.segmentation import slic
 class Segmentation(BaseSegmentation):
     """Antares implementation of scikit-image's SLIC segmentation algorithm
     """
-    def __init__(self, array, affine, crs,  n_segments=10000, compactness=10.0):
+    dtype = np.float32
+
+    def __init__(self, array, affine, crs,  n_segments=10000, compactness=10.0,
+                 block_size=None, halo=None, workers=None):
         """SLIC superpixel segmentation
 
         See http://scikit-image.org/docs/dev/api/skimage.segmentation.html#skimage.segmentation.slic
@@ -15,6 +22,13 @@ class Segmentation(BaseSegmentation):
         Args:
             n_segments (int): The (approximate) number of labels in the segmented output image.
             compactness (float): Balances color proximity and space proximity
+            block_size (int): Optional size (in pixels) of the square blocks in which the
+                array is segmented. Blocks are segmented in parallel and their labels
+                stitched across seams (see ``madmex.util.numpy.label_blocks``). The
+                whole array is segmented at once when None (default)
+            halo (int): Overlap (in pixels) between neighbouring blocks. Defaults to
+                twice the expected superpixel size
+            workers (int): Maximum number of blocks segmented at once
 
         Example:
             >>> from madmex.segmentation.slic import Segmentation
@@ -34,8 +48,25 @@ class Segmentation(BaseSegmentation):
         self.algorithm = 'slic'
         self.n_segments = n_segments
         self.compactness = compactness
+        self.block_size = block_size
+        self.halo = halo
+        self.workers = workers
+
+    def _slic(self, array, n_segments):
+        return slic(array.astype(np.float32, copy=False), compactness=self.compactness,
+                    n_segments=n_segments, multichannel=True)
 
     def segment(self):
-        arr = slic(self.array, compactness = self.compactness,
-                   n_segments=self.n_segments, multichannel = True)
-        self.segments_array = arr
+        if self.block_size is None:
+            self.segments_array = self._slic(self.array, self.n_segments)
+            return
+        n_pixels = self.array.shape[0] * self.array.shape[1]
+        halo = self.halo
+        if halo is None:
+            halo = int(ceil(2 * sqrt(n_pixels / self.n_segments)))
+        def block_slic(block):
+            # Number of segments proportional to the block area (halo included)
+            n = self.n_segments * block.shape[0] * block.shape[1] / n_pixels
+            return self._slic(block, max(1, int(round(n))))
+        self.segments_array = label_blocks(self.array, block_slic, self.block_size,
+                                           halo, workers=self.workers)
@@ -189,6 +189,15 @@ SERIALIZED_OBJECTS_DIR = os.getenv('SERIALIZED_OBJECTS_DIR')
 # Ingestion path
 INGESTION_PATH = os.getenv('INGESTION_PATH')
 
+# On disk cache of loaded datacube tiles (see madmex.io.tile_cache), disabled when
+# not set. Size in GB
+TILE_CACHE_DIR = os.getenv('TILE_CACHE_DIR')
+TILE_CACHE_SIZE = os.getenv('TILE_CACHE_SIZE', 50)
+
+# On disk cache of simplified country/region geometries and rasterized masks
+# (see madmex.io.mask_cache)
+MASK_CACHE_DIR = os.getenv('MASK_CACHE_DIR', os.path.join(TEMP_DIR, 'mask_cache'))
+
 # Berkeley image segmentation license number
 BIS_LICENSE = os.getenv('BIS_LICENSE', '1-319-527-2680')
 
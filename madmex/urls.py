@@ -29,7 +29,8 @@ router.register(r'footprints', views.FootprintViewSet)
 urlpatterns = [
     path('datacube_landsat_tiles/', views.datacube_chunks, name='datacube_chunks'),
     path('datacube/', views.datacube_landsat_tiles, name='datacube_landsat_tiles'),
-    path('training_objects/<int:z>/<int:x>/<int:y>/', views.training_objects, name='training_objects'),
+    path('geojson/<str:layer>/<str:name>/', views.geojson_features, name='geojson_features'),
+    path('tiles/<str:layer>/<str:name>/<int:z>/<int:x>/<int:y>.pbf', views.vector_tile, name='vector_tile'),
     path('admin/', admin.site.urls),
     url(r'^api/', include(router.urls)),
     url(r'^api-auth/', include('rest_framework.urls', namespace='rest_framework')),
@@ -25,3 +25,19 @@ def var_to_ind(variables, product):
     measurements = list(prod.measurements)
     indices = [measurements.index(x) for x in variables]
     return indices
+
+
+def tile_cell(tile_key, tile):
+    """Identify the product grid cell of a datacube tile
+
+    Args:
+        tile_key (tuple): (x, y) grid cell index, as returned (dictionary key) by
+            ``GridWorkflow.list_cells()``
+        tile (datacube.api.Tile): The corresponding tile
+
+    Return:
+        tuple: (product, x, y) tuple. Key of the materialized tile indices (see
+        ``madmex.io.tile_index``)
+    """
+    product = tile.sources.values[0][0].type.name
+    return (product,) + tuple(int(i) for i in tile_key)
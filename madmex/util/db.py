@@ -1,4 +1,8 @@
-from madmex.models import Tag, PredictClassification, ValidClassification
+from django.db import connection
+from django.db.models import Exists, OuterRef
+
+from madmex.models import (Tag, PredictClassification, ValidClassification,
+                           SegmentationInformation)
 
 def classification_to_cmap(x):
     """Generate a colormap (cmap) object for a given classification
@@ -72,3 +76,128 @@ def get_validation_scheme_name(name):
     valid_obj = ValidClassification.objects.filter(valid_set=name).first()
     scheme = valid_obj.valid_tag.scheme
     return scheme
+
+
+def segmentation_index_name(segmentation_id):
+    """Name of the partial spatial index of a segmentation
+    """
+    return 'predictobject_geom_seg_%d_idx' % segmentation_id
+
+
+def get_segmentation_ids(name):
+    """Resolve the ids of the segmentations with a given name
+
+    Segmentation names are not unique: segmentations ran with the same name and
+    different parameters share it
+
+    Args:
+        name (str): Name of the segmentation (SegmentationInformation table)
+
+    Return:
+        list: The ids, in increasing order. Empty if no segmentation has that name
+    """
+    return list(SegmentationInformation.objects.filter(name=name)
+                .order_by('id').values_list('id', flat=True))
+
+
+def get_classification_segmentation_ids(name):
+    """Resolve the ids of the segmentations whose objects a classification labels
+
+    Args:
+        name (str): Name of the classification (PredictClassification table)
+
+    Return:
+        list: The ids, in increasing order. Empty if the classification does not exist
+    """
+    # Existence test per segmentation rather than a scan of the whole classification
+    labels = PredictClassification.objects.filter(
+        name=name, predict_object__segmentation_information_id=OuterRef('pk'))
+    return list(SegmentationInformation.objects.annotate(labeled=Exists(labels))
+                .filter(labeled=True).order_by('id').values_list('id', flat=True))
+
+
+def index_segmentation(segmentation_id):
+    """Create a spatial index restricted to the objects of a segmentation
+
+    Partial GiST index of the ``madmex_predictobject`` table, covering only the rows
+    of a given segmentation. Acts as a spatial partition of the table for the
+    queries filtering by segmentation and geometry, which no longer need to scan
+    the index entries of all other segmentations.
+
+    The planner only uses the index when it can prove its predicate from the query,
+    that is when the query filters ``segmentation_information_id`` with a constant
+    (a value bound with psycopg2 is sent as a literal), not through a join on the
+    segmentation name. Queries therefore resolve the ids first and are ran once
+    per segmentation, see ``get_segmentation_ids`` and
+    ``get_classification_segmentation_ids`` (used by
+    ``madmex.io.vector_db.load_segmentation_from_dataset``,
+    ``madmex.validation.query_validation_intersect`` and the db_to_vector command).
+
+    Args:
+        segmentation_id (int): Id of the SegmentationInformation object
+
+    Return:
+        str: The index name
+    """
+    name = segmentation_index_name(segmentation_id)
+    query = """
+CREATE INDEX IF NOT EXISTS %s ON public.madmex_predictobject USING gist (the_geom)
+WHERE segmentation_information_id = %d;
+    """ % (name, segmentation_id)
+    with connection.cursor() as c:
+        c.execute(query)
+    return name
+
+
+def drop_orphan_segmentation_indexes():
+    """Drop the partial spatial indexes of segmentations that no longer exist
+
+    Return:
+        list: Names of the dropped indexes
+    """
+    query = """
+SELECT
+    indexname
+FROM
+    pg_indexes
+WHERE
+    tablename = 'madmex_predictobject'
+    AND
+    indexname LIKE 'predictobject_geom_seg_%_idx'
+    AND
+    substring(indexname from 'seg_([0-9]+)_idx')::int NOT IN
+    (SELECT id FROM public.madmex_segmentationinformation);
+    """
+    with connection.cursor() as c:
+        c.execute(query)
+        names = [row[0] for row in c.fetchall()]
+        for name in names:
+            c.execute('DROP INDEX IF EXISTS %s;' % name)
+    return names
+
+
+def cluster_predict_objects():
+    """Spatially cluster the PredictObject table and refresh planner statistics
+
+    Rewrites ``madmex_predictobject`` in the order of its spatial index, so that
+    objects close to each other are stored in the same pages. To be ran after bulk
+    loads (e.g.: segmentation of a new region). Takes an exclusive lock on the table.
+    """
+    query = """
+SELECT
+    indexname
+FROM
+    pg_indexes
+WHERE
+    tablename = 'madmex_predictobject'
+    AND
+    indexdef LIKE '%USING gist (the_geom)'
+    AND
+    indexdef NOT LIKE '%WHERE%';
+    """
+    with connection.cursor() as c:
+        c.execute(query)
+        index = c.fetchone()[0]
+        c.execute('CLUSTER public.madmex_predictobject USING %s;' % index)
+        c.execute('ANALYZE public.madmex_predictobject;')
+        c.execute('ANALYZE public.madmex_predictclassification;')
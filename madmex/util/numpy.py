@@ -1,4 +1,8 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 
 def groupby(X, y):
     """Split a 2D array along the zero dimension using an array of groups
@@ -17,3 +21,106 @@ def groupby(X, y):
     X_sorted = X[sidy,:]
     X_out = np.split(X_sorted, np.flatnonzero(y_sorted[1:] != y_sorted[:-1])+1 )
     return zip(np.unique(y), X_out)
+
+
+def block_windows(shape, block_size, halo):
+    """Generate overlapping blocks covering a 2D array
+
+    Args:
+        shape (tuple): (rows, cols) shape of the array
+        block_size (int): Number of rows and columns of the non overlapping part
+            (core) of the blocks
+        halo (int): Number of rows and columns by which the cores are extended on
+            every side
+
+    Return:
+        generator: Generator of (window, core) tuples, each a (rows, cols) tuple of
+        slices in array coordinates. Windows are clipped to the array extent
+    """
+    rows, cols = shape
+    for y in range(0, rows, block_size):
+        for x in range(0, cols, block_size):
+            core = (slice(y, min(y + block_size, rows)),
+                    slice(x, min(x + block_size, cols)))
+            window = (slice(max(y - halo, 0), min(y + block_size + halo, rows)),
+                      slice(max(x - halo, 0), min(x + block_size + halo, cols)))
+            yield window, core
+
+
+def label_blocks(array, fun, block_size, halo, workers=None, out=None):
+    """Run a labelling (segmentation) function by overlapping blocks and stitch the results
+
+    Blocks are labelled in parallel threads. The core of every block is written to
+    the output with labels offset to be globally unique, then labels that face each
+    other across a seam are merged when they are each other's largest overlap in the
+    halos. The halo should be large enough for a segment crossing a seam to be
+    fully contained in the windows of the blocks it belongs to.
+
+    Args:
+        array (np.ndarray): Array of at least 2 dimensions, the first two being
+            (rows, cols)
+        fun (callable): Function taking an array block and returning a 2D array of
+            labels of the same (rows, cols) shape
+        block_size (int): Number of rows and columns of a block, halo excluded
+        halo (int): Overlap, in pixels, on every side of a block
+        workers (int): Maximum number of blocks labelled at once. Defaults to
+            the ThreadPoolExecutor default
+        out (np.ndarray): Optional 2D int32 array of shape (rows, cols) in which
+            the labels are written
+
+    Return:
+        np.ndarray: 2D int32 array of labels, starting at 0
+    """
+    rows, cols = array.shape[:2]
+    if out is None:
+        out = np.empty((rows, cols), dtype=np.int32)
+    windows = list(block_windows((rows, cols), block_size, halo))
+    offset = 0
+    offsets = []
+    frames = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(lambda w: fun(array[w[0]]),
+                               windows)
+        for (window, core), labels in zip(windows, results):
+            # Consecutive local labels, offset to be unique across blocks
+            _, labels = np.unique(labels, return_inverse=True)
+            labels = labels.reshape(window[0].stop - window[0].start,
+                                    window[1].stop - window[1].start)
+            labels = (labels + offset).astype(np.int32)
+            offsets.append(offset)
+            offset = labels.max() + 1
+            # Core position within the window
+            y0, y1 = core[0].start - window[0].start, core[0].stop - window[0].start
+            x0, x1 = core[1].start - window[1].start, core[1].stop - window[1].start
+            out[core] = labels[y0:y1,x0:x1]
+            # Halo frame (top, bottom, left, right strips), kept for matching
+            # with the cores of the neighbouring blocks once they are written
+            ys, xs = window
+            strips = [((slice(ys.start, core[0].start), xs), labels[:y0]),
+                      ((slice(core[0].stop, ys.stop), xs), labels[y1:]),
+                      ((core[0], slice(xs.start, core[1].start)), labels[y0:y1,:x0]),
+                      ((core[0], slice(core[1].stop, xs.stop)), labels[y0:y1,x1:])]
+            frames += [(s, l.copy()) for s, l in strips if l.size]
+    if not frames:
+        return out
+    # (neighbour core label, halo label) pairs and their overlap counts
+    pairs = np.concatenate([np.column_stack((out[s].ravel(), l.ravel()))
+                            for s, l in frames])
+    pairs, counts = np.unique(pairs, axis=0, return_counts=True)
+    # Largest overlap of every label with the labels of each neighbouring block
+    # (blocks are identified from the label offsets); mutual ones are merged
+    blocks = np.searchsorted(offsets, pairs, side='right')
+    def best(column):
+        key = pairs[:,column]
+        other = blocks[:,1 - column]
+        order = np.lexsort((-counts, other, key))
+        first = np.ones(order.size, dtype=bool)
+        first[1:] = ((key[order[1:]] != key[order[:-1]])
+                     | (other[order[1:]] != other[order[:-1]]))
+        return order[first]
+    mutual = np.intersect1d(best(0), best(1))
+    graph = coo_matrix((np.ones(mutual.size), (pairs[mutual,0], pairs[mutual,1])),
+                       shape=(offset, offset))
+    _, lut = connected_components(graph, directed=False)
+    np.take(lut.astype(np.int32), out, out=out)
+    return out
@@ -1,7 +1,11 @@
+import logging
+
 import xarray as xr
 from xarray import DataArray
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
 def to_float(x):
     """TAkes a DataArray, converts data flagged as nodata to Nan and return corresponding array in float
 
@@ -80,3 +84,69 @@ def to_int(x):
     x_int = x.where(DataArray.notnull(x), x.attrs['nodata'])
     return x_int.astype('int16')
 
+
+def to_band_array(x, band_axis=0, dtype=None, release=False):
+    """Copy the variables of a Dataset to a single array allocated once
+
+    Unlike ``Dataset.to_array().values``, which stacks all variables into a new
+    array that often needs to be transposed or cast (and therefore copied) again,
+    the output buffer is allocated in its final layout and dtype and filled one
+    variable at a time.
+
+    Args:
+        x (xarray.Dataset): Dataset of variables sharing the same dimensions, after
+            squeezing of dimensions of length 1 (typically a single time step as
+            returned by ``GridWorkflow.load``)
+        band_axis (int): Position of the band dimension in the output array. 0 for
+            band-sequential (bands, y, x) and -1 or 2 for band-interleaved (y, x, bands)
+        dtype (numpy.dtype): dtype of the output array. Defaults to the smallest
+            type able to hold all variables
+        release (bool): Whether to remove variables from the Dataset as soon as
+            they are copied so that their memory can be freed during the copy.
+            The Dataset is left empty and must not be reused by the caller.
+            Defaults to False
+
+    Return:
+        numpy.ndarray: The array, with the band dimension in band_axis position
+
+    Example:
+        >>> import numpy as np
+        >>> import xarray as xr
+        >>> from madmex.util.xarray import to_band_array
+
+        >>> xarr = xr.DataArray(np.zeros((1, 3, 4), dtype=np.int16), dims=['time', 'y', 'x'])
+        >>> xset = xr.Dataset({'blue': xarr, 'green': xarr + 1, 'red': xarr + 2})
+        >>> arr = to_band_array(xset, band_axis=2, dtype=np.float32)
+        >>> print(arr.shape, arr.dtype, arr.flags['C_CONTIGUOUS'])
+        (3, 4, 3) float32 True
+        >>> print(list(xset.data_vars))
+        ['blue', 'green', 'red']
+        >>> arr = to_band_array(xset, release=True)
+        >>> print(arr.shape, arr.dtype, list(xset.data_vars))
+        (3, 3, 4) int16 []
+    """
+    names = list(x.data_vars)
+    bands = [x[name].squeeze() for name in names]
+    stack_dtype = np.result_type(*[b.dtype for b in bands])
+    dtype = np.dtype(stack_dtype if dtype is None else dtype)
+    shape = list(bands[0].shape)
+    band_axis = band_axis % (len(shape) + 1)
+    shape.insert(band_axis, len(names))
+    out = np.empty(shape, dtype=dtype)
+    out_bands = np.moveaxis(out, band_axis, 0)
+    for i, name in enumerate(names):
+        out_bands[i] = bands[i].values
+        if release:
+            bands[i] = None
+            del x[name]
+    # Intermediary arrays of the stack, cast and transpose path; the stacked array
+    # is band-sequential and moveaxis only makes a view, which is copied by
+    # consumers requiring contiguous arrays
+    saved = out.size * stack_dtype.itemsize
+    if dtype != stack_dtype:
+        saved += out.nbytes
+    if band_axis != 0:
+        saved += out.nbytes
+    logger.info('Loaded %d bands to a %s array of shape %s, %.1f MB saved on peak memory',
+                len(names), out.dtype, out.shape, saved / 2**20)
+    return out
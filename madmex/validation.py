@@ -7,7 +7,7 @@ from sklearn.metrics import accuracy_score, confusion_matrix
 from django.db import connection
 
 from madmex.models import Country, Region
-from madmex.util.db import get_label_encoding
+from madmex.util.db import get_label_encoding, get_classification_segmentation_ids
 
 def prepare_validation(fc_valid, fc_test, valid_field=None, test_field=None):
     """Generate area weighted confusion matrix
@@ -166,7 +166,9 @@ INNER JOIN
 INNER JOIN
     public.madmex_tag ON cl.tag_id = public.madmex_tag.id
 WHERE
-    cl.name = %s;
+    cl.name = %s
+    AND
+    public.madmex_predictobject.segmentation_information_id = %s;
     """
     if region is not None:
         # Query country or region contour
@@ -182,8 +184,11 @@ WHERE
             c.execute(q0_sp_filter, [region.wkt, validation_set])
         c.execute(q1)
         val_qs = c.fetchall()
-        c.execute(q2, [test_set])
-        pred_qs = c.fetchall()
+        # One query per constant segmentation id, allows use of their partial spatial index
+        pred_qs = []
+        for segmentation_id in get_classification_segmentation_ids(test_set):
+            c.execute(q2, [test_set, segmentation_id])
+            pred_qs += c.fetchall()
 
     val_fc = [(json.loads(x[0]), x[1]) for x in val_qs]
     pred_fc = [(json.loads(x[0]), x[1]) for x in pred_qs]
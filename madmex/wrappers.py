@@ -1,7 +1,6 @@
 import rasterio
 import numpy as np
 import os
-import json
 from datetime import datetime
 import gc
 import datacube
@@ -11,10 +10,13 @@ from importlib import import_module
 from madmex.util.xarray import to_float
 from madmex.util import chunk
 from madmex.io.vector_db import VectorDb, load_segmentation_from_dataset
+from madmex.io.tile_cache import load_tile
+from madmex.io.mask_cache import simplified_geometry
+from madmex.util.datacube import tile_cell
 from madmex.overlay.extractions import zonal_stats_xarray
 from madmex.modeling import BaseModel
 
-from madmex.models import Region, Country, Model, PredictClassification
+from madmex.models import Model, PredictClassification
 
 """
 The wrapper module gathers functions that are typically called by
@@ -47,15 +49,12 @@ def predict_pixel_tile(tile, model_id, outdir=None):
     try:
         # Load model class corresponding to the right model
         trained_model = BaseModel.from_db(model_id)
-        try:
-            # Avoid opening several threads in each process
-            trained_model.model.n_jobs = 1
-        except Exception as e:
-            pass
+        # Avoid opening several threads in each process
+        session = trained_model.prediction_session(n_threads=1)
         # Generate filename
         filename = os.path.join(outdir, 'prediction_%s_%d_%d.tif' % (model_id, tile[0][0], tile[0][1]))
         # Load tile
-        xr_dataset = GridWorkflow.load(tile[1])
+        xr_dataset = load_tile(tile[1])
         # Convert it to float?
         # xr_dataset = xr_dataset.apply(func=to_float, keep_attrs=True)
         # Transform file to nd array
@@ -64,7 +63,7 @@ def predict_pixel_tile(tile, model_id, outdir=None):
         shape_2d = (arr_3d.shape[0] * arr_3d.shape[1], arr_3d.shape[2])
         arr_2d = arr_3d.reshape(shape_2d)
         # predict
-        predicted_array = trained_model.predict(arr_2d)
+        predicted_array = session.predict(arr_2d)
         # Reshape back to 2D
         predicted_array = predicted_array.reshape((arr_3d.shape[0], arr_3d.shape[1]))
         # Write array to geotiff
@@ -91,7 +90,7 @@ def predict_pixel_tile(tile, model_id, outdir=None):
         return None
 
 
-def extract_tile_db(tile, sp, training_set, sample):
+def extract_tile_db(tile, sp, training_set, sample, shape_features=None, seed=0):
     """Function to extract data under training geometries for a given tile
 
     Meant to be called within a dask.distributed.Cluster.map() over a list of tiles
@@ -103,21 +102,27 @@ def extract_tile_db(tile, sp, training_set, sample):
         sp: Spatial aggregation function
         training_set (str): Training data identifier (training_set field)
         sample (float): Proportion of training data to sample from the complete set
+        shape_features (list): Optional list of shape metrics of the training geometries
+            to use as additional predictors (see ``madmex.overlay.shape_metrics``)
+        seed (int): Seed of the random sampling of the training data
 
     Returns:
         A list of predictors and target values arrays
     """
     try:
         # Load tile as Dataset
-        xr_dataset = GridWorkflow.load(tile[1])
+        xr_dataset = load_tile(tile[1])
         # Query the training geometries fitting into the extent of xr_dataset
         db = VectorDb()
         fc = db.load_training_from_dataset(xr_dataset,
                                            training_set=training_set,
-                                           sample=sample)
+                                           sample=sample,
+                                           seed=seed,
+                                           cell=tile_cell(*tile))
         # fc is a feature collection with one property (class)
         # Overlay geometries and xr_dataset and perform extraction combined with spatial aggregation
-        extract = zonal_stats_xarray(xr_dataset, fc, field='class', aggregation=sp)
+        extract = zonal_stats_xarray(xr_dataset, fc, field='class', aggregation=sp,
+                                     shape_features=shape_features)
         fc = None
         gc.collect()
         # Return the extracted array (or a list of two arrays?)
@@ -165,13 +170,11 @@ def gwf_query(product, lat=None, long=None, region=None, begin=None, end=None,
     """
     query_params = {'product': product}
     if region is not None:
-       # Query database and build a datacube.utils.Geometry(geopolygon)
-       try:
-           query_set = Country.objects.get(name=region)
-       except Country.DoesNotExist:
-           query_set = Region.objects.get(name=region)
-       region_json = json.loads(query_set.the_geom.geojson)
-       crs = CRS('EPSG:%d' % query_set.the_geom.srid)
+       # Build a datacube.utils.Geometry(geopolygon) from the cached simplified
+       # geometry. It is buffered to cover the full resolution geometry, so
+       # that no tile is missed
+       region_json, srid = simplified_geometry(region, tolerance=0.01, cover=True)
+       crs = CRS('EPSG:%d' % srid)
        geom = Geometry(region_json, crs)
        query_params.update(geopolygon=geom)
     elif lat is not None and long is not None:
@@ -205,7 +208,9 @@ def segment(tile, algorithm, segmentation_meta,
         tile: Datacube tile as returned by GridWorkflow.list_cells()
         algorithm (str): Name of the segmentation algorithm to apply
         segmentation_meta (madmex.models.SegmentationInformation.object): Django object
-            relating to every segmentation object generated by this run
+            relating to every segmentation object generated by this run. For multi-scale
+            segmentations, a dictionary of threshold to SegmentationInformation objects
+            (one per level)
         band_list (list): Optional subset of bands of the product to use for running the segmentation.
         extra_args (dict): dictionary of additional arguments
     """
@@ -218,14 +223,17 @@ def segment(tile, algorithm, segmentation_meta,
 
     try:
         # Load tile
-        geoarray = GridWorkflow.load(tile[1], measurements=band_list)
-        seg = Segmentation.from_geoarray(geoarray, **extra_args)
+        geoarray = load_tile(tile[1], measurements=band_list)
+        seg = Segmentation.from_geoarray(geoarray, release=True, **extra_args)
         seg.segment()
         # Try deallocating input array
         seg.array = None
         geoarray = None
-        seg.polygonize()
-        seg.to_db(segmentation_meta)
+        if isinstance(segmentation_meta, dict):
+            seg.hierarchy_to_db(segmentation_meta)
+        else:
+            seg.polygonize()
+            seg.to_db(segmentation_meta)
         gc.collect()
         return True
     except Exception as e:
@@ -233,7 +241,7 @@ def segment(tile, algorithm, segmentation_meta,
         return False
 
 def predict_object(tile, model_name, segmentation_name,
-                   categorical_variables, aggregation, name):
+                   categorical_variables, aggregation, name, shape_features=None):
     """Run a trained classifier in prediction mode on all objects intersection with a tile
 
     Args:
@@ -244,15 +252,20 @@ def predict_object(tile, model_name, segmentation_name,
         categorical_variables (list): List of strings corresponding to categorical
             features.
         aggregation (str): Spatial aggregation method to use
+        shape_features (list): Optional list of shape metrics of the segments to
+            use as additional predictors. Must match the list used when training
+            the model (see ``madmex.overlay.shape_metrics``)
     """
     try:
         # Load geoarray and feature collection
-        geoarray = GridWorkflow.load(tile[1])
-        fc = load_segmentation_from_dataset(geoarray, segmentation_name)
+        geoarray = load_tile(tile[1])
+        fc = load_segmentation_from_dataset(geoarray, segmentation_name,
+                                            cell=tile_cell(*tile))
         # Extract array of features
         X, y = zonal_stats_xarray(dataset=geoarray, fc=fc, field='id',
                                   categorical_variables=categorical_variables,
-                                  aggregation=aggregation)
+                                  aggregation=aggregation,
+                                  shape_features=shape_features)
         # Deallocate geoarray and feature collection
         geoarray = None
         fc = None
@@ -260,17 +273,13 @@ def predict_object(tile, model_name, segmentation_name,
         # Load model
         PredModel = BaseModel.from_db(model_name)
         model_id = Model.objects.get(name=model_name).id
-        try:
-            # Avoid opening several threads in each process
-            PredModel.model.n_jobs = 1
-        except Exception as e:
-            pass
-        # Run prediction
-        y_pred = PredModel.predict(X)
-        y_conf = PredModel.predict_confidence(X)
+        # Run prediction, avoiding to open several threads in each process
+        session = PredModel.prediction_session(n_threads=1)
+        y_pred, y_conf = session.predict(X, confidence=True)
         # Deallocate arrays of extracted values and model
         X = None
         PredModel = None
+        session = None
         gc.collect()
         # Build list of PredictClassification objects
         def predict_object_builder(i, pred, conf):
@@ -331,10 +340,10 @@ def detect_and_classify_change(tiles, algorithm, change_meta, band_list, mmu,
 
     try:
         # Load geoarrays
-        geoarray_pre = GridWorkflow.load(tiles[1][0], measurements=band_list)
-        BiChange_pre = BiChange.from_geoarray(geoarray_pre, **extra_args)
-        geoarray_post = GridWorkflow.load(tiles[1][1], measurements=band_list)
-        BiChange_post = BiChange.from_geoarray(geoarray_post)
+        geoarray_pre = load_tile(tiles[1][0], measurements=band_list)
+        BiChange_pre = BiChange.from_geoarray(geoarray_pre, release=True, **extra_args)
+        geoarray_post = load_tile(tiles[1][1], measurements=band_list)
+        BiChange_post = BiChange.from_geoarray(geoarray_post, release=True)
         # Run change detection
         BiChange_pre.run(BiChange_post)
         # Apply mmu filter
@@ -344,8 +353,9 @@ def detect_and_classify_change(tiles, algorithm, change_meta, band_list, mmu,
         if BiChange_pre.change_array.sum() == 0:
             return True
         # Load pre and post land cover map as feature collections
-        fc_pre = BiChange_pre.read_land_cover(lc_pre)
-        fc_post = BiChange_pre.read_land_cover(lc_post)
+        cell = tile_cell(tiles[0], tiles[1][0])
+        fc_pre = BiChange_pre.read_land_cover(lc_pre, cell=cell)
+        fc_post = BiChange_pre.read_land_cover(lc_post, cell=cell)
         # Generate feature collection of labelled change objects
         fc_change = BiChange_pre.label_change(fc_pre, fc_post)
         # Optionally filter objects with same pre and post label
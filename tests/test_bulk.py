@@ -0,0 +1,75 @@
+import os
+import shutil
+import unittest
+
+import fiona
+from shapely import wkb
+
+from madmex.io.bulk import (read_batches, copy_rows, footprint_name_fun,
+                             catalog_scenes, CATALOG_COLUMNS)
+from madmex.settings import TEMP_DIR
+from madmex.util.local import aware_make_dir
+
+
+class TestBulk(unittest.TestCase):
+
+    def test_read_batches(self):
+        path = os.path.join(TEMP_DIR, 'test_read_batches')
+        aware_make_dir(path)
+        filename = os.path.join(path, 'utm.shp')
+        schema = {'geometry': 'Polygon', 'properties': {'code': 'int'}}
+        with fiona.open(filename, 'w', driver='ESRI Shapefile', schema=schema,
+                        crs='EPSG:32613') as dst:
+            for i in range(25):
+                ring = [(500000 + i, 2000000), (500100 + i, 2000000),
+                        (500100 + i, 2000100), (500000 + i, 2000000)]
+                dst.write({'geometry': {'type': 'Polygon', 'coordinates': [ring]},
+                           'properties': {'code': i % 3}})
+        batches = list(read_batches(filename, batch_size=10, every=2))
+        self.assertEqual([len(b) for b in batches], [10, 3])
+        geom = wkb.loads(batches[0][0][0], hex=True)
+        self.assertAlmostEqual(geom.bounds[0], -105, places=3)
+        self.assertEqual(batches[0][1][1]['code'], 2)
+        shutil.rmtree(path)
+
+    def test_footprint_names(self):
+        name_fun = footprint_name_fun()
+        self.assertEqual(name_fun({'PATH': 29, 'ROW': 46}), '029046')
+        name_fun = footprint_name_fun('tile')
+        self.assertEqual(name_fun({'tile': '13QFB'}), '13QFB')
+        self.assertEqual(name_fun({'tile': 12}), '12')
+        self.assertIsNone(name_fun({'tile': None}))
+        # Missing names are copied as NULL, not as the string 'None'
+        class Cursor(object):
+            def copy_expert(self, query, buf):
+                self.query = query
+                self.content = buf.read()
+        cursor = Cursor()
+        copy_rows(cursor, 'footprint_staging', ['name', 'the_geom'],
+                  [(name_fun({'tile': None}), '0103'), (name_fun({'tile': 'a\tb'}), '0103')])
+        self.assertEqual(cursor.query, 'COPY footprint_staging (name, the_geom) FROM STDIN')
+        self.assertEqual(cursor.content, '\\N\t0103\na\\tb\t0103\n')
+
+    def test_catalog_scenes(self):
+        headers = ['path', 'row', 'dayOrNight', 'browseURL'] + [c for _, c in CATALOG_COLUMNS]
+        def row(path, row, day, scene_id):
+            return [str(path), str(row), day, 'http://'] + [
+                scene_id, 'LC08_L1TP_%03d%03d_20170105' % (path, row), '2017-01-05',
+                '12.5', '10.1', '18.1', '-104.2', '20.2', '-102.1']
+        rows = [row(29, 46, 'DAY', 'LC80290462017005LGN00'),
+                row(29, 46, 'NIGHT', 'LC80290462017005LGN01'),
+                row(30, 46, 'DAY', 'LC80300462017005LGN00'),
+                row(29, 47, 'day', 'LC80290472017005LGN00')]
+        path_row = {'029046': 1, '029047': 2}
+        scenes = list(catalog_scenes(rows, headers, path_row))
+        # Night time scenes and unregistered path rows are left out
+        self.assertEqual([s[:2] for s in scenes], [[1, 'LC80290462017005LGN00'],
+                                                   [2, 'LC80290472017005LGN00']])
+        self.assertEqual(scenes[0], [1, 'LC80290462017005LGN00', 'LC08_L1TP_029046_20170105',
+                                     '2017-01-05', '12.5', '10.1', '18.1', '-104.2',
+                                     '20.2', '-102.1'])
+        self.assertEqual(len(scenes[0]), len(CATALOG_COLUMNS) + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
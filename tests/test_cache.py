@@ -0,0 +1,53 @@
+from datetime import datetime
+import os
+import shutil
+import unittest
+
+import numpy as np
+import xarray as xr
+
+from madmex.io.mask_cache import read_mask, write_mask
+from madmex.io.tile_cache import TileCache
+from madmex.settings import TEMP_DIR
+
+
+class TestCache(unittest.TestCase):
+
+    def test_tile_cache(self):
+        cache_dir = os.path.join(TEMP_DIR, 'test_tile_cache')
+        arr = np.arange(24, dtype=np.int16).reshape((1, 3, 8))
+        xarr = xr.DataArray(arr, dims=['time', 'y', 'x'],
+                            coords={'time': [datetime(2018, 1, 1)],
+                                    'y': np.arange(3), 'x': np.arange(8)},
+                            attrs={'nodata': -9999})
+        xset = xr.Dataset({'blue': xarr, 'red': xarr + 1}, attrs={'crs': 'EPSG:4326'})
+        try:
+            cache = TileCache(cache_dir, max_size=1e6)
+            self.assertIsNone(cache.get('tile_0'))
+            cache.put('tile_0', xset)
+            self.assertIsNone(xr.testing.assert_identical(cache.get('tile_0'), xset))
+            # Least recently read entry is evicted
+            cache.put('tile_1', xset)
+            entry = os.path.join(cache_dir, 'tile_0')
+            os.utime(entry, (0, 0))
+            cache.max_size = sum(f.stat().st_size for f in os.scandir(entry)) * 1.5
+            cache.evict()
+            self.assertIsNone(cache.get('tile_0'))
+            self.assertIsNotNone(cache.get('tile_1'))
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    def test_mask_cache_io(self):
+        path = os.path.join(TEMP_DIR, 'mask_cache_test', 'mask.npz')
+        mask = np.zeros((1000, 800), dtype=np.uint8)
+        mask[100:600, 200:700] = 1
+        write_mask(path, mask)
+        self.assertLess(os.path.getsize(path), mask.nbytes / 50)
+        out = read_mask(path)
+        self.assertEqual(out.dtype, np.uint8)
+        np.testing.assert_array_equal(out, mask)
+        shutil.rmtree(os.path.dirname(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,200 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+
+from madmex.api.download import (DownloadError, download_file, download_files,
+                                 download_order, make_session)
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """Serve the content of the class attribute ``files``, honoring Range requests"""
+    files = {}
+    # Paths of the GET requests served
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def _content(self):
+        name = self.path.lstrip('/')
+        if name not in self.files:
+            self.send_error(404)
+            return None
+        return self.files[name]
+
+    def do_HEAD(self):
+        content = self._content()
+        if content is None:
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+
+    def do_GET(self):
+        type(self).requests.append(self.path.lstrip('/'))
+        content = self._content()
+        if content is None:
+            return
+        size = len(content)
+        range_header = self.headers.get('Range')
+        if range_header:
+            start = int(range_header.split('=')[1].split('-')[0])
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', 'bytes */%d' % size)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, size - 1, size))
+            content = content[start:]
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class FakeOrder(object):
+    """Stand-in of madmex.models.Order recording its saves"""
+    def __init__(self, order_id):
+        self.order_id = order_id
+        self.progress = {}
+        self.downloaded = False
+        self.saves = []
+
+    def save(self, update_fields=None):
+        self.saves.append(update_fields)
+
+
+class FakeEspaApi(object):
+    """Stand-in of madmex.api.remote.EspaApi listing the items of an order"""
+    def __init__(self, images):
+        self.images = images
+
+    def get_list_order(self, order_id):
+        return {order_id: self.images}
+
+
+class TestDownload(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        RangeRequestHandler.files = {'file_%d.tar.gz' % i: os.urandom(300000 + i)
+                                     for i in range(4)}
+        cls.server = HTTPServer(('127.0.0.1', 0), RangeRequestHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = 'http://127.0.0.1:%d/' % cls.server.server_port
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.session = make_session(pool_size=2, retries=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _read(self, path):
+        with open(path, 'rb') as src:
+            return src.read()
+
+    def test_download_file(self):
+        content = RangeRequestHandler.files['file_0.tar.gz']
+        md5 = hashlib.md5(content).hexdigest()
+        path = download_file(self.session, self.base_url + 'file_0.tar.gz',
+                             self.directory, checksum=md5)
+        self.assertEqual(path, os.path.join(self.directory, 'file_0.tar.gz'))
+        self.assertEqual(self._read(path), content)
+        self.assertFalse(os.path.exists(path + '.part'))
+
+    def test_resume(self):
+        content = RangeRequestHandler.files['file_1.tar.gz']
+        path = os.path.join(self.directory, 'file_1.tar.gz')
+        with open(path + '.part', 'wb') as dst:
+            dst.write(content[:1000])
+        download_file(self.session, self.base_url + 'file_1.tar.gz', self.directory)
+        self.assertEqual(self._read(path), content)
+        # Complete partial file
+        os.rename(path, path + '.part')
+        download_file(self.session, self.base_url + 'file_1.tar.gz', self.directory)
+        self.assertEqual(self._read(path), content)
+
+    def test_truncated(self):
+        content = RangeRequestHandler.files['file_2.tar.gz']
+        path = os.path.join(self.directory, 'file_2.tar.gz')
+        with open(path, 'wb') as dst:
+            dst.write(content[:5000])
+        download_file(self.session, self.base_url + 'file_2.tar.gz', self.directory)
+        self.assertEqual(self._read(path), content)
+
+    def test_checksum_mismatch(self):
+        with self.assertRaises(DownloadError):
+            download_file(self.session, self.base_url + 'file_0.tar.gz',
+                          self.directory, checksum='0' * 32)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_download_files(self):
+        items = [(self.base_url + name, None) for name in RangeRequestHandler.files]
+        items.append((self.base_url + 'missing.tar.gz', None))
+        results = {url: (path, error) for url, path, error in
+                   download_files(items, self.directory, workers=3)}
+        self.assertEqual(len(results), 5)
+        for name, content in RangeRequestHandler.files.items():
+            path, error = results[self.base_url + name]
+            self.assertIsNone(error)
+            self.assertEqual(self._read(path), content)
+        path, error = results[self.base_url + 'missing.tar.gz']
+        self.assertIsNone(path)
+        self.assertIsNotNone(error)
+
+    def test_download_order(self):
+        names = ['file_0.tar.gz', 'file_1.tar.gz', 'late.tar.gz']
+        content = RangeRequestHandler.files['file_0.tar.gz']
+        images = [{'product_dload_url': self.base_url + name,
+                   'cksum_download_url': None} for name in names]
+        images[0]['cksum_download_url'] = hashlib.md5(content).hexdigest()
+        images.append({'product_dload_url': '', 'cksum_download_url': None})
+        client = FakeEspaApi(images)
+        order = FakeOrder('espa-user@host-0101')
+        # late.tar.gz is not available yet
+        self.assertFalse(download_order(order, client, self.directory, workers=2,
+                                        session=self.session))
+        self.assertFalse(order.downloaded)
+        self.assertEqual(len(order.progress), 3)
+        self.assertTrue(order.progress[self.base_url + 'late.tar.gz'].startswith('error: '))
+        for name in names[:2]:
+            self.assertEqual(order.progress[self.base_url + name],
+                             os.path.join(self.directory, name))
+        # Progress is saved after every item
+        self.assertEqual(order.saves, [['progress']] * 3 + [None])
+        # Second run only downloads the missing item
+        RangeRequestHandler.files['late.tar.gz'] = b'late' * 1000
+        RangeRequestHandler.requests = []
+        try:
+            self.assertTrue(download_order(order, client, self.directory, workers=2,
+                                           session=self.session))
+        finally:
+            del RangeRequestHandler.files['late.tar.gz']
+        self.assertEqual(RangeRequestHandler.requests, ['late.tar.gz'])
+        self.assertTrue(order.downloaded)
+        self.assertEqual(self._read(order.progress[self.base_url + 'late.tar.gz']),
+                         b'late' * 1000)
+        # Files removed from disk are downloaded again
+        os.remove(order.progress[self.base_url + 'file_1.tar.gz'])
+        RangeRequestHandler.requests = []
+        self.assertTrue(download_order(order, client, self.directory, workers=2,
+                                       session=self.session))
+        self.assertEqual(RangeRequestHandler.requests, ['file_1.tar.gz'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+import numpy as np
+
+from madmex.lcc.transform.distance import Transform as Distance
+from madmex.lcc.transform.maf import _spatial_covariance
+
+# Test data
+arr0 = np.random.randint(1,2000,30000).reshape((3, 100, 100)).astype(np.int16)
+arr1 = np.random.randint(1,2000,30000).reshape((3, 100, 100)).astype(np.int16)
+
+
+class TestDistance(unittest.TestCase):
+
+    def test_euclidean(self):
+        expected = np.linalg.norm(arr0.astype(np.float64) - arr1, axis=0)
+        for chunk_size in [1, 7, 100, 1000]:
+            dist = Distance(arr0, arr1, chunk_size=chunk_size).transform()
+            self.assertEqual(dist.dtype, np.float32)
+            np.testing.assert_allclose(dist, expected, rtol=1e-5)
+
+    def test_euclidean_2D(self):
+        dist = Distance(arr0[0], arr1[0]).transform()
+        np.testing.assert_allclose(dist, np.absolute(arr0[0].astype(np.float64) - arr1[0]))
+
+    def test_angle(self):
+        x = arr0.astype(np.float64)
+        y = arr1.astype(np.float64)
+        cos = np.sum(x * y, axis=0) / np.sqrt(np.sum(x * x, axis=0) * np.sum(y * y, axis=0))
+        expected = np.arccos(np.clip(cos, -1, 1))
+        dist = Distance(arr0, arr1, metric='angle', chunk_size=13).transform()
+        np.testing.assert_allclose(dist, expected, atol=1e-3)
+
+    def test_mahalanobis(self):
+        d = (arr0.astype(np.float64) - arr1).reshape(3, -1)
+        centered = d - d.mean(axis=1)[:,np.newaxis]
+        cov_inv = np.linalg.inv(np.cov(d))
+        expected = np.sqrt(np.sum(centered * np.matmul(cov_inv, centered), axis=0))
+        dist = Distance(arr0, arr1, metric='mahalanobis', chunk_size=13).transform()
+        np.testing.assert_allclose(dist, expected.reshape(100, 100), rtol=1e-3)
+
+    def test_out(self):
+        out = np.empty((100, 100), dtype=np.float32)
+        dist = Distance(arr0, arr1, out=out).transform()
+        self.assertTrue(dist is out)
+        with self.assertRaises(ValueError):
+            Distance(arr0, arr1, out=np.empty((100, 100))).transform()
+
+
+
+class TestMaf(unittest.TestCase):
+
+    def test_spatial_covariance(self):
+        X = arr0 - arr0.mean(axis=(1,2))[:,np.newaxis,np.newaxis]
+        for h in [(1, 1), (2, -1), (-3, 0)]:
+            C_plus, C_minus = _spatial_covariance(X, np.array(h))
+            # Brute force on copies of the overlapping areas
+            shifted = np.roll(np.roll(X, h[1], axis=1), h[0], axis=2)
+            rows = slice(max(h[1], 0), X.shape[1] + min(h[1], 0))
+            cols = slice(max(h[0], 0), X.shape[2] + min(h[0], 0))
+            A = X[:, rows, cols].reshape(3, -1)
+            B = shifted[:, rows, cols].reshape(3, -1)
+            expected = np.matmul(A, B.T) / (A.shape[1] - 1)
+            np.testing.assert_allclose(C_plus, expected)
+            np.testing.assert_allclose(C_minus, expected.T)
+
+
+if __name__ == '__main__':
+    unittest.main()
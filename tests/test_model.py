@@ -47,6 +47,10 @@ class TestModel(unittest.TestCase):
                                              [10,9,8,7,6,5,4,3,2,1]])
             self.assertTrue(len(pred) == 2)
             self.assertTrue(len(conf) == 2)
+            pred_fused, conf_fused = model.predict_with_confidence([[1,2,3,4,5,6,7,8,9,10],
+                                                                    [10,9,8,7,6,5,4,3,2,1]])
+            np.testing.assert_array_equal(pred_fused, pred)
+            np.testing.assert_allclose(conf_fused, conf)
         for model in fitted_models_encode:
             pred = model.predict([[1,2,3,4,5,6,7,8,9,10],
                                   [10,9,8,7,6,5,4,3,2,1]])
@@ -55,6 +59,17 @@ class TestModel(unittest.TestCase):
             self.assertTrue(len(pred) == 2)
             self.assertTrue(len(conf) == 2)
 
+    def test_prediction_session(self):
+        X_test = X[:250]
+        for mod in model_list:
+            model = init_and_fit(mod, X, y)
+            session = model.prediction_session(n_threads=1, batch_size=100)
+            pred, conf = session.predict(X_test, confidence=True)
+            np.testing.assert_array_equal(pred, model.predict(X_test))
+            np.testing.assert_allclose(conf, model.predict_confidence(X_test),
+                                       rtol=1e-5)
+            np.testing.assert_array_equal(session.predict(X_test), pred)
+
 
 if __name__ == "__main__":
     #import sys;sys.argv = ['', 'Test.testName']
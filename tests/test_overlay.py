@@ -5,7 +5,9 @@ from pprint import pprint
 import fiona
 import xarray as xr
 import numpy as np
+from shapely.geometry import shape
 from madmex.overlay.extractions import zonal_stats_xarray
+from madmex.overlay.shape_metrics import fc_shape_metrics
 
 path = os.path.dirname(__file__)
 test_shp = os.path.join(path, 'data/test_lc_class.shp')
@@ -25,3 +27,50 @@ class TestExtract(unittest.TestCase):
         self.assertListEqual(list(y), ['water', 'forest'])
         np.testing.assert_allclose(X, expected_X)
 
+    def test_extract_shape_features(self):
+        X, y = zonal_stats_xarray(dataset, fc, field='class', aggregation='mean',
+                                  categorical_variables='cover',
+                                  shape_features=['area'])
+        self.assertEqual(X.shape, (2, 4))
+        area = {x['properties']['class']: shape(x['geometry']).area for x in fc}
+        np.testing.assert_allclose(X[:,3], [area[k] for k in y])
+
+    def test_extract_shapely_geometries(self):
+        # Features as built by io.vector_db.load_segmentation_from_dataset
+        fc_shapely = [dict(x, geometry=shape(x['geometry'])) for x in fc]
+        X, y = zonal_stats_xarray(dataset, fc_shapely, field='class', aggregation='mean',
+                                  categorical_variables='cover',
+                                  shape_features=['area'])
+        X_geojson, y_geojson = zonal_stats_xarray(dataset, fc, field='class',
+                                                  aggregation='mean',
+                                                  categorical_variables='cover',
+                                                  shape_features=['area'])
+        np.testing.assert_array_equal(y, y_geojson)
+        np.testing.assert_allclose(X, X_geojson)
+
+
+class TestShapeMetrics(unittest.TestCase):
+    def test_fc_shape_metrics(self):
+        polygon_hole = {'type': 'Polygon',
+                        'coordinates': [[[0, 0], [30, 0], [30, 30], [0, 30], [0, 0]],
+                                        [[10, 10], [20, 10], [20, 20], [10, 20], [10, 10]]]}
+        multipolygon = {'type': 'MultiPolygon',
+                        'coordinates': [[[[0, 0], [4, 0], [4, 4], [0, 0]]],
+                                        [[[10, 10], [14, 10], [14, 12], [10, 12], [10, 10]]]]}
+        geom_list = [polygon_hole, multipolygon, {'type': 'Polygon',
+                                                  'coordinates': [[[2e6, 3e6], [2e6 + 1, 3e6],
+                                                                   [2e6 + 1, 3e6 + 0.5],
+                                                                   [2e6, 3e6]]]}]
+        features = [{'type': 'Feature', 'geometry': g, 'properties': {}} for g in geom_list]
+        metrics = fc_shape_metrics(features, ['area', 'perimeter', 'bperim'])
+        for geom, row in zip(geom_list, metrics):
+            sh = shape(geom)
+            minx, miny, maxx, maxy = sh.bounds
+            np.testing.assert_allclose(row, [sh.area, sh.length,
+                                             2 * (maxx - minx + maxy - miny)])
+        # Square of side 4: frac floor and circularity
+        square = [{'type': 'Feature', 'properties': {},
+                   'geometry': {'type': 'Polygon',
+                                'coordinates': [[[0,0], [4,0], [4,4], [0,4], [0,0]]]}}]
+        np.testing.assert_allclose(fc_shape_metrics(square, ['shape', 'frac']),
+                                   [[np.pi / 4, 1.0]])
@@ -0,0 +1,172 @@
+from datetime import datetime, timedelta
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs
+
+from madmex.api.remote import UsgsApi, split_extent, split_dates
+
+
+def make_scene(i):
+    lon = -110 + (i % 20)
+    lat = 15 + (i // 20) % 10
+    corner = lambda x, y: {'longitude': x, 'latitude': y}
+    return {'entityId': 'LC8%06d' % i,
+            'displayId': 'LC08_L1TP_%06d_20170101_20170101_01_T1' % i,
+            'acquisitionDate': '2017-%02d-15' % (i % 12 + 1),
+            'lowerLeftCoordinate': corner(lon, lat),
+            'upperLeftCoordinate': corner(lon, lat + 0.5),
+            'upperRightCoordinate': corner(lon + 0.5, lat + 0.5),
+            'lowerRightCoordinate': corner(lon + 0.5, lat)}
+
+
+class MockUsgsHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in of the earth explorer inventory api login and search endpoints"""
+    scenes = [make_scene(i) for i in range(500)]
+    searches = 0
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, response):
+        body = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        data = json.loads(parse_qs(self.rfile.read(length).decode())['jsonRequest'][0])
+        if self.path.endswith('/login'):
+            self._reply({'error': '', 'data': 'key'})
+            return
+        type(self).searches += 1
+        if data.get('apiKey') != 'key':
+            self._reply({'error': 'AUTH_INVALID', 'data': None})
+            return
+        ll, ur = data['lowerLeft'], data['upperRight']
+        matches = [s for s in self.scenes
+                   if ll['longitude'] <= s['lowerLeftCoordinate']['longitude'] + 0.5
+                   and s['lowerLeftCoordinate']['longitude'] <= ur['longitude']
+                   and ll['latitude'] <= s['lowerLeftCoordinate']['latitude'] + 0.5
+                   and s['lowerLeftCoordinate']['latitude'] <= ur['latitude']
+                   and data.get('startDate', '0') <= s['acquisitionDate'] <= data.get('endDate', '9')]
+        start = data['startingNumber']
+        page = matches[start - 1:start - 1 + data['maxResults']]
+        self._reply({'error': '',
+                     'data': {'totalHits': len(matches),
+                              'firstRecord': start,
+                              'lastRecord': start + len(page) - 1,
+                              'nextRecord': start + len(page),
+                              'results': page}})
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class TestUsgsApi(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), MockUsgsHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.host = 'http://127.0.0.1:%d' % cls.server.server_port
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.client = UsgsApi(host=self.host, username='user', password='password',
+                              rate_limit=None, cache_dir=self.cache_dir)
+        self.assertTrue(self.client.login())
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_split(self):
+        extents = split_extent((-118, 14, -86, 33), 5)
+        self.assertEqual(len(extents), 7 * 4)
+        self.assertEqual(extents[-1], (-88, 29, -86, 33))
+        self.assertEqual(split_dates(None, '2017-12-31', 30), [(None, '2017-12-31')])
+        windows = split_dates('2016-01-01', '2017-12-31', 366)
+        self.assertEqual(windows, [('2016-01-01', '2016-12-31'), ('2017-01-01', '2017-12-31')])
+
+    def test_iter_search(self):
+        scenes = list(self.client.iter_search((-111, 14, -89, 26), 'LANDSAT_8_C1',
+                                              start_date='2017-01-01', end_date='2017-12-31',
+                                              step=4, days=100, page_size=7, workers=4))
+        ids = [s['entityId'] for s in scenes]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), set(s['entityId'] for s in MockUsgsHandler.scenes))
+        # Second run is served from the cache
+        searches = MockUsgsHandler.searches
+        again = list(self.client.iter_search((-111, 14, -89, 26), 'LANDSAT_8_C1',
+                                             start_date='2017-01-01', end_date='2017-12-31',
+                                             step=4, days=100, page_size=7, workers=4))
+        self.assertEqual(MockUsgsHandler.searches, searches)
+        self.assertEqual(sorted(s['entityId'] for s in again), sorted(ids))
+
+    def test_iter_search_close(self):
+        client = UsgsApi(host=self.host, username='user', password='password',
+                         rate_limit=20, cache_dir=self.cache_dir)
+        self.assertTrue(client.login())
+        searches = MockUsgsHandler.searches
+        start = time.monotonic()
+        scenes = client.iter_search((-111, 14, -89, 26), 'LANDSAT_8_C1',
+                                    start_date='2017-01-01', end_date='2017-12-31',
+                                    step=4, days=100, page_size=7, workers=2)
+        next(scenes)
+        scenes.close()
+        # The 72 sub-queries are not waited for
+        self.assertLess(time.monotonic() - start, 1)
+        time.sleep(0.2)
+        self.assertLessEqual(MockUsgsHandler.searches - searches, 8)
+
+    def test_cache_expiry(self):
+        extent = (-111, 14, -109, 16)
+        self.client.search(extent, 'LANDSAT_8_C1', start_date='2017-01-01', end_date='2017-12-31')
+        searches = MockUsgsHandler.searches
+        self.client.search(extent, 'LANDSAT_8_C1', start_date='2017-01-01', end_date='2017-12-31')
+        self.assertEqual(MockUsgsHandler.searches, searches)
+        # Entries older than cache_max_age are requested again
+        old = time.time() - 31 * 86400
+        for name in os.listdir(self.cache_dir):
+            os.utime(os.path.join(self.cache_dir, name), (old, old))
+        self.client.search(extent, 'LANDSAT_8_C1', start_date='2017-01-01', end_date='2017-12-31')
+        self.assertEqual(MockUsgsHandler.searches, searches + 1)
+        # Recent and open ended windows are never cached
+        n_entries = len(os.listdir(self.cache_dir))
+        recent = (datetime.now() - timedelta(days=10)).strftime('%Y-%m-%d')
+        for end_date in [recent, None]:
+            self.client.search(extent, 'LANDSAT_8_C1', start_date='2017-01-01', end_date=end_date)
+            self.client.search(extent, 'LANDSAT_8_C1', start_date='2017-01-01', end_date=end_date)
+        self.assertEqual(MockUsgsHandler.searches, searches + 5)
+        self.assertEqual(len(os.listdir(self.cache_dir)), n_entries)
+
+    def test_retry_post(self):
+        retry = self.client.session.get_adapter(self.host).max_retries
+        methods = getattr(retry, 'allowed_methods', None) or retry.method_whitelist
+        self.assertIn('POST', methods)
+
+    def test_search_error(self):
+        self.client.api_key = 'expired'
+        with self.assertRaises(ValueError):
+            list(self.client.iter_search((-111, 14, -109, 16), 'LANDSAT_8_C1'))
+        self.assertEqual(self.client.search((-111, 14, -109, 16), 'LANDSAT_8_C1')['error'],
+                         'AUTH_INVALID')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+from datetime import datetime
+import os
+import unittest
+
+from django.test import RequestFactory
+
+from madmex.rest import vector_tiles, views
+from madmex.rest.geojson import features_query
+from madmex.util.local import aware_make_dir
+
+
+class TestRest(unittest.TestCase):
+
+    def test_vector_tiles(self):
+        xmin, ymin, xmax, ymax = vector_tiles.tile_bounds(0, 0, 0)
+        self.assertAlmostEqual(xmax, 20037508.342789244)
+        self.assertEqual((xmin, ymin), (-xmax, -ymax))
+        # Cached tiles are served without querying the database
+        path = vector_tiles.tile_path('predict', 'test_tiles', 3, 2, 5)
+        aware_make_dir(os.path.dirname(path))
+        with open(path, 'wb') as dst:
+            dst.write(b'tile')
+        self.assertEqual(vector_tiles.get_tile('predict', 'test_tiles', 3, 2, 5), b'tile')
+        vector_tiles.invalidate_tiles('predict', 'test_tiles')
+        self.assertFalse(os.path.exists(path))
+
+    def test_features_query(self):
+        query, params = features_query('training', 'test_set', after=42, limit=10)
+        self.assertEqual(query.count('%s'), len(params))
+        self.assertIn('ORDER BY obj.id', query)
+        self.assertEqual(params[-2:], [42, 10])
+        query, params = features_query('predict', 'test_pred', zoom=12,
+                                       polygon='POLYGON((0 0, 1 0, 1 1, 0 0))')
+        self.assertEqual(query.count('%s'), len(params))
+        self.assertTrue(params[4].startswith('SRID=4326;'))
+
+    def test_catalog_view(self):
+        calls = []
+        def footprints(mission):
+            calls.append(mission)
+            return [], 2013, 2018
+        versions = [datetime(2018, 5, 1)]
+        originals = (views.get_landsat_catalog_version, views.get_landsat_catalog_footprints)
+        views.get_landsat_catalog_version = lambda: versions[-1]
+        views.get_landsat_catalog_footprints = footprints
+        try:
+            factory = RequestFactory()
+            response = views.catalog(factory.get('/catalog/8'), '8')
+            etag = response['ETag']
+            self.assertEqual(response.context_data['max_year'], 2018)
+            views.catalog(factory.get('/catalog/8'), '8')
+            self.assertEqual(calls, ['8'])
+            response = views.catalog(factory.get('/catalog/8', HTTP_IF_NONE_MATCH=etag), '8')
+            self.assertEqual(response.status_code, 304)
+            # A refresh replaces the entry of the mission
+            versions.append(datetime(2018, 6, 1))
+            response = views.catalog(factory.get('/catalog/8', HTTP_IF_NONE_MATCH=etag), '8')
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            self.assertEqual(calls, ['8', '8'])
+            self.assertEqual(views.cache.get('landsat_catalog_8')[0], response['ETag'])
+        finally:
+            views.get_landsat_catalog_version, views.get_landsat_catalog_footprints = originals
+            views.cache.delete('landsat_catalog_8')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+from importlib import import_module
+import multiprocessing
+import unittest
+
+import numpy as np
+
+try:
+    from madmex.segmentation.bis import Segmentation, _parent_labels
+    # The package exports the segment function under the name of the module
+    bis_segment = import_module('madmex.bin.bis.segment')
+except ImportError:
+    # bis depends on gdal python bindings
+    Segmentation = None
+    bis_segment = None
+
+
+@unittest.skipIf(Segmentation is None, 'osgeo is not available')
+class TestBisHierarchy(unittest.TestCase):
+
+    def setUp(self):
+        # Two levels: 4 fine regions nested in 2 coarse ones
+        self.fine = np.array([[1, 1, 2, 2],
+                              [1, 1, 2, 2],
+                              [3, 3, 4, 4],
+                              [3, 3, 4, 4]])
+        self.coarse = np.array([[7, 7, 7, 7],
+                                [7, 7, 7, 7],
+                                [9, 9, 9, 9],
+                                [9, 9, 9, 9]])
+
+    def test_parent_labels(self):
+        self.assertEqual(_parent_labels(self.fine, self.coarse),
+                         {1: 7, 2: 7, 3: 9, 4: 9})
+        self.assertEqual(_parent_labels(self.coarse, self.coarse), {7: 7, 9: 9})
+
+    def test_hierarchy_to_db(self):
+        seg = Segmentation(array=None, affine=None, crs=None, t=[20, 40])
+        seg.levels = {20: self.fine, 40: self.coarse}
+        calls = []
+        def to_db(meta, parents=None):
+            calls.append((meta, parents))
+            labels = np.unique(seg.segments_array).tolist()
+            # Fake database ids
+            return {label: 100 * meta + label for label in labels}
+        seg.polygonize = lambda: None
+        seg.to_db = to_db
+        seg.hierarchy_to_db({20: 1, 40: 2})
+        # Coarsest level first, without parents
+        self.assertEqual(calls[0], (2, None))
+        self.assertEqual(calls[1], (1, {1: 207, 2: 207, 3: 209, 4: 209}))
+
+
+def _daemonic_map(queue):
+    from madmex.bin.bis import tools
+    queue.put(bis_segment._fork_map(tools._f, [(1, 1), (2, 2), (3, 3)], 2))
+
+
+@unittest.skipIf(bis_segment is None, 'osgeo is not available')
+class TestBisForking(unittest.TestCase):
+
+    def test_fork_map_daemonic(self):
+        # Strips are forked from daemonic processes such as dask workers
+        ctx = multiprocessing.get_context('fork')
+        queue = ctx.Queue()
+        process = ctx.Process(target=_daemonic_map, args=(queue,), daemon=True)
+        process.start()
+        self.assertEqual(queue.get(timeout=60), [2, 4, 6])
+        process.join()
+        self.assertEqual(process.exitcode, 0)
+        self.assertFalse(multiprocessing.current_process().daemon)
+
+
+@unittest.skipIf(bis_segment is None or not hasattr(bis_segment, 'cregionmerge'),
+                 'cregionmerge is not available')
+class TestBisTiling(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        # Smooth blocks plus noise, so that regions cross strip seams
+        blocks = np.kron(np.random.randint(0, 200, (6, 6, 3)), np.ones((12, 12, 1)))
+        self.image = (blocks + np.random.randint(0, 10, blocks.shape)).astype(np.float64)
+
+    def _segment(self, **kwargs):
+        return list(bis_segment.segment_gen(self.image, t=[20], tile=True, rows=20,
+                                            **kwargs))[0]
+
+    def test_tiling_determinism(self):
+        serial = self._segment(mp=False)
+        forked = self._segment(workers=3)
+        np.testing.assert_array_equal(serial, forked)
+        np.testing.assert_array_equal(forked, self._segment(workers=2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+import xarray as xr
+
+from madmex.io.tile_index import segmentation_cell_query, training_set_cell_query
+from madmex.io.vector_db import segmentation_query, training_query
+from madmex.util.datacube import tile_cell
+
+
+class TestTileIndex(unittest.TestCase):
+
+    def test_tile_cell(self):
+        product_type = type('DatasetType', (), {'name': 's2_001_jalisco_2017_0'})
+        dataset = type('Dataset', (), {'type': product_type})
+        # One time step, holding a tuple of datasets
+        values = np.empty(1, dtype=object)
+        values[0] = (dataset,)
+        sources = xr.DataArray(values, dims=['time'])
+        tile = type('Tile', (), {'sources': sources})
+        self.assertEqual(tile_cell((np.int64(-12), np.int64(7)), tile),
+                         ('s2_001_jalisco_2017_0', -12, 7))
+
+    def test_cell_queries(self):
+        ewkt = 'SRID=4326;POLYGON((0 0,1 0,1 1,0 1,0 0))'
+        for builder, key in [(segmentation_cell_query, 3),
+                             (training_set_cell_query, 'bits')]:
+            query, params = builder('s2_001', 4, 5, ewkt, key)
+            self.assertEqual(query.count('%s'), len(params))
+            self.assertEqual(params[:3], ['s2_001', 4, 5])
+            self.assertIn(ewkt, params)
+            self.assertIn(key, params)
+        # Objects selected by extent or by cell, parameters follow the placeholders
+        query, params = segmentation_query('+proj=longlat', 3, ewkt)
+        self.assertEqual(query.count('%s'), len(params))
+        self.assertEqual(params, ['+proj=longlat', 3, ewkt])
+        query, params = segmentation_query('+proj=longlat', 3, ewkt, cell=('s2_001', 4, 5))
+        self.assertEqual(query.count('%s'), len(params))
+        self.assertNotIn('st_geomfromewkt', query)
+        self.assertEqual(params, ['+proj=longlat', 3, 's2_001', 3, 4, 5])
+        query, params = training_query('+proj=longlat', 'bits', ewkt, cell=('s2_001', 4, 5),
+                                       sample=0.5, seed=2)
+        self.assertEqual(query.count('%s'), len(params))
+        self.assertEqual(params, ['+proj=longlat', 'bits', 's2_001', 'bits', 4, 5, 2, 0.5])
+        query, params = training_query('+proj=longlat', 'bits', ewkt)
+        self.assertEqual(query.count('%s'), len(params))
+        self.assertNotIn('hashtext', query)
+
+
+if __name__ == '__main__':
+    unittest.main()
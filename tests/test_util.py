@@ -14,6 +14,7 @@ import madmex.util.xarray as xutils
 from madmex.settings import TEMP_DIR
 from madmex.util.local import aware_make_dir
 from madmex.util import parser_extra_args
+from madmex.util.numpy import label_blocks
 
 import numpy as np
 import xarray as xr
@@ -69,11 +70,47 @@ class TestUtil(unittest.TestCase):
         self.assertIsNone(xr.testing.assert_equal(xset_in_int, xset_out_int))
         self.assertIsNone(xr.testing.assert_allclose(xset_out_float_0, xset_out_float_1))
 
+    def test_to_band_array(self):
+        arr = np.arange(24, dtype=np.int16).reshape((1, 3, 8))
+        xarr = xr.DataArray(arr, dims=['time', 'y', 'x'])
+        xset = xr.Dataset({'blue': xarr, 'green': xarr + 1, 'red': xarr + 2})
+        expected = xset.squeeze().to_array().values
+        out_bsq = xutils.to_band_array(xset, band_axis=0)
+        # Input left untouched by default
+        self.assertEqual(list(xset.data_vars), ['blue', 'green', 'red'])
+        out_bip = xutils.to_band_array(xset, band_axis=2, dtype=np.float32,
+                                       release=True)
+        self.assertEqual(out_bsq.dtype, np.int16)
+        self.assertEqual(out_bip.dtype, np.float32)
+        self.assertTrue(out_bip.flags['C_CONTIGUOUS'])
+        np.testing.assert_array_equal(out_bsq, expected)
+        np.testing.assert_array_equal(out_bip, np.moveaxis(expected, 0, 2))
+        # Bands are released from the input Dataset
+        self.assertEqual(len(xset.data_vars), 0)
+
     def test_parse_extra_args(self):
         extra_args = ['arg0=madmex', 'arg1=True', 'arg2=False', 'arg3=12',
-                      'arg4=12.3']
+                      'arg4=12.3', 'arg5=20,40,80']
         transformed_args = {'arg0': 'madmex', 'arg1': True, 'arg2': False,
-                            'arg3': 12, 'arg4': 12.3}
+                            'arg3': 12, 'arg4': 12.3, 'arg5': '20,40,80'}
         self.assertEqual(parser_extra_args(extra_args), transformed_args)
+
+    def test_label_blocks(self):
+        from skimage.measure import label
+        # Random overlapping rectangles, many crossing block seams
+        np.random.seed(0)
+        arr = np.zeros((230, 170), dtype=np.int32)
+        for i in range(60):
+            y, x = np.random.randint(0, 230), np.random.randint(0, 170)
+            h, w = np.random.randint(5, 25, 2)
+            arr[y:y + h, x:x + w] = i + 1
+        fun = lambda a: label(a, connectivity=1, background=-1)
+        expected = fun(arr)
+        labels = label_blocks(arr, fun, block_size=50, halo=30, workers=4)
+        # Same partition of the array, up to label values
+        pairs = np.unique(np.column_stack((expected.ravel(), labels.ravel())), axis=0)
+        self.assertEqual(pairs.shape[0], np.unique(expected).size)
+        self.assertEqual(pairs.shape[0], np.unique(labels).size)
+
 if __name__ == '__main__':
     unittest.main()